@@ -0,0 +1,232 @@
+# backend/admission.py
+"""
+Admission control in front of the database-backed routes.
+
+At most ADMISSION_MAX_CONCURRENT requests (default: the async pool size)
+run a database-backed handler at once; the rest wait in a bounded queue,
+served by priority and then in arrival order:
+
+  vote     /api/vote/*, /api/users
+  results  /api/results*
+  catalog  playlists and full-block payloads
+  health   /db-check, /db-ssl-status
+
+When the queue holds ADMISSION_QUEUE_MAX requests, a new request takes the
+place of the newest waiter of a lower priority, which is shed; if there is
+none, the new request is shed itself. A request still queued after
+ADMISSION_MAX_WAIT_SECONDS is shed too. Shed requests get a fast 503 with
+a Retry-After estimated from the queue length and the recent handler time,
+instead of piling onto the pool and failing with a 500 seconds later.
+Catalog routes served from memory and /health do not pass through here.
+
+database_error() gives pool timeouts that still happen (e.g. a handler
+that holds its slot for a long time) the same 503 + Retry-After, and
+turns errors that mean the database is down into DatabaseUnavailable
+(backend/circuit_breaker.py).
+"""
+import asyncio
+import functools
+import heapq
+import itertools
+import math
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from psycopg_pool import PoolTimeout as AsyncPoolTimeout
+from starlette.concurrency import run_in_threadpool
+
+from backend.async_db import ASYNC_DB_POOL_MAX
+from backend.circuit_breaker import DatabaseUnavailable, db_breaker, is_outage
+from backend.db import PoolTimeout
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() not in ("0", "false", "no")
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", str(ASYNC_DB_POOL_MAX)))
+ADMISSION_QUEUE_MAX = int(os.getenv("ADMISSION_QUEUE_MAX", "50"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "2"))
+MAX_RETRY_AFTER_SECONDS = 30
+
+# Lower value = served first
+VOTE, RESULTS, CATALOG, HEALTH = "vote", "results", "catalog", "health"
+PRIORITIES = {VOTE: 0, RESULTS: 1, CATALOG: 2, HEALTH: 3}
+
+
+class _Waiter:
+    __slots__ = ("rank", "seq", "priority", "future", "done")
+
+    def __init__(self, priority: str, seq: int, future: asyncio.Future):
+        self.rank = PRIORITIES[priority]
+        self.seq = seq
+        self.priority = priority
+        self.future = future
+        self.done = False
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.rank, self.seq) < (other.rank, other.seq)
+
+
+class AdmissionController:
+    """Priority semaphore with a bounded queue; lives on one event loop, so needs no locks."""
+
+    def __init__(self, capacity: int = ADMISSION_MAX_CONCURRENT, queue_max: int = ADMISSION_QUEUE_MAX,
+                 max_wait: float = ADMISSION_MAX_WAIT_SECONDS, enabled: bool = ADMISSION_ENABLED):
+        self.capacity = capacity
+        self.queue_max = queue_max
+        self.max_wait = max_wait
+        self.enabled = enabled
+        self.in_flight = 0
+        self._heap: List[_Waiter] = []
+        self._queued = 0
+        self._seq = itertools.count()
+        # Moving average of how long an admitted handler holds its slot
+        self.hold_seconds = 0.05
+        self.pool_timeouts = 0
+        self.stats: Dict[str, Dict[str, int]] = {
+            name: {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_evicted": 0, "shed_timeout": 0}
+            for name in PRIORITIES
+        }
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue should have drained, 1..MAX_RETRY_AFTER_SECONDS."""
+        drain = (self._queued + 1) * self.hold_seconds / max(self.capacity, 1)
+        return max(1, min(MAX_RETRY_AFTER_SECONDS, math.ceil(drain)))
+
+    def _shed(self, priority: str, reason: str) -> HTTPException:
+        self.stats[priority][f"shed_{reason}"] += 1
+        return overloaded(self.retry_after())
+
+    async def acquire(self, priority: str) -> None:
+        if self.in_flight < self.capacity and not self._queued:
+            self.in_flight += 1
+            self.stats[priority]["admitted"] += 1
+            return
+        if self._queued >= self.queue_max and not self._evict_below(PRIORITIES[priority]):
+            raise self._shed(priority, "queue_full")
+
+        waiter = _Waiter(priority, next(self._seq), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._heap, waiter)
+        self._queued += 1
+        self.stats[priority]["queued"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Client went away while queued; give back a slot it may just have been handed
+            self._abandon(waiter)
+            raise
+        if not waiter.future.done():
+            self._abandon(waiter)
+            raise self._shed(priority, "timeout")
+        if not waiter.future.result():
+            raise self._shed(priority, "evicted")
+        self.stats[priority]["admitted"] += 1
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        if waiter.done:
+            if waiter.future.done() and waiter.future.result():
+                self.release()
+            return
+        waiter.done = True
+        self._queued -= 1
+        waiter.future.cancel()
+
+    def _evict_below(self, rank: int) -> bool:
+        """Shed the newest waiter ranked below rank, making room in the queue."""
+        victim: Optional[_Waiter] = None
+        for waiter in self._heap:
+            if waiter.done or waiter.rank <= rank:
+                continue
+            if victim is None or (waiter.rank, waiter.seq) > (victim.rank, victim.seq):
+                victim = waiter
+        if victim is None:
+            return False
+        victim.done = True
+        self._queued -= 1
+        victim.future.set_result(False)
+        return True
+
+    def release(self, held_seconds: Optional[float] = None) -> None:
+        if held_seconds is not None:
+            self.hold_seconds += 0.1 * (held_seconds - self.hold_seconds)
+        # Hand the slot straight to the best waiter, if any
+        while self._heap:
+            waiter = heapq.heappop(self._heap)
+            if waiter.done:
+                continue
+            waiter.done = True
+            self._queued -= 1
+            waiter.future.set_result(True)
+            return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: str):
+        if not self.enabled:
+            yield
+            return
+        await self.acquire(priority)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            yield
+        finally:
+            self.release(loop.time() - started)
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "queued": self._queued,
+            "queue_max": self.queue_max,
+            "max_wait_seconds": self.max_wait,
+            "avg_hold_ms": round(self.hold_seconds * 1000, 3),
+            "retry_after_seconds": self.retry_after(),
+            "shed_total": sum(s["shed_queue_full"] + s["shed_evicted"] + s["shed_timeout"]
+                              for s in self.stats.values()),
+            "pool_timeouts": self.pool_timeouts,
+            "by_priority": {name: dict(s) for name, s in self.stats.items()},
+        }
+
+
+admission = AdmissionController()
+
+
+def overloaded(retry_after: int) -> HTTPException:
+    return HTTPException(status_code=503, detail="Server busy, please retry",
+                         headers={"Retry-After": str(retry_after)})
+
+
+def database_error(e: Exception) -> Exception:
+    """The exception to raise for a failed database call.
+
+    DatabaseUnavailable when Postgres is unreachable (main.py answers it with
+    a 503, or serves stale data), a 503 + Retry-After if the pool ran dry,
+    else a 500.
+    """
+    if isinstance(e, DatabaseUnavailable):
+        return e
+    if is_outage(e):
+        return DatabaseUnavailable(str(e).strip() or "database unavailable",
+                                   retry_after=db_breaker.retry_after() or None)
+    if isinstance(e, (PoolTimeout, AsyncPoolTimeout)):
+        admission.pool_timeouts += 1
+        return overloaded(admission.retry_after())
+    return HTTPException(status_code=500, detail="Database operation failed")
+
+
+def admitted(priority: str):
+    """Route decorator: run the handler inside an admission slot of the given priority."""
+    def decorate(handler):
+        is_async = asyncio.iscoroutinefunction(handler)
+
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            async with admission.slot(priority):
+                if is_async:
+                    return await handler(*args, **kwargs)
+                return await run_in_threadpool(handler, *args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,431 @@
+# backend/async_db.py
+"""
+asyncio-native data access, alongside the thread-based pool in backend/db.py.
+
+Request handlers run on the event loop and await database round-trips
+through a psycopg 3 AsyncConnectionPool instead of holding a threadpool
+slot for each one. backend/db.py stays in place for the background threads
+(vote flusher, results publisher, summary refresher) and scripts.
+
+psycopg 3 takes the same %s placeholders as psycopg2, so SQL is shared
+between both paths. PreparedStatements are PREPAREd by name once per
+connection and run with EXECUTE, as in backend/db.py; the EXECUTE
+arguments are bound client-side, since the server takes no parameters in
+EXECUTE itself.
+
+Warm-up: open_async_pool(warm=...) PREPAREs those statements on every
+connection the pools open (before it is handed out), and checks out
+ASYNC_DB_POOL_WARM connections at once so they exist before the first
+request.
+
+Pool settings (seconds where relevant):
+  ASYNC_DB_POOL_MIN / ASYNC_DB_POOL_MAX   connections kept / allowed
+  ASYNC_DB_POOL_ACQUIRE_TIMEOUT           wait for a free connection
+  ASYNC_DB_POOL_MAX_IDLE / _MAX_LIFETIME  recycling
+  ASYNC_DB_POOL_WARM                      connections opened at startup
+
+Read replicas
+-------------
+When DATABASE_READ_URL lists one or more replicas, each gets a pool of its
+own and callers say what a connection is for: get_async_connection(READ)
+may be served by a replica, WRITE (the default) always by the primary.
+A monitor task measures every replica's replay lag each
+REPLICA_CHECK_SECONDS; reads go round-robin to the replicas that answered
+and are at most REPLICA_MAX_LAG_SECONDS behind, and fall back to the
+primary when none qualifies or a replica cannot hand out a connection.
+
+Read-your-writes: a request that commits a write learns the primary's WAL
+position (LSN) and returns it in the X-Read-After-LSN response header. A
+client that echoes the header on its next requests is only routed to a
+replica that has replayed at least that far, otherwise to the primary, so
+a vote is always visible in the results read that follows it, whichever
+worker serves it. main.py installs the middleware that carries the token
+only when replicas are configured.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import time
+from contextlib import AsyncExitStack, asynccontextmanager, suppress
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import psycopg
+from psycopg import sql
+from psycopg.conninfo import conninfo_to_dict
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+
+from backend.circuit_breaker import db_breaker
+from backend.db import DATABASE_READ_URLS, DATABASE_URL, PreparedStatement
+from backend.query_metrics import timed_query
+
+logger = logging.getLogger(__name__)
+
+ASYNC_DB_POOL_MIN = int(os.getenv("ASYNC_DB_POOL_MIN", "2"))
+ASYNC_DB_POOL_MAX = int(os.getenv("ASYNC_DB_POOL_MAX", "20"))
+ASYNC_DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("ASYNC_DB_POOL_ACQUIRE_TIMEOUT", "5"))
+ASYNC_DB_POOL_MAX_IDLE = float(os.getenv("ASYNC_DB_POOL_MAX_IDLE", "300"))
+ASYNC_DB_POOL_MAX_LIFETIME = float(os.getenv("ASYNC_DB_POOL_MAX_LIFETIME", "1800"))
+ASYNC_DB_POOL_WARM = int(os.getenv("ASYNC_DB_POOL_WARM", str(ASYNC_DB_POOL_MIN)))
+
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "2"))
+# Kept short: a replica that cannot hand out a connection quickly is skipped
+REPLICA_ACQUIRE_TIMEOUT = float(os.getenv("REPLICA_ACQUIRE_TIMEOUT", "1"))
+
+READ = "read"
+WRITE = "write"
+READ_AFTER_HEADER = "X-Read-After-LSN"
+
+# timezone=UTC: created_at defaults, and so results_hourly.hour, are UTC wall-clock times
+_CONNECT_OPTIONS = "-c client_encoding=utf8 -c timezone=UTC"
+
+# Lag is 0 while the replica has replayed everything it received (an idle
+# primary does not make it "behind"); not a standby at all also counts as 0
+_REPLICA_LAG_SQL = """
+    SELECT pg_is_in_recovery(),
+           pg_last_wal_replay_lsn()::text,
+           CASE WHEN pg_last_wal_receive_lsn() IS NOT DISTINCT FROM pg_last_wal_replay_lsn() THEN 0
+                ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+           END
+"""
+
+async_pool: Optional[AsyncConnectionPool] = None
+
+
+def parse_lsn(text: Optional[str]) -> Optional[int]:
+    """'16/B374D848' -> int, None if text is not an LSN."""
+    if not text:
+        return None
+    hi, sep, lo = text.strip().partition("/")
+    try:
+        return (int(hi, 16) << 32) | int(lo, 16) if sep else None
+    except ValueError:
+        return None
+
+
+def format_lsn(lsn: int) -> str:
+    return f"{lsn >> 32:X}/{lsn & 0xFFFFFFFF:X}"
+
+
+# ---------- read-your-writes ----------
+@dataclass
+class ConsistencyScope:
+    """Per-request LSN bounds: what reads must see, and what this request wrote."""
+    read_after: Optional[int] = None
+    written: Optional[int] = None
+
+
+_consistency: ContextVar[Optional[ConsistencyScope]] = ContextVar("db_consistency", default=None)
+
+
+def begin_consistency_scope(token: Optional[str]) -> ConsistencyScope:
+    """Start tracking for the current request; token is the client's X-Read-After-LSN, if any."""
+    scope = ConsistencyScope(read_after=parse_lsn(token))
+    _consistency.set(scope)
+    return scope
+
+
+async def note_write_position(conn) -> None:
+    """After a commit on conn: make later reads in this request, and the client's next ones, see it."""
+    scope = _consistency.get()
+    if scope is None:
+        return
+    try:
+        cur = await conn.execute("SELECT pg_current_wal_lsn()::text")
+        lsn = parse_lsn((await cur.fetchone())[0])
+    except psycopg.Error as e:
+        # The write itself is committed; only the routing hint is lost
+        logger.warning(f"Could not read the WAL position after a write: {e}")
+        await conn.rollback()
+        return
+    if lsn is None:
+        return
+    scope.written = max(scope.written or 0, lsn)
+    scope.read_after = max(scope.read_after or 0, lsn)
+
+
+# ---------- replicas ----------
+class PreparingAsyncConnection(psycopg.AsyncConnection):
+    """Async connection that remembers which named statements were PREPAREd on it."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+# Set by open_async_pool(); PREPAREd on every new connection of every pool
+_warm_statements: Sequence[PreparedStatement] = ()
+
+
+async def prepare_statements_async(conn, statements: Sequence[PreparedStatement]) -> int:
+    """Async counterpart of backend.db.prepare_statements."""
+    done = 0
+    for stmt in statements:
+        if stmt.name in conn.prepared:
+            continue
+        try:
+            await conn.execute(f"PREPARE {stmt.name} AS {stmt.sql}")
+            conn.prepared.add(stmt.name)
+            done += 1
+        except psycopg.Error as e:
+            logger.warning(f"Could not PREPARE {stmt.name}: {e}")
+        finally:
+            await conn.rollback()
+    return done
+
+
+async def _prepare_warm_statements(conn) -> None:
+    # Pool configure callback: runs once per new connection, before its first checkout
+    await prepare_statements_async(conn, _warm_statements)
+
+
+async def _warm_pool(pool: AsyncConnectionPool, count: int) -> None:
+    """Check out count connections (at most max_size) at once, so the pool opens them now."""
+    count = min(count, pool.max_size)
+    started = time.perf_counter()
+    async with AsyncExitStack() as stack:
+        await asyncio.gather(*(stack.enter_async_context(pool.connection()) for _ in range(count)))
+    logger.info(f"Warmed {count} connections of {pool.name} with {len(_warm_statements)} statements "
+                f"in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+
+class Replica:
+    def __init__(self, url: str, index: int):
+        info = conninfo_to_dict(url)
+        # Host and port only: the URL may carry a password
+        self.name = f"{info.get('host') or 'localhost'}:{info.get('port') or 5432}"
+        self.pool = AsyncConnectionPool(
+            url,
+            min_size=1,
+            max_size=ASYNC_DB_POOL_MAX,
+            timeout=REPLICA_ACQUIRE_TIMEOUT,
+            max_idle=ASYNC_DB_POOL_MAX_IDLE,
+            max_lifetime=ASYNC_DB_POOL_MAX_LIFETIME,
+            kwargs={"options": f"{_CONNECT_OPTIONS} -c default_transaction_read_only=on"},
+            connection_class=PreparingAsyncConnection,
+            configure=_prepare_warm_statements,
+            name=f"replica{index}",
+            open=False,
+        )
+        self.healthy = False
+        self.in_recovery: Optional[bool] = None
+        self.lag_seconds: Optional[float] = None
+        self.replay_lsn: Optional[int] = None
+        self.checked_at = 0.0
+        self.stats = {"reads": 0, "failures": 0}
+
+    def serves(self, read_after: Optional[int]) -> bool:
+        if not self.healthy:
+            return False
+        # Without a replay position (not a standby) the primary's LSNs mean nothing here
+        return read_after is None or (self.replay_lsn is not None and self.replay_lsn >= read_after)
+
+    async def check(self) -> None:
+        try:
+            async with self.pool.connection() as conn:
+                cur = await conn.execute(_REPLICA_LAG_SQL)
+                in_recovery, replay_lsn, lag = await cur.fetchone()
+        except Exception as e:
+            self.mark_failed(e)
+            return
+        self.in_recovery = in_recovery
+        self.replay_lsn = parse_lsn(replay_lsn)
+        self.lag_seconds = float(lag) if lag is not None else None
+        self.checked_at = time.monotonic()
+        healthy = self.lag_seconds is not None and self.lag_seconds <= REPLICA_MAX_LAG_SECONDS
+        if healthy != self.healthy:
+            if healthy:
+                logger.info(f"Replica {self.name} in rotation (lag {self.lag_seconds:.1f}s)")
+            else:
+                logger.warning(f"Replica {self.name} out of rotation: lag {self.lag_seconds}s "
+                               f"exceeds {REPLICA_MAX_LAG_SECONDS}s")
+        self.healthy = healthy
+
+    def mark_failed(self, error: Exception) -> None:
+        self.stats["failures"] += 1
+        if self.healthy:
+            logger.warning(f"Replica {self.name} out of rotation: {error}")
+        self.healthy = False
+
+    def snapshot(self) -> dict:
+        return dict(
+            self.stats,
+            name=self.name,
+            healthy=self.healthy,
+            in_recovery=self.in_recovery,
+            lag_seconds=round(self.lag_seconds, 3) if self.lag_seconds is not None else None,
+            replay_lsn=format_lsn(self.replay_lsn) if self.replay_lsn is not None else None,
+            checked_seconds_ago=round(time.monotonic() - self.checked_at, 1) if self.checked_at else None,
+        )
+
+
+replicas: List[Replica] = []
+_next_replica = itertools.count()
+_monitor: Optional[asyncio.Task] = None
+replica_stats = {"replica_reads": 0, "primary_reads": 0, "primary_fallbacks": 0}
+
+
+def replicas_configured() -> bool:
+    return bool(DATABASE_READ_URLS)
+
+
+def _pick_replica() -> Optional[Replica]:
+    scope = _consistency.get()
+    read_after = scope.read_after if scope is not None else None
+    candidates = [replica for replica in replicas if replica.serves(read_after)]
+    if not candidates:
+        return None
+    return candidates[next(_next_replica) % len(candidates)]
+
+
+async def _monitor_replicas() -> None:
+    while True:
+        await asyncio.sleep(REPLICA_CHECK_SECONDS)
+        await asyncio.gather(*(replica.check() for replica in replicas))
+
+
+# ---------- lifecycle ----------
+async def open_async_pool(wait: bool = True, warm: Sequence[PreparedStatement] = ()) -> AsyncConnectionPool:
+    """Create and open the pool; called from the FastAPI lifespan (needs a running loop).
+
+    warm lists the statements to PREPARE on every connection (see the module
+    docstring). wait=False returns without waiting for the first
+    connections, for a start while the database is down; the pool keeps
+    trying in the background.
+    """
+    global async_pool, _monitor, _warm_statements
+    _warm_statements = tuple(warm)
+    if async_pool is None:
+        async_pool = AsyncConnectionPool(
+            DATABASE_URL,
+            min_size=ASYNC_DB_POOL_MIN,
+            max_size=ASYNC_DB_POOL_MAX,
+            timeout=ASYNC_DB_POOL_ACQUIRE_TIMEOUT,
+            max_idle=ASYNC_DB_POOL_MAX_IDLE,
+            max_lifetime=ASYNC_DB_POOL_MAX_LIFETIME,
+            kwargs={"options": _CONNECT_OPTIONS},
+            connection_class=PreparingAsyncConnection,
+            configure=_prepare_warm_statements,
+            open=False,
+        )
+        await async_pool.open(wait=wait)
+        logger.info(f"Async connection pool opened ({ASYNC_DB_POOL_MIN}-{ASYNC_DB_POOL_MAX} connections)")
+        if wait and ASYNC_DB_POOL_WARM:
+            await _warm_pool(async_pool, ASYNC_DB_POOL_WARM)
+    if DATABASE_READ_URLS and not replicas:
+        replicas.extend(Replica(url, i) for i, url in enumerate(DATABASE_READ_URLS))
+        # A replica that is down must not stop startup; its pool keeps retrying
+        for replica in replicas:
+            await replica.pool.open(wait=False)
+        await asyncio.gather(*(replica.check() for replica in replicas))
+        _monitor = asyncio.create_task(_monitor_replicas())
+        in_rotation = sum(replica.healthy for replica in replicas)
+        logger.info(f"Read replicas: {in_rotation} of {len(replicas)} in rotation")
+    return async_pool
+
+
+async def close_async_pool() -> None:
+    global async_pool, _monitor
+    if _monitor is not None:
+        _monitor.cancel()
+        with suppress(asyncio.CancelledError):
+            await _monitor
+        _monitor = None
+    for replica in replicas:
+        await replica.pool.close()
+    replicas.clear()
+    if async_pool is not None:
+        await async_pool.close()
+        async_pool = None
+
+
+@asynccontextmanager
+async def get_async_connection(intent: str = WRITE):
+    """Borrow a connection; an open transaction is committed on a clean exit, rolled back on error.
+
+    intent=READ allows a replica (read-only, so nothing is committed there);
+    WRITE, and READ without a suitable replica, use the primary, guarded by
+    backend.circuit_breaker.db_breaker.
+    """
+    if async_pool is None:
+        raise RuntimeError("async connection pool is not open")
+    replica = _pick_replica() if intent == READ and replicas else None
+    conn = None
+    if replica is not None:
+        try:
+            conn = await replica.pool.getconn()
+        except Exception as e:
+            replica.mark_failed(e)
+            replica_stats["primary_fallbacks"] += 1
+    if conn is not None:
+        replica.stats["reads"] += 1
+        replica_stats["replica_reads"] += 1
+        try:
+            yield conn
+        except psycopg.OperationalError as e:
+            replica.mark_failed(e)
+            raise
+        finally:
+            with suppress(psycopg.Error):
+                await conn.rollback()
+            await replica.pool.putconn(conn)
+        return
+    if intent == READ:
+        replica_stats["primary_reads"] += 1
+    db_breaker.before_call()
+    try:
+        async with async_pool.connection() as conn:
+            yield conn
+    except PoolTimeout as e:
+        # Not one connection could be opened: the server is down, not busy
+        db_breaker.record_failure(e, force=async_pool.get_stats().get("pool_size", 0) == 0)
+        raise
+    except Exception as e:
+        db_breaker.record_failure(e)
+        raise
+    else:
+        db_breaker.record_success()
+
+
+async def execute_prepared_async(cur, stmt: PreparedStatement, params: tuple = ()):
+    """Async counterpart of backend.db.execute_prepared."""
+    with timed_query(stmt.metric or stmt.name, stmt, params):
+        prepared = getattr(cur.connection, "prepared", None)
+        if prepared is None:
+            await cur.execute(*stmt.inline(params))
+            return
+        if stmt.name not in prepared:
+            await cur.execute(f"PREPARE {stmt.name} AS {stmt.sql}")
+            prepared.add(stmt.name)
+        await cur.execute(_execute_literal(stmt, params))
+
+
+def _execute_literal(stmt: PreparedStatement, params: tuple) -> sql.Composable:
+    if not stmt.nparams:
+        return sql.SQL(f"EXECUTE {stmt.name}")
+    return sql.SQL(f"EXECUTE {stmt.name} ({{}})").format(sql.SQL(", ").join(map(sql.Literal, params)))
+
+
+def async_pool_stats() -> dict:
+    if async_pool is None:
+        return {"open": False}
+    stats = async_pool.get_stats()
+    result = {
+        "open": True,
+        "min": async_pool.min_size,
+        "max": async_pool.max_size,
+        "size": stats.get("pool_size", 0),
+        "idle": stats.get("pool_available", 0),
+        "waiting": stats.get("requests_waiting", 0),
+        "requests": stats.get("requests_num", 0),
+        "timeouts": stats.get("requests_errors", 0),
+        "wait_ms_total": stats.get("requests_wait_ms", 0),
+        "usage_ms_total": stats.get("usage_ms", 0),
+    }
+    if replicas:
+        result["replicas"] = [replica.snapshot() for replica in replicas]
+        result["routing"] = dict(replica_stats, max_lag_seconds=REPLICA_MAX_LAG_SECONDS)
+    return result
@@ -0,0 +1,92 @@
+# backend/bench_results.py
+"""
+Compare the old four-query /api/results flow with the single-statement
+results engine.
+
+Run in root: python -m backend.bench_results [question_code ...] [--rounds N]
+"""
+import argparse
+import statistics
+import time
+
+from backend.db import get_db_connection
+from backend.results import query_results
+
+
+def legacy_results(cur, question_code):
+    """The pre-engine flow: four statements, merged in Python."""
+    cur.execute(
+        "SELECT option_select, option_code, option_text FROM options WHERE question_code = %s ORDER BY id",
+        (question_code,),
+    )
+    options = cur.fetchall()
+    cur.execute(
+        "SELECT option_select, COUNT(*)::float FROM responses WHERE question_code = %s GROUP BY option_select",
+        (question_code,),
+    )
+    single = cur.fetchall()
+    cur.execute(
+        "SELECT option_select, COALESCE(SUM(weight),0)::float FROM checkbox_responses "
+        "WHERE question_code = %s GROUP BY option_select",
+        (question_code,),
+    )
+    checkbox = cur.fetchall()
+    cur.execute(
+        """
+        SELECT COUNT(*) FROM (
+            SELECT user_uuid FROM responses WHERE question_code = %s
+            UNION ALL
+            SELECT user_uuid FROM checkbox_responses WHERE question_code = %s
+        ) AS all_votes
+        """,
+        (question_code, question_code),
+    )
+    total = cur.fetchone()[0]
+    counts = {}
+    for sel, votes in single + checkbox:
+        counts[sel] = counts.get(sel, 0) + votes
+    return [(sel, counts.get(sel, 0)) for sel, _, _ in options], total
+
+
+def timed(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "mean": statistics.mean(samples),
+        "p50": samples[len(samples) // 2],
+        "p95": samples[int(len(samples) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("question_codes", nargs="*")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            codes = args.question_codes
+            if not codes:
+                cur.execute("SELECT question_code FROM questions ORDER BY id LIMIT 20")
+                codes = [row[0] for row in cur.fetchall()]
+
+            paths = {
+                "legacy (4 queries)": lambda: [legacy_results(cur, q) for q in codes],
+                "engine live (1 stmt)": lambda: [query_results(cur, q, live=True) for q in codes],
+                "engine tallies (1 stmt)": lambda: [query_results(cur, q) for q in codes],
+            }
+            print(f"{len(codes)} questions x {args.rounds} rounds, ms per round")
+            for label, fn in paths.items():
+                fn()  # warm up / PREPARE
+                stats = timed(fn, args.rounds)
+                print(f"  {label:<26} mean {stats['mean']:8.3f}  p50 {stats['p50']:8.3f}  p95 {stats['p95']:8.3f}")
+        conn.rollback()
+
+
+if __name__ == "__main__":
+    main()
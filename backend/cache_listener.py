@@ -0,0 +1,167 @@
+# backend/cache_listener.py
+"""
+Cross-worker cache invalidation over Postgres LISTEN/NOTIFY.
+
+The import scripts (import_setup.py, import_songs.py, update_soundtracks_urls.py)
+send NOTIFY on CACHE_CHANNEL with the name of the region they changed, e.g.
+"catalog" or "soundtracks", in the same transaction as their writes. Every
+worker runs one CacheListener on a dedicated connection (outside
+connection_pool) and calls the handler registered for that region.
+
+A payload may carry details after a colon, e.g. "results:1_1,1_2" (the
+questions whose tallies changed). Handlers registered with
+register_detailed() receive the union of the details of a burst of
+notifications, or None when everything must be treated as changed.
+
+If the listener connection drops, notifications sent in the meantime are
+lost, so after reconnecting every registered region is refreshed once.
+"""
+import logging
+import os
+import select
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+CACHE_CHANNEL = "teen_poll_cache"
+# Payload meaning "refresh everything"
+ALL_REGIONS = "*"
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7900
+
+ENABLED = os.getenv("CACHE_LISTENER_ENABLED", "true").lower() not in ("0", "false", "no")
+
+# How often the listener wakes up to check for shutdown; notifications
+# themselves are handled as soon as they arrive.
+POLL_INTERVAL = float(os.getenv("CACHE_LISTENER_POLL_SECONDS", "1.0"))
+RECONNECT_MAX_DELAY = float(os.getenv("CACHE_LISTENER_RECONNECT_MAX_SECONDS", "30"))
+
+
+def cache_payloads(region: str, details: Optional[Iterable[str]] = None) -> List[str]:
+    """NOTIFY payloads for region, with details split to respect the payload limit."""
+    if details is None:
+        return [region]
+    payloads, current = [], ""
+    for item in details:
+        candidate = f"{current},{item}" if current else f"{region}:{item}"
+        if len(candidate.encode("utf-8")) > MAX_PAYLOAD_BYTES and current:
+            payloads.append(current)
+            candidate = f"{region}:{item}"
+        current = candidate
+    if current:
+        payloads.append(current)
+    return payloads
+
+
+def notify_cache_change(cursor, region: str, details: Optional[Iterable[str]] = None) -> None:
+    """Queue a cache-change notification; it is delivered when the transaction commits.
+
+    details are split over as many notifications as the payload limit needs.
+    """
+    for payload in cache_payloads(region, details):
+        cursor.execute("SELECT pg_notify(%s, %s)", (CACHE_CHANNEL, payload))
+
+
+class CacheListener:
+    """Background thread that LISTENs on CACHE_CHANNEL and dispatches region handlers."""
+
+    def __init__(self, dsn: str, channel: str = CACHE_CHANNEL):
+        self.dsn = dsn
+        self.channel = channel
+        self._handlers: Dict[str, Callable[[], object]] = {}
+        self._detailed: Dict[str, Callable[[Optional[Set[str]]], object]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, region: str, handler: Callable[[], object]) -> None:
+        self._handlers[region] = handler
+
+    def register_detailed(self, region: str, handler: Callable[[Optional[Set[str]]], object]) -> None:
+        """Like register(), but handler(details) gets the payload details (None = all)."""
+        self._detailed[region] = handler
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-listener", daemon=True)
+        self._thread.start()
+        logger.info(f"Cache listener started on channel {self.channel}")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        logger.info("Cache listener stopped")
+
+    def dispatch(self, payloads: Iterable[str]) -> None:
+        """Run the handler of each region once; unknown regions are ignored."""
+        details: Dict[str, Optional[Set[str]]] = {}
+        for payload in payloads:
+            region, sep, rest = payload.partition(":")
+            if region == ALL_REGIONS:
+                details = {r: None for r in set(self._handlers) | set(self._detailed)}
+                break
+            if not sep:
+                details[region] = None
+            elif region not in details or details[region] is not None:
+                details.setdefault(region, set()).update(filter(None, rest.split(",")))
+
+        for region in sorted(details):
+            handler = self._handlers.get(region)
+            if handler is not None:
+                try:
+                    handler()
+                    logger.info(f"Cache region '{region}' refreshed")
+                except Exception as e:
+                    logger.error(f"Failed to refresh cache region '{region}': {e}")
+            detailed = self._detailed.get(region)
+            if detailed is not None:
+                try:
+                    detailed(details[region])
+                except Exception as e:
+                    logger.error(f"Failed to handle change in cache region '{region}': {e}")
+
+    def _run(self) -> None:
+        delay = 1.0
+        connected_before = False
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.channel};")
+                if connected_before:
+                    # Anything sent while we were disconnected was missed
+                    self.dispatch([ALL_REGIONS])
+                connected_before = True
+                delay = 1.0
+                self._listen(conn)
+            except Exception as e:
+                logger.error(f"Cache listener connection failed, retrying in {delay:.0f}s: {e}")
+                self._stop.wait(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def _listen(self, conn) -> None:
+        while not self._stop.is_set():
+            readable, _, _ = select.select([conn], [], [], POLL_INTERVAL)
+            if not readable:
+                continue
+            conn.poll()
+            # Coalesce a burst of notifications into one refresh per region
+            regions = {n.payload or ALL_REGIONS for n in conn.notifies}
+            conn.notifies.clear()
+            if regions:
+                self.dispatch(regions)
@@ -0,0 +1,380 @@
+# backend/catalog.py
+"""
+In-memory snapshots of the setup tables (categories, blocks, questions, options)
+and of the soundtrack/playlist tables.
+
+These tables only change when backend/import_setup.py or import_songs.py run,
+so the API serves them from immutable snapshots instead of checking out a
+pooled connection per request. A reload builds a complete new snapshot and
+swaps it in with a single reference assignment, so readers always see one
+consistent version.
+
+Each snapshot carries a content digest. Unlike the version counter it is the
+same on every worker and across restarts, which makes it usable for ETags.
+
+Every reload from Postgres also writes the rows to CATALOG_SNAPSHOT_PATH /
+SOUNDTRACK_SNAPSHOT_PATH (empty disables), so a worker that starts while
+the database is down can serve the last known catalog from disk
+(load_catalog_from_disk / load_soundtracks_from_disk).
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+import psycopg2
+from fastapi.encoders import jsonable_encoder
+
+from backend.db import get_db_connection
+from backend.query_metrics import timed_query
+
+logger = logging.getLogger(__name__)
+
+CATALOG_SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT_PATH", "catalog_snapshot.json")
+SOUNDTRACK_SNAPSHOT_PATH = os.getenv("SOUNDTRACK_SNAPSHOT_PATH", "soundtrack_snapshot.json")
+
+
+@dataclass(frozen=True)
+class QuestionMeta:
+    """Denormalized question/category fields copied into every vote row."""
+    question_code: str
+    question_text: str
+    question_number: int
+    category_id: int
+    category_name: str
+    category_text: Optional[str]
+    block_number: int
+    option_selects: FrozenSet[str]
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """One consistent, read-only view of the setup tables.
+
+    Row dicts are shared between requests and must not be mutated.
+    """
+    version: int
+    digest: str
+    loaded_at: datetime
+    categories: Tuple[dict, ...]
+    blocks_by_category: Mapping[int, Tuple[dict, ...]]
+    questions_by_block: Mapping[str, Tuple[dict, ...]]
+    questions_by_code: Mapping[str, dict]
+    options_by_question: Mapping[str, Tuple[dict, ...]]
+    meta_by_question: Mapping[str, QuestionMeta]
+
+    def blocks(self, category_id: int) -> Tuple[dict, ...]:
+        return self.blocks_by_category.get(category_id, ())
+
+    def questions(self, category_id: int, block_number: int) -> Tuple[dict, ...]:
+        return self.questions_by_block.get(block_key(category_id, block_number), ())
+
+    def question(self, question_code: str) -> Optional[dict]:
+        return self.questions_by_code.get(question_code)
+
+    def options(self, question_code: str) -> Tuple[dict, ...]:
+        return self.options_by_question.get(question_code, ())
+
+    def meta(self, question_code: str) -> Optional[QuestionMeta]:
+        return self.meta_by_question.get(question_code)
+
+
+def block_key(category_id: int, block_number: int) -> str:
+    """Canonical block code, e.g. (1, 2) -> "1_2"."""
+    return f"{category_id}_{block_number}"
+
+
+def parse_block_code(block_code: str) -> Tuple[int, int]:
+    """Split "1_1" into (category_id, block_number); raises ValueError if malformed."""
+    parts = block_code.split('_')
+    if len(parts) != 2:
+        raise ValueError("Invalid block code format")
+    return int(parts[0]), int(parts[1])
+
+
+@dataclass(frozen=True)
+class SoundtrackSnapshot:
+    """Read-only view of soundtracks, playlists and playlist songs.
+
+    playlists / songs_by_playlist are None when the playlist tables are not
+    present in this database; callers fall back to querying live.
+    """
+    version: int
+    digest: str
+    loaded_at: datetime
+    soundtracks: Tuple[dict, ...]
+    playlist_tags: Tuple[str, ...]
+    playlists: Optional[Tuple[dict, ...]]
+    playlists_by_id: Optional[Mapping[int, dict]]
+    songs_by_playlist: Optional[Mapping[int, Tuple[dict, ...]]]
+
+    def playlist(self, playlist_id: int) -> Optional[dict]:
+        return self.playlists_by_id.get(playlist_id)
+
+    def playlist_songs(self, playlist_id: int) -> Tuple[dict, ...]:
+        return self.songs_by_playlist.get(playlist_id, ())
+
+
+_snapshot: Optional[CatalogSnapshot] = None
+_reload_lock = threading.Lock()
+
+_soundtracks: Optional[SoundtrackSnapshot] = None
+_soundtracks_lock = threading.Lock()
+
+
+def _fetch_all(cur, name: str, query: str) -> List[dict]:
+    with timed_query(f"catalog.{name}", query):
+        cur.execute(query)
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+
+def _fetch_optional(cur, name: str, query: str) -> Optional[List[dict]]:
+    """Like _fetch_all, but return None if the table does not exist."""
+    cur.execute("SAVEPOINT optional_table")
+    try:
+        return _fetch_all(cur, name, query)
+    except psycopg2.errors.UndefinedTable as e:
+        cur.execute("ROLLBACK TO SAVEPOINT optional_table")
+        logger.warning(f"Optional table missing, serving it live instead: {e}")
+        return None
+
+
+def _digest(*parts) -> str:
+    """Stable content hash of the loaded rows."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()[:32]
+
+
+def _group(rows: List[dict], key) -> Mapping:
+    grouped: Dict = {}
+    for row in rows:
+        grouped.setdefault(key(row), []).append(row)
+    return MappingProxyType({k: tuple(v) for k, v in grouped.items()})
+
+
+def _build_meta(categories: List[dict], questions: List[dict], options: List[dict]) -> Mapping[str, QuestionMeta]:
+    """Index of what the vote path needs per question (questions JOIN categories)."""
+    categories_by_id = {c["id"]: c for c in categories}
+    selects: Dict[str, set] = {}
+    for o in options:
+        selects.setdefault(o["question_code"], set()).add(o["option_select"])
+
+    index = {}
+    for q in questions:
+        category = categories_by_id.get(q["category_id"])
+        if category is None:
+            continue
+        index[q["question_code"]] = QuestionMeta(
+            question_code=q["question_code"],
+            question_text=q["question_text"],
+            question_number=q["question_number"],
+            category_id=q["category_id"],
+            category_name=category["category_name"],
+            category_text=category["category_text"],
+            block_number=q["block_number"],
+            option_selects=frozenset(selects.get(q["question_code"], ())),
+        )
+    return MappingProxyType(index)
+
+
+def _load_snapshot(version: int) -> CatalogSnapshot:
+    """Read all four setup tables in one read-only transaction."""
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+                categories = _fetch_all(cur, "categories", "SELECT * FROM categories ORDER BY id")
+                blocks = _fetch_all(cur, "blocks", "SELECT * FROM blocks ORDER BY category_id, block_number")
+                questions = _fetch_all(
+                    cur,
+                    "questions",
+                    "SELECT * FROM questions ORDER BY category_id, block_number, question_number",
+                )
+                options = _fetch_all(cur, "options", "SELECT * FROM options ORDER BY question_code, option_select")
+        finally:
+            conn.rollback()
+
+    snapshot = _build_catalog(version, categories, blocks, questions, options)
+    _save_rows(CATALOG_SNAPSHOT_PATH, snapshot.digest,
+               {"categories": categories, "blocks": blocks, "questions": questions, "options": options})
+    return snapshot
+
+
+def _build_catalog(version: int, categories: List[dict], blocks: List[dict], questions: List[dict],
+                   options: List[dict], digest: Optional[str] = None) -> CatalogSnapshot:
+    return CatalogSnapshot(
+        version=version,
+        digest=digest or _digest(categories, blocks, questions, options),
+        loaded_at=datetime.now(timezone.utc),
+        categories=tuple(categories),
+        blocks_by_category=_group(blocks, lambda r: r["category_id"]),
+        questions_by_block=_group(questions, lambda r: block_key(r["category_id"], r["block_number"])),
+        questions_by_code=MappingProxyType({q["question_code"]: q for q in questions}),
+        options_by_question=_group(options, lambda r: r["question_code"]),
+        meta_by_question=_build_meta(categories, questions, options),
+    )
+
+
+def reload_catalog() -> CatalogSnapshot:
+    """Load a fresh snapshot from Postgres and swap it in atomically.
+
+    Concurrent reloads are serialized; readers keep using the previous
+    snapshot until the new one is fully built.
+    """
+    global _snapshot
+    with _reload_lock:
+        version = (_snapshot.version + 1) if _snapshot else 1
+        snapshot = _load_snapshot(version)
+        _snapshot = snapshot
+    logger.info(
+        f"Catalog v{snapshot.version} loaded: {len(snapshot.categories)} categories, "
+        f"{len(snapshot.questions_by_code)} questions"
+    )
+    return snapshot
+
+
+def get_catalog() -> CatalogSnapshot:
+    """Return the current snapshot, loading it on first use."""
+    snapshot = _snapshot
+    if snapshot is None:
+        snapshot = reload_catalog()
+    return snapshot
+
+
+def _load_soundtracks(version: int) -> SoundtrackSnapshot:
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+                soundtracks = _fetch_all(cur, "soundtracks", "SELECT * FROM soundtracks ORDER BY id")
+                playlists = _fetch_optional(cur, "playlists", "SELECT * FROM playlists ORDER BY id")
+                songs = None
+                if playlists is not None:
+                    songs = _fetch_optional(
+                        cur,
+                        "playlist_songs",
+                        """
+                        SELECT ps.*, s.*
+                        FROM playlist_songs ps
+                        JOIN soundtracks s ON ps.song_id = s.id
+                        ORDER BY ps.playlist_id, ps.order_number
+                        """,
+                    )
+        finally:
+            conn.rollback()
+
+    snapshot = _build_soundtracks(version, soundtracks, playlists, songs)
+    _save_rows(SOUNDTRACK_SNAPSHOT_PATH, snapshot.digest,
+               {"soundtracks": soundtracks, "playlists": playlists, "songs": songs})
+    return snapshot
+
+
+def _build_soundtracks(version: int, soundtracks: List[dict], playlists: Optional[List[dict]],
+                       songs: Optional[List[dict]], digest: Optional[str] = None) -> SoundtrackSnapshot:
+    # Playlist detail endpoints need both tables; serve them live otherwise
+    if songs is None:
+        playlists = None
+
+    tags = []
+    for row in soundtracks:
+        tag = row.get("playlist_tag")
+        if tag and tag not in tags:
+            tags.append(tag)
+
+    return SoundtrackSnapshot(
+        version=version,
+        digest=digest or _digest(soundtracks, playlists, songs),
+        loaded_at=datetime.now(timezone.utc),
+        soundtracks=tuple(soundtracks),
+        playlist_tags=tuple(tags),
+        playlists=tuple(playlists) if playlists is not None else None,
+        playlists_by_id=MappingProxyType({p["id"]: p for p in playlists}) if playlists is not None else None,
+        songs_by_playlist=_group(songs, lambda r: r["playlist_id"]) if songs is not None else None,
+    )
+
+
+def reload_soundtracks() -> SoundtrackSnapshot:
+    """Load a fresh soundtrack/playlist snapshot and swap it in atomically."""
+    global _soundtracks
+    with _soundtracks_lock:
+        version = (_soundtracks.version + 1) if _soundtracks else 1
+        snapshot = _load_soundtracks(version)
+        _soundtracks = snapshot
+    logger.info(f"Soundtracks v{snapshot.version} loaded: {len(snapshot.soundtracks)} tracks")
+    return snapshot
+
+
+def get_soundtracks() -> SoundtrackSnapshot:
+    """Return the current soundtrack snapshot, loading it on first use."""
+    snapshot = _soundtracks
+    if snapshot is None:
+        snapshot = reload_soundtracks()
+    return snapshot
+
+
+# ---------- on-disk copies (start without the database) ----------
+def _save_rows(path: str, digest: str, rows: dict) -> None:
+    """Write the rows behind a snapshot to path, atomically; failures only log."""
+    if not path:
+        return
+    # Per process: every worker rewrites the same file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"digest": digest, "saved_at": datetime.now(timezone.utc).isoformat(),
+                       "rows": jsonable_encoder(rows)}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"Could not write snapshot file {path}: {e}")
+
+
+def _read_rows(path: str) -> Optional[dict]:
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Unreadable snapshot file {path}: {e}")
+        return None
+
+
+def load_catalog_from_disk() -> Optional[CatalogSnapshot]:
+    """Install the catalog last saved by reload_catalog(); None if there is no usable file."""
+    global _snapshot
+    saved = _read_rows(CATALOG_SNAPSHOT_PATH)
+    if saved is None:
+        return None
+    rows = saved["rows"]
+    with _reload_lock:
+        version = (_snapshot.version + 1) if _snapshot else 1
+        snapshot = _build_catalog(version, rows["categories"], rows["blocks"], rows["questions"],
+                                  rows["options"], digest=saved["digest"])
+        _snapshot = snapshot
+    logger.warning(f"Catalog v{snapshot.version} loaded from {CATALOG_SNAPSHOT_PATH} (saved {saved['saved_at']})")
+    return snapshot
+
+
+def load_soundtracks_from_disk() -> Optional[SoundtrackSnapshot]:
+    """Install the soundtracks last saved by reload_soundtracks(); None if there is no usable file."""
+    global _soundtracks
+    saved = _read_rows(SOUNDTRACK_SNAPSHOT_PATH)
+    if saved is None:
+        return None
+    rows = saved["rows"]
+    with _soundtracks_lock:
+        version = (_soundtracks.version + 1) if _soundtracks else 1
+        snapshot = _build_soundtracks(version, rows["soundtracks"], rows["playlists"], rows["songs"],
+                                      digest=saved["digest"])
+        _soundtracks = snapshot
+    logger.warning(f"Soundtracks v{snapshot.version} loaded from {SOUNDTRACK_SNAPSHOT_PATH} "
+                   f"(saved {saved['saved_at']})")
+    return snapshot
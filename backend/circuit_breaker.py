@@ -0,0 +1,153 @@
+# backend/circuit_breaker.py
+"""
+Circuit breaker around the primary database.
+
+Both connection helpers (backend.db.get_db_connection and
+backend.async_db.get_async_connection) report connection-level failures
+here. After DB_BREAKER_FAILURES consecutive ones the breaker opens: for
+DB_BREAKER_RESET_SECONDS every borrow fails at once with
+DatabaseUnavailable instead of waiting on connect or pool timeouts. Then
+one borrow is let through as a probe (half-open); its success closes the
+breaker and runs the on_close callbacks (e.g. replaying spooled votes),
+its failure opens it again.
+
+Only errors that mean "Postgres is unreachable" count: connection
+failures, administrator shutdowns and a pool that cannot open a single
+connection. Constraint violations, cancelled statements and pool
+exhaustion under load leave the breaker alone.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+import psycopg
+import psycopg2
+from psycopg_pool import PoolTimeout as AsyncPoolTimeout
+
+logger = logging.getLogger(__name__)
+
+BREAKER_FAILURES = int(os.getenv("DB_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("DB_BREAKER_RESET_SECONDS", "10"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# admin_shutdown, crash_shutdown, cannot_connect_now
+_OUTAGE_SQLSTATES = {"57P01", "57P02", "57P03"}
+
+
+class DatabaseUnavailable(Exception):
+    """Postgres is unreachable, or the breaker is open; retry_after is a hint in seconds."""
+
+    def __init__(self, message: str = "database unavailable", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_outage(e: BaseException) -> bool:
+    """True for errors that mean the database cannot be reached at all."""
+    if isinstance(e, DatabaseUnavailable):
+        return True
+    if isinstance(e, AsyncPoolTimeout):
+        # An OperationalError without SQLSTATE, but it means the pool is busy;
+        # get_async_connection counts it only when the pool has no connection
+        return False
+    if isinstance(e, psycopg2.OperationalError):
+        code = e.pgcode
+    elif isinstance(e, psycopg.OperationalError):
+        code = e.sqlstate
+    else:
+        return False
+    # No SQLSTATE: the connection itself failed; class 08 is connection_exception
+    return code is None or code.startswith("08") or code in _OUTAGE_SQLSTATES
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.threshold = failures
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self.on_close: List[Callable[[], None]] = []
+        self.stats = {"opened": 0, "rejected": 0, "last_error": None}
+
+    def retry_after(self) -> float:
+        if self.state == CLOSED:
+            return 0.0
+        return max(self.reset_seconds - (time.monotonic() - self._opened_at), 1.0)
+
+    def before_call(self) -> None:
+        """Raise DatabaseUnavailable unless a borrow may go to the database now."""
+        if self.state == CLOSED:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN and now - self._opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+                self._probe_started = None
+            if self.state == HALF_OPEN:
+                # One probe at a time; a probe that never reported back is replaced
+                if self._probe_started is None or now - self._probe_started >= self.reset_seconds:
+                    self._probe_started = now
+                    return
+            if self.state == CLOSED:
+                return
+            self.stats["rejected"] += 1
+        raise DatabaseUnavailable("database unavailable (circuit open)", retry_after=self.retry_after())
+
+    def record_success(self) -> None:
+        if self.state == CLOSED and not self._failures:
+            return
+        with self._lock:
+            reopened = self.state != CLOSED
+            self.state = CLOSED
+            self._failures = 0
+            self._probe_started = None
+        if reopened:
+            logger.info("Database reachable again; circuit closed")
+            for callback in self.on_close:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"Circuit close callback failed: {e}")
+
+    def record_failure(self, e: BaseException, force: bool = False) -> None:
+        """Count e if it is an outage (or force); open the circuit at the threshold."""
+        if isinstance(e, DatabaseUnavailable) or not (force or is_outage(e)):
+            return
+        with self._lock:
+            self._failures += 1
+            self.stats["last_error"] = str(e).strip()[:200]
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.threshold):
+                self._open()
+
+    def trip(self, reason: str) -> None:
+        """Open the circuit now, e.g. when the database is down at startup."""
+        with self._lock:
+            self.stats["last_error"] = reason
+            self._open()
+
+    def _open(self) -> None:
+        if self.state != OPEN:
+            self.stats["opened"] += 1
+            logger.warning(f"Database circuit open for {self.reset_seconds:.0f}s: {self.stats['last_error']}")
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_started = None
+
+    def snapshot(self) -> dict:
+        return dict(
+            self.stats,
+            state=self.state,
+            consecutive_failures=self._failures,
+            failure_threshold=self.threshold,
+            reset_seconds=self.reset_seconds,
+            retry_after_seconds=round(self.retry_after(), 1),
+        )
+
+
+db_breaker = CircuitBreaker()
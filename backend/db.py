@@ -1,10 +1,27 @@
 # backend/db.py
 import os
+import re
 import logging
+import threading
+import time
+from collections import deque
 from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
 
 import psycopg2
-from psycopg2.pool import ThreadedConnectionPool
+import psycopg2.extensions
+from psycopg2.pool import PoolError
+
+try:
+    from backend.circuit_breaker import db_breaker
+    from backend.query_metrics import timed_query
+except ModuleNotFoundError as e:
+    if e.name != "backend":
+        raise
+    # Loaded as a plain module by scripts run in backend/ (cd backend; from db import ...)
+    from circuit_breaker import db_breaker
+    from query_metrics import timed_query
 
 # Load .env locally; no effect in prod if env vars are already set
 try:
@@ -20,25 +37,380 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL is not set in environment or .env file")
 
+# Optional read replicas, comma-separated; request handlers route read-only
+# queries to them (backend/async_db.py). Background threads stay on DATABASE_URL.
+DATABASE_READ_URLS = [url.strip() for url in os.getenv("DATABASE_READ_URL", "").split(",") if url.strip()]
+
+# Pool sizing and recycling (seconds); FastAPI runs sync handlers on up to 40 threads
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "20"))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "5"))
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+# Connections opened (and given the hot PREPAREs) at startup instead of on first use
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", str(DB_POOL_MIN)))
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """Connection that remembers which named statements were PREPAREd on it."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        # Bookkeeping for ConnectionPool (time.monotonic())
+        self.opened_at = time.monotonic()
+        self.idle_since = self.opened_at
+        self.checked_out_at = 0.0
+
+@dataclass(frozen=True)
+class PreparedStatement:
+    """A named statement using $1..$n placeholders, PREPAREd once per connection."""
+    name: str
+    sql: str
+    nparams: int
+    # /query-metrics name, for a family of statements of one shape (default: name)
+    metric: Optional[str] = None
+
+    def inline(self, params: tuple = ()):
+        """The same statement with %s placeholders, for running it unprepared."""
+        order = [int(n) - 1 for n in re.findall(r"\$(\d+)", self.sql)]
+        return re.sub(r"\$\d+", "%s", self.sql), tuple(params[i] for i in order)
+
+    def execute_sql(self) -> str:
+        """EXECUTE of this statement with %s placeholders for its parameters."""
+        if not self.nparams:
+            return f"EXECUTE {self.name}"
+        return f"EXECUTE {self.name} ({', '.join(['%s'] * self.nparams)})"
+
+def execute_prepared(cur, stmt: PreparedStatement, params: tuple = ()):
+    """EXECUTE stmt on cur's connection, PREPAREing it first if this connection hasn't yet.
+
+    Prepared statements are session state and survive rollbacks, so each
+    pooled connection plans a statement once for its whole lifetime.
+    """
+    with timed_query(stmt.metric or stmt.name, stmt, params):
+        prepared = getattr(cur.connection, "prepared", None)
+        if prepared is None:
+            # Not one of our pooled connections; nowhere to remember the PREPARE
+            cur.execute(*stmt.inline(params))
+            return
+        if stmt.name not in prepared:
+            cur.execute(f"PREPARE {stmt.name} AS {stmt.sql}")
+            prepared.add(stmt.name)
+        cur.execute(stmt.execute_sql(), params if stmt.nparams else None)
+
+def prepare_statements(conn, statements: Sequence[PreparedStatement]) -> int:
+    """PREPARE every statement not yet prepared on conn; returns how many were.
+
+    One that fails (say, its table does not exist yet) is logged and left
+    for execute_prepared to PREPARE on first use. Leaves conn idle.
+    """
+    done = 0
+    for stmt in statements:
+        if stmt.name in conn.prepared:
+            continue
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"PREPARE {stmt.name} AS {stmt.sql}")
+            conn.prepared.add(stmt.name)
+            done += 1
+        except psycopg2.Error as e:
+            logger.warning(f"Could not PREPARE {stmt.name}: {e}")
+        finally:
+            conn.rollback()
+    return done
+
+class PoolTimeout(PoolError):
+    """No connection became free within the acquire timeout."""
+
+class _Waiter:
+    """A thread queued in getconn(); woken with a connection or a free slot."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.conn = None
+        self.may_open = False
+
+class ConnectionPool:
+    """
+    Thread-safe pool of PreparingConnections.
+
+    Unlike psycopg2's ThreadedConnectionPool, getconn() waits up to
+    acquire_timeout for a connection instead of failing at once, and
+    waiters are served first come, first served: a returned connection is
+    handed straight to the oldest waiter. Connections idle longer than
+    max_idle (beyond minconn) or older than max_lifetime are closed and
+    replaced on the next checkout. stats() reports the gauges served by
+    /db-pool-status.
+
+    warm() opens connections ahead of demand; every connection the pool
+    opens from then on PREPAREs the warm-up statements before first use.
+    """
+
+    def __init__(self, dsn: str, minconn: int, maxconn: int, acquire_timeout: float,
+                 max_idle: float, max_lifetime: float, **connect_kwargs):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.connect_kwargs = connect_kwargs
+        self._lock = threading.Lock()
+        self._idle = deque()          # oldest-returned on the left
+        self._waiters = deque()
+        self._size = 0                # open connections plus ones being opened
+        self._in_use = 0
+        self._closed = False
+        self._prepare_on_open: Sequence[PreparedStatement] = ()
+        self._counters = {
+            "opened": 0, "recycled": 0, "timeouts": 0, "acquires": 0,
+            "acquire_ms_total": 0.0, "acquire_ms_max": 0.0,
+            "checkouts": 0, "checkout_ms_total": 0.0, "checkout_ms_max": 0.0,
+        }
+        for _ in range(minconn):
+            try:
+                conn = self._open()
+            except psycopg2.OperationalError as e:
+                # Database down at startup: start empty, getconn() connects on demand
+                logger.warning(f"Connection pool starting without connections: {e}")
+                break
+            self._idle.append(conn)
+            self._size += 1
+
+    def _open(self):
+        conn = psycopg2.connect(self.dsn, connection_factory=PreparingConnection, **self.connect_kwargs)
+        if self._prepare_on_open:
+            try:
+                prepare_statements(conn, self._prepare_on_open)
+            except Exception:
+                self._close(conn)
+                raise
+        with self._lock:
+            self._counters["opened"] += 1
+        return conn
+
+    def warm(self, count: int, statements: Sequence[PreparedStatement] = ()) -> int:
+        """Have count connections (at most maxconn) open with statements PREPAREd; returns the pool size.
+
+        Connections the pool opens later PREPARE statements as well.
+        """
+        self._prepare_on_open = tuple(statements)
+        # Check out count at once, so the pool has to open any it lacks
+        borrowed: List = []
+        try:
+            while len(borrowed) < min(count, self.maxconn):
+                borrowed.append(self.getconn())
+            for conn in borrowed:
+                prepare_statements(conn, self._prepare_on_open)
+        finally:
+            for conn in borrowed:
+                self.putconn(conn)
+        with self._lock:
+            return self._size
+
+    def _expired(self, conn, now: float) -> bool:
+        return conn.closed or now - conn.opened_at > self.max_lifetime
+
+    @staticmethod
+    def _close(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    # ---------- checkout ----------
+    def getconn(self, timeout: Optional[float] = None):
+        """Borrow a connection, waiting up to timeout (default acquire_timeout) seconds."""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        stale = []
+        waiter = None
+        conn = None
+        may_open = False
+        with self._lock:
+            if self._closed:
+                raise PoolError("connection pool is closed")
+            # Queue behind existing waiters so nobody barges ahead of them
+            if not self._waiters:
+                while self._idle:
+                    candidate = self._idle.pop()
+                    if self._expired(candidate, started):
+                        stale.append(candidate)
+                        self._size -= 1
+                        continue
+                    conn = candidate
+                    break
+                if conn is None and self._size < self.maxconn:
+                    self._size += 1
+                    may_open = True
+            if conn is None and not may_open:
+                waiter = _Waiter()
+                self._waiters.append(waiter)
+        self._discard(stale)
+
+        if waiter is not None:
+            waiter.event.wait(timeout)
+            with self._lock:
+                if waiter.conn is None and not waiter.may_open:
+                    self._waiters.remove(waiter)
+                    self._counters["timeouts"] += 1
+                    raise PoolTimeout(f"no database connection free within {timeout:.1f}s")
+            conn, may_open = waiter.conn, waiter.may_open
+
+        if may_open:
+            try:
+                conn = self._open()
+            except Exception:
+                self._release_slot()
+                raise
+        return self._checked_out(conn, started)
+
+    def _checked_out(self, conn, started: float):
+        now = time.monotonic()
+        conn.checked_out_at = now
+        elapsed_ms = (now - started) * 1000
+        with self._lock:
+            self._in_use += 1
+            self._counters["acquires"] += 1
+            self._counters["acquire_ms_total"] += elapsed_ms
+            self._counters["acquire_ms_max"] = max(self._counters["acquire_ms_max"], elapsed_ms)
+        return conn
+
+    # ---------- return ----------
+    def putconn(self, conn, close: bool = False) -> None:
+        """Return a borrowed connection; rolls back an open transaction like psycopg2's pools."""
+        now = time.monotonic()
+        if not conn.closed and not close:
+            status = conn.info.transaction_status
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                close = True
+            elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception:
+                    close = True
+        close = close or self._closed or self._expired(conn, now)
+        held_ms = (now - conn.checked_out_at) * 1000
+
+        stale = []
+        with self._lock:
+            self._in_use -= 1
+            self._counters["checkouts"] += 1
+            self._counters["checkout_ms_total"] += held_ms
+            self._counters["checkout_ms_max"] = max(self._counters["checkout_ms_max"], held_ms)
+            if close:
+                self._counters["recycled"] += 1
+            elif self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.conn = conn
+                waiter.event.set()
+                return
+            else:
+                conn.idle_since = now
+                self._idle.append(conn)
+                stale = self._trim_idle(now)
+        if close:
+            self._close(conn)
+            self._release_slot()
+        self._discard(stale)
+
+    def _release_slot(self) -> None:
+        """A connection went away: let the oldest waiter open a new one."""
+        with self._lock:
+            if self._waiters and not self._closed:
+                waiter = self._waiters.popleft()
+                waiter.may_open = True
+                waiter.event.set()
+            else:
+                self._size -= 1
+
+    def _trim_idle(self, now: float) -> list:
+        # Caller holds the lock; the least recently used idle connections sit on the left
+        stale = []
+        while self._idle and self._size > self.minconn and now - self._idle[0].idle_since > self.max_idle:
+            stale.append(self._idle.popleft())
+            self._size -= 1
+        return stale
+
+    def _discard(self, stale: list) -> None:
+        if not stale:
+            return
+        for conn in stale:
+            self._close(conn)
+        with self._lock:
+            self._counters["recycled"] += len(stale)
+
+    def discard_idle(self) -> None:
+        """Close every idle connection, e.g. once an outage is over and they are all dead."""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        self._discard(idle)
+        # Each closed connection frees its slot: to the oldest waiter, or off _size
+        for _ in idle:
+            self._release_slot()
+
+    def closeall(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+        for conn in idle:
+            self._close(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            c = dict(self._counters)
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": len(self._waiters),
+                "opened": c["opened"],
+                "recycled": c["recycled"],
+                "timeouts": c["timeouts"],
+                "acquire_ms_avg": round(c["acquire_ms_total"] / c["acquires"], 3) if c["acquires"] else 0.0,
+                "acquire_ms_max": round(c["acquire_ms_max"], 3),
+                "checkout_ms_avg": round(c["checkout_ms_total"] / c["checkouts"], 3) if c["checkouts"] else 0.0,
+                "checkout_ms_max": round(c["checkout_ms_max"], 3),
+            }
+
 # Create a connection pool once at startup
 try:
-    connection_pool = ThreadedConnectionPool(
-        minconn=1,
-        maxconn=10,
-        dsn=DATABASE_URL,
-        options="-c client_encoding=utf8"
+    connection_pool = ConnectionPool(
+        DATABASE_URL,
+        minconn=DB_POOL_MIN,
+        maxconn=DB_POOL_MAX,
+        acquire_timeout=DB_POOL_ACQUIRE_TIMEOUT,
+        max_idle=DB_POOL_MAX_IDLE,
+        max_lifetime=DB_POOL_MAX_LIFETIME,
+        # Same session time zone as backend/async_db.py, so created_at is UTC
+        options="-c client_encoding=utf8 -c timezone=UTC",
     )
 except Exception as e:
     logger.error(f"Error creating connection pool: {e}")
     raise
 
+# Connections idle through an outage are broken; don't hand them out afterwards
+db_breaker.on_close.append(connection_pool.discard_idle)
+
 @contextmanager
 def get_db_connection():
-    """Yield a pooled connection and always return it to the pool."""
+    """Yield a pooled connection and always return it to the pool.
+
+    Raises DatabaseUnavailable at once while db_breaker is open.
+    """
+    db_breaker.before_call()
     conn = None
     try:
         conn = connection_pool.getconn()
         yield conn
+    except Exception as e:
+        db_breaker.record_failure(e)
+        raise
+    else:
+        db_breaker.record_success()
     finally:
         if conn is not None:
             connection_pool.putconn(conn)
@@ -0,0 +1,175 @@
+# backend/http_cache.py
+"""
+ETag / conditional-GET helpers and a pre-serialized response cache for
+endpoints served from in-memory snapshots.
+
+The ETag is derived from the snapshot's content digest plus the route key, so
+it is identical across workers and restarts and changes whenever the data does.
+Each content coding is its own representation with its own strong ETag
+("<hash>-gzip", "<hash>-br"). A matching If-None-Match is answered with a
+bare 304 before any body is built.
+
+On a miss the payload is encoded to JSON once and compressed with gzip (and
+brotli when available) in a worker thread, off the event loop; later
+requests for the same route/key are answered with the stored bytes.
+Entries are grouped by region and dropped as soon as the region's digest
+changes, i.e. when a new snapshot is loaded.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+try:
+    import brotli
+except ImportError:
+    # brotli is optional; gzip is always available
+    brotli = None
+
+CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "public, max-age=300, stale-while-revalidate=86400")
+MAX_ENTRIES_PER_REGION = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 512
+CONTENT_CODINGS = ("gzip", "br")
+
+
+def make_etag(digest: str, *key: Any) -> str:
+    """Strong ETag for one route/key of a snapshot."""
+    raw = "|".join([digest, *(str(k) for k in key)])
+    return '"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def coded_etag(etag: str, coding: Optional[str]) -> str:
+    """The ETag of etag's representation in a content coding (None: identity)."""
+    return etag if coding is None else etag[:-1] + "-" + coding + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match covers etag (RFC 9110 weak comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def cache_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+
+
+def encode_json(payload: Any) -> bytes:
+    """Serialize a payload the way FastAPI would, but compactly and only once."""
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    etag: str
+    identity: bytes
+    gzip: Optional[bytes]
+    br: Optional[bytes]
+
+    @classmethod
+    def build(cls, etag: str, body: bytes) -> "CachedBody":
+        if len(body) < MIN_COMPRESS_BYTES:
+            return cls(etag, body, None, None)
+        return cls(
+            etag,
+            body,
+            gzip.compress(body, compresslevel=9, mtime=0),
+            brotli.compress(body, quality=11) if brotli else None,
+        )
+
+    def to_response(self, request: Request) -> Response:
+        accepted = _accepted_encodings(request)
+        for coding, body in (("br", self.br), ("gzip", self.gzip)):
+            if body is not None and coding in accepted:
+                headers = cache_headers(coded_etag(self.etag, coding))
+                headers["Content-Encoding"] = coding
+                return Response(content=body, media_type="application/json", headers=headers)
+        return Response(content=self.identity, media_type="application/json", headers=cache_headers(self.etag))
+
+
+def _accepted_encodings(request: Request) -> set:
+    accepted = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if coding:
+            accepted.add(coding.lower())
+    return accepted
+
+
+class ResponseCache:
+    """Finished response bodies per (region, key), valid for one region digest."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES_PER_REGION):
+        self.max_entries = max_entries
+        self._regions: Dict[str, Tuple[str, "OrderedDict[Tuple, CachedBody]"]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, region: str, digest: str, key: Tuple) -> Optional[CachedBody]:
+        with self._lock:
+            current = self._regions.get(region)
+            if current is None or current[0] != digest:
+                return None
+            entry = current[1].get(key)
+            if entry is not None:
+                current[1].move_to_end(key)
+            return entry
+
+    def put(self, region: str, digest: str, key: Tuple, entry: CachedBody) -> None:
+        with self._lock:
+            current = self._regions.get(region)
+            if current is None or current[0] != digest:
+                current = (digest, OrderedDict())
+                self._regions[region] = current
+            entries = current[1]
+            entries[key] = entry
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def invalidate(self, region: Optional[str] = None) -> None:
+        with self._lock:
+            if region is None:
+                self._regions.clear()
+            else:
+                self._regions.pop(region, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {region: len(entries) for region, (_, entries) in self._regions.items()}
+
+
+response_cache = ResponseCache()
+
+
+async def cached_json(request: Request, region: str, digest: str, key: Tuple,
+                      build: Callable[[], Any]) -> Response:
+    """Serve build() as JSON through the response cache, honouring If-None-Match.
+
+    build() only runs on a cache miss, and a 304 costs no lookup at all, so
+    repeat requests do no DB work, no encoding and no compression.
+    """
+    etag = make_etag(digest, region, *key)
+    for coding in (None, *CONTENT_CODINGS):
+        if etag_matches(request, coded_etag(etag, coding)):
+            return Response(status_code=304, headers=cache_headers(coded_etag(etag, coding)))
+
+    entry = response_cache.get(region, digest, key)
+    if entry is None:
+        entry = await asyncio.to_thread(CachedBody.build, etag, encode_json(build()))
+        response_cache.put(region, digest, key, entry)
+    return entry.to_response(request)
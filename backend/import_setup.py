@@ -8,6 +8,9 @@ import pandas as pd
 # Load environment variables
 load_dotenv()
 
+# Must match CACHE_CHANNEL in backend/cache_listener.py
+CACHE_CHANNEL = "teen_poll_cache"
+
 def clean_csv_value(value):
     """Clean CSV values and handle multi-line content"""
     if value is None:
@@ -158,6 +161,10 @@ def import_setup_data():
                 ))
         print(f"    SUCCESS: Options imported")
         
+        # Tell running API workers to reload their catalog snapshot;
+        # the notification is delivered when this transaction commits
+        cursor.execute("SELECT pg_notify(%s, %s)", (CACHE_CHANNEL, "catalog"))
+
         # Commit all data
         conn.commit()
         print("SUCCESS: All data imported successfully!")      
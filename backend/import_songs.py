@@ -7,6 +7,9 @@ from db import get_db_connection
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CSV_PATH = os.path.join(BASE_DIR, "data", "soundtracks.csv")
 
+# Must match CACHE_CHANNEL in backend/cache_listener.py
+CACHE_CHANNEL = "teen_poll_cache"
+
 def import_soundtracks(csv_file=CSV_PATH):
     with get_db_connection() as conn:
         cur = conn.cursor()
@@ -42,6 +45,8 @@ def import_soundtracks(csv_file=CSV_PATH):
                     norm.get("file_url"),
                 ))
 
+        # Tell running API workers to reload soundtracks once this commits
+        cur.execute("SELECT pg_notify(%s, %s)", (CACHE_CHANNEL, "soundtracks"))
         conn.commit()
         print(f"✅ Soundtracks imported successfully from {csv_file}")
 
@@ -0,0 +1,243 @@
+# backend/query_metrics.py
+"""
+Per-statement latency histograms and the slow-query log.
+
+Every statement the service runs is timed under a stable name (the
+PREPARE name for PreparedStatements, otherwise a dotted "area.what" such
+as "playlists.songs") into a fixed-bucket histogram, exported by
+/query-metrics with count, errors, mean, max and p50/p95/p99 estimates.
+
+A statement slower than SLOW_QUERY_MS is logged with its SQL and the
+shape of its parameters (types only; values may be personal data). When
+SLOW_QUERY_EXPLAIN_RATE > 0, that fraction of slow read statements is
+re-run as EXPLAIN (ANALYZE, BUFFERS) in a read-only transaction off the
+request path, at most once per SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS per
+name; the latest plan per name is kept for /query-metrics. Writes are
+never explained, since ANALYZE executes the statement.
+"""
+import asyncio
+import bisect
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "250"))
+EXPLAIN_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_RATE", "0"))
+EXPLAIN_INTERVAL = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", "60"))
+
+# Upper bounds (ms); one more bucket counts everything slower
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_READ_SQL = re.compile(r"\s*(SELECT|WITH)\b", re.IGNORECASE)
+_WRITE_SQL = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|pg_notify|nextval|setval)\b", re.IGNORECASE)
+_PLACEHOLDER = re.compile(r"\$(\d+)")
+SQL_PREVIEW_CHARS = 500
+
+# The event loop keeps only weak references to tasks; hold EXPLAIN tasks until they finish
+_explain_tasks = set()
+
+
+def param_shape(params) -> str:
+    """Parameter types without their values, e.g. "(str, list[3], int)"."""
+    if params is None:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    shapes = []
+    for value in params:
+        if isinstance(value, (list, tuple)):
+            shapes.append(f"{type(value).__name__}[{len(value)}]")
+        else:
+            shapes.append(type(value).__name__)
+    return "(" + ", ".join(shapes) + ")"
+
+
+def _inline(sql: str, params) -> tuple:
+    """$n placeholders -> %s with params reordered to match (as PreparedStatement.inline)."""
+    if params is None or not _PLACEHOLDER.search(sql):
+        return sql, params
+    order = [int(n) - 1 for n in _PLACEHOLDER.findall(sql)]
+    return _PLACEHOLDER.sub("%s", sql), tuple(params[i] for i in order)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.slow = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, elapsed_ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation (max for the overflow bucket)."""
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return float(BUCKETS_MS[i]) if i < len(BUCKETS_MS) else round(self.max_ms, 3)
+        return 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "slow": self.slow,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": {f"le_{bound}": n for bound, n in zip(BUCKETS_MS, self.counts)} | {"inf": self.counts[-1]},
+        }
+
+
+class QueryMetrics:
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS, explain_rate: float = EXPLAIN_RATE,
+                 explain_interval: float = EXPLAIN_INTERVAL):
+        self.slow_ms = slow_ms
+        self.explain_rate = explain_rate
+        self.explain_interval = explain_interval
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+        self._plans: Dict[str, dict] = {}
+        self._explained_at: Dict[str, float] = {}
+
+    def observe(self, name: str, elapsed_ms: float, sql=None, params=None, ok: bool = True) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(elapsed_ms)
+            if not ok:
+                histogram.errors += 1
+            slow = elapsed_ms >= self.slow_ms
+            if slow:
+                histogram.slow += 1
+        if slow:
+            self._slow(name, elapsed_ms, sql, params)
+
+    def _slow(self, name: str, elapsed_ms: float, sql, params) -> None:
+        # PreparedStatement: log its SQL text
+        text = getattr(sql, "sql", sql)
+        preview = " ".join(text.split())[:SQL_PREVIEW_CHARS] if text else "?"
+        logger.warning(f"Slow query {name}: {elapsed_ms:.1f}ms; {preview} params={param_shape(params)}")
+        if text and self._should_explain(name, text):
+            self._explain(name, elapsed_ms, *_inline(text, params))
+
+    def _should_explain(self, name: str, sql: str) -> bool:
+        if self.explain_rate <= 0 or not _READ_SQL.match(sql) or _WRITE_SQL.search(sql):
+            return False
+        if random.random() >= self.explain_rate:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._explained_at.get(name, float("-inf")) < self.explain_interval:
+                return False
+            self._explained_at[name] = now
+        return True
+
+    def _explain(self, name: str, elapsed_ms: float, sql: str, params) -> None:
+        """Capture the plan off the caller's path: a task on the event loop, or a thread."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            task = loop.create_task(self._explain_async(name, elapsed_ms, sql, params))
+            _explain_tasks.add(task)
+            task.add_done_callback(_explain_tasks.discard)
+        else:
+            threading.Thread(target=self._explain_sync, args=(name, elapsed_ms, sql, params),
+                             name="query-explain", daemon=True).start()
+
+    async def _explain_async(self, name: str, elapsed_ms: float, sql: str, params) -> None:
+        # Imported here: backend.async_db times its own statements through this module
+        import psycopg
+        from backend.async_db import READ, get_async_connection
+        try:
+            async with get_async_connection(READ) as conn:
+                try:
+                    await conn.execute("SET TRANSACTION READ ONLY")
+                    cur = psycopg.AsyncClientCursor(conn)
+                    await cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql, params)
+                    plan = [row[0] for row in await cur.fetchall()]
+                finally:
+                    await conn.rollback()
+        except Exception as e:
+            logger.warning(f"EXPLAIN of slow query {name} failed: {e}")
+            return
+        self._record_plan(name, elapsed_ms, plan)
+
+    def _explain_sync(self, name: str, elapsed_ms: float, sql: str, params) -> None:
+        from backend.db import get_db_connection
+        try:
+            with get_db_connection() as conn:
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute("SET TRANSACTION READ ONLY")
+                        cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql, params)
+                        plan = [row[0] for row in cur.fetchall()]
+                finally:
+                    conn.rollback()
+        except Exception as e:
+            logger.warning(f"EXPLAIN of slow query {name} failed: {e}")
+            return
+        self._record_plan(name, elapsed_ms, plan)
+
+    def _record_plan(self, name: str, elapsed_ms: float, plan) -> None:
+        logger.info(f"Plan for slow query {name} ({elapsed_ms:.1f}ms):\n" + "\n".join(plan))
+        with self._lock:
+            self._plans[name] = {
+                "captured_at": datetime.now(timezone.utc).isoformat(),
+                "elapsed_ms": round(elapsed_ms, 3),
+                "plan": plan,
+            }
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            queries = {name: h.snapshot() for name, h in sorted(self._histograms.items())}
+            plans = dict(self._plans)
+        return {
+            "slow_query_ms": self.slow_ms,
+            "explain_rate": self.explain_rate,
+            "bucket_bounds_ms": list(BUCKETS_MS),
+            "queries": queries,
+            "plans": plans,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._plans.clear()
+            self._explained_at.clear()
+
+
+query_metrics = QueryMetrics()
+
+
+@contextmanager
+def timed_query(name: str, sql=None, params=None):
+    """Time the statement(s) run in the block under name; sql/params only feed the slow-query log."""
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        query_metrics.observe(name, (time.perf_counter() - started) * 1000, sql, params, ok=ok)
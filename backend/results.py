@@ -0,0 +1,300 @@
+# backend/results.py
+"""
+Results engine: option definitions, merged weighted votes and the response
+total for a question in one SQL statement, instead of the old flow of four
+queries (options, single counts, checkbox counts, total) merged in Python.
+
+Two forms of the statement exist:
+  RESULTS_FROM_TALLIES  reads the trigger-maintained question_tallies table
+                        (the normal path, O(options) per call)
+  RESULTS_LIVE          aggregates responses / checkbox_responses directly;
+                        used for reconciliation and benchmarking
+
+Both are PREPAREd once per pooled connection. Rows come back ordered by
+options.id; a question without options still yields one row carrying the
+total. See backend/bench_results.py for a comparison with the old path.
+HOT_STATEMENTS, the ones behind the request handlers, are PREPAREd on every
+pooled connection when it is opened (see main.py's lifespan).
+
+TALLIES_FOR_QUESTIONS reads the tallies of many questions in one grouped
+lookup (question_code = ANY($1)) for the batch /api/results endpoint, and
+TALLIES_BY_BIRTH_YEAR reads the per-birth-year cube behind ?by=age_band
+(schema_age_cube.sql). RESULTS_TREND buckets the hourly rollup
+(schema_hourly.sql) by hour, day or week; results_hourly.hour holds UTC
+wall-clock times, so the buckets are computed in UTC and returned aware.
+
+Every fetch_* helper has a *_async twin for the request handlers, running
+the same statement on backend.async_db's pool; the row handling is shared.
+The async twins are reads, so they may be served by a read replica.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from backend.async_db import READ, execute_prepared_async, get_async_connection
+from backend.db import PreparedStatement, execute_prepared, get_db_connection
+
+_SELECT_MERGED = """
+    totals AS (
+        SELECT COALESCE(SUM(total), 0)::bigint AS total_responses FROM counts
+    )
+    SELECT o.option_select, o.option_code, o.option_text,
+           c.votes, t.total_responses
+    FROM totals t
+    LEFT JOIN options o ON o.question_code = $1
+    LEFT JOIN counts c ON c.option_select = o.option_select
+    ORDER BY o.id
+"""
+
+RESULTS_FROM_TALLIES = PreparedStatement(
+    name="results_from_tallies",
+    sql="""
+    WITH counts AS (
+        SELECT option_select, votes, total
+        FROM question_tallies
+        WHERE question_code = $1
+    ),
+    """ + _SELECT_MERGED,
+    nparams=1,
+)
+
+RESULTS_LIVE = PreparedStatement(
+    name="results_live",
+    sql="""
+    WITH counts AS (
+        SELECT option_select, SUM(votes) AS votes, SUM(total) AS total
+        FROM (
+            SELECT option_select, COUNT(*)::float AS votes, COUNT(*) AS total
+            FROM responses
+            WHERE question_code = $1
+            GROUP BY option_select
+            UNION ALL
+            SELECT option_select, COALESCE(SUM(weight), 0)::float, COUNT(*)
+            FROM checkbox_responses
+            WHERE question_code = $1
+            GROUP BY option_select
+        ) AS per_table
+        GROUP BY option_select
+    ),
+    """ + _SELECT_MERGED,
+    nparams=1,
+)
+
+TALLIES_FOR_QUESTIONS = PreparedStatement(
+    name="tallies_for_questions",
+    sql="""
+    SELECT question_code, option_select, votes, total
+    FROM question_tallies
+    WHERE question_code = ANY($1::varchar[])
+    """,
+    nparams=1,
+)
+
+TALLIES_BY_BIRTH_YEAR = PreparedStatement(
+    name="tallies_by_birth_year",
+    sql="""
+    SELECT birth_year, option_select, votes, total
+    FROM results_by_birth_year
+    WHERE question_code = $1 AND total > 0
+    """,
+    nparams=1,
+)
+
+RESULTS_TREND = PreparedStatement(
+    name="results_trend",
+    sql="""
+    WITH buckets AS (
+        SELECT generate_series(
+            date_trunc($2::text, $3::timestamptz AT TIME ZONE 'UTC'),
+            ($4::timestamptz AT TIME ZONE 'UTC') - interval '1 microsecond',
+            ('1 ' || $2::text)::interval
+        ) AS start
+    )
+    SELECT b.start AT TIME ZONE 'UTC', h.option_select, SUM(h.votes), SUM(h.total)
+    FROM buckets b
+    LEFT JOIN results_hourly h
+        ON h.question_code = $1
+       AND h.hour >= b.start AND h.hour < b.start + ('1 ' || $2::text)::interval
+       AND h.hour >= $3::timestamptz AT TIME ZONE 'UTC' AND h.hour < $4::timestamptz AT TIME ZONE 'UTC'
+    GROUP BY b.start, h.option_select
+    ORDER BY b.start
+    """,
+    nparams=4,
+)
+TREND_BUCKETS = ("hour", "day", "week")
+
+HOT_STATEMENTS = (RESULTS_FROM_TALLIES, TALLIES_FOR_QUESTIONS, TALLIES_BY_BIRTH_YEAR, RESULTS_TREND)
+
+# (label, youngest age, oldest age or None); age is current year - birth year,
+# the same rule /api/validate-age applies
+AGE_BANDS = (
+    ("13-14", 13, 14),
+    ("15-16", 15, 16),
+    ("17-18", 17, 18),
+    ("19+", 19, None),
+)
+UNDER_AGE_BAND = "under 13"
+
+
+def age_band(birth_year: int, current_year: Optional[int] = None) -> str:
+    age = (current_year or datetime.now().year) - birth_year
+    for label, youngest, oldest in AGE_BANDS:
+        if age >= youngest and (oldest is None or age <= oldest):
+            return label
+    return UNDER_AGE_BAND
+
+
+def query_results(cur, question_code: str, live: bool = False) -> List[tuple]:
+    """Raw (option_select, option_code, option_text, votes, total_responses) rows."""
+    execute_prepared(cur, RESULTS_LIVE if live else RESULTS_FROM_TALLIES, (question_code,))
+    return cur.fetchall()
+
+
+def rows_to_tallies(rows: List[tuple]) -> Tuple[Dict[str, float], int]:
+    """(counts per option_select with at least one vote, total_responses)."""
+    counts = {sel: votes for sel, _, _, votes, _ in rows if sel is not None and votes is not None}
+    total = int(rows[0][4]) if rows else 0
+    return counts, total
+
+
+def rows_to_payload(question_code: str, rows: List[tuple]) -> dict:
+    """The /api/results response body for rows from query_results()."""
+    counts, total = rows_to_tallies(rows)
+    return {
+        "question_code": question_code,
+        "results": [
+            {"option_select": sel, "option_code": code, "option_text": text, "votes": counts.get(sel, 0)}
+            for sel, code, text, _, _ in rows
+            if sel is not None
+        ],
+        "total_responses": total,
+    }
+
+
+def fetch_tallies(question_code: str, live: bool = False) -> Tuple[Dict[str, float], int]:
+    """One round-trip on one pooled connection: (counts, total) for question_code."""
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                rows = query_results(cur, question_code, live=live)
+        finally:
+            conn.rollback()
+    return rows_to_tallies(rows)
+
+
+def query_many_tallies(cur, question_codes: Sequence[str]) -> Dict[str, Tuple[Dict[str, float], int]]:
+    """(counts, total) for every code in question_codes, from one query on cur.
+
+    Questions nobody has answered yet map to ({}, 0).
+    """
+    codes = list(dict.fromkeys(question_codes))
+    if not codes:
+        return {}
+    execute_prepared(cur, TALLIES_FOR_QUESTIONS, (codes,))
+    return group_many_tallies(codes, cur.fetchall())
+
+
+def group_many_tallies(question_codes: Sequence[str], rows: List[tuple]) -> Dict[str, Tuple[Dict[str, float], int]]:
+    tallies: Dict[str, Tuple[Dict[str, float], int]] = {code: ({}, 0) for code in question_codes}
+    for code, sel, votes, total in rows:
+        counts, running = tallies[code]
+        counts[sel] = votes
+        tallies[code] = (counts, running + int(total))
+    return tallies
+
+
+def fetch_many_tallies(question_codes: Sequence[str]) -> Dict[str, Tuple[Dict[str, float], int]]:
+    """query_many_tallies on a pooled connection of its own."""
+    if not question_codes:
+        return {}
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                return query_many_tallies(cur, question_codes)
+        finally:
+            conn.rollback()
+
+
+def fetch_age_band_tallies(question_code: str) -> Dict[str, Tuple[Dict[str, float], int]]:
+    """(counts, total) per age band label for question_code, from one indexed read of the cube."""
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                execute_prepared(cur, TALLIES_BY_BIRTH_YEAR, (question_code,))
+                rows = cur.fetchall()
+        finally:
+            conn.rollback()
+    return group_age_bands(rows)
+
+
+def group_age_bands(rows: List[tuple]) -> Dict[str, Tuple[Dict[str, float], int]]:
+    current_year = datetime.now().year
+    bands: Dict[str, Tuple[Dict[str, float], int]] = {}
+    for birth_year, sel, votes, total in rows:
+        band = age_band(birth_year, current_year)
+        counts, running = bands.get(band, ({}, 0))
+        counts[sel] = counts.get(sel, 0) + votes
+        bands[band] = (counts, running + int(total))
+    return bands
+
+
+def fetch_trend(question_code: str, bucket: str, start: datetime, end: datetime) -> List[Tuple[datetime, Dict[str, float], int]]:
+    """[(bucket start, counts, total)] for every bucket overlapping [start, end), empty ones included."""
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                execute_prepared(cur, RESULTS_TREND, (question_code, bucket, start, end))
+                rows = cur.fetchall()
+        finally:
+            conn.rollback()
+    return group_trend(rows)
+
+
+def group_trend(rows: List[tuple]) -> List[Tuple[datetime, Dict[str, float], int]]:
+    series: List[Tuple[datetime, Dict[str, float], int]] = []
+    for bucket_start, sel, votes, total in rows:
+        if not series or series[-1][0] != bucket_start:
+            series.append((bucket_start, {}, 0))
+        if sel is not None:
+            _, counts, running = series[-1]
+            counts[sel] = votes
+            series[-1] = (bucket_start, counts, running + int(total))
+    return series
+
+
+# ---------- asyncio twins (backend/async_db.py) ----------
+async def fetch_tallies_async(question_code: str, live: bool = False) -> Tuple[Dict[str, float], int]:
+    async with get_async_connection(READ) as conn:
+        async with conn.cursor() as cur:
+            await execute_prepared_async(cur, RESULTS_LIVE if live else RESULTS_FROM_TALLIES, (question_code,))
+            return rows_to_tallies(await cur.fetchall())
+
+
+async def query_many_tallies_async(cur, question_codes: Sequence[str]) -> Dict[str, Tuple[Dict[str, float], int]]:
+    codes = list(dict.fromkeys(question_codes))
+    if not codes:
+        return {}
+    await execute_prepared_async(cur, TALLIES_FOR_QUESTIONS, (codes,))
+    return group_many_tallies(codes, await cur.fetchall())
+
+
+async def fetch_many_tallies_async(question_codes: Sequence[str]) -> Dict[str, Tuple[Dict[str, float], int]]:
+    if not question_codes:
+        return {}
+    async with get_async_connection(READ) as conn:
+        async with conn.cursor() as cur:
+            return await query_many_tallies_async(cur, question_codes)
+
+
+async def fetch_age_band_tallies_async(question_code: str) -> Dict[str, Tuple[Dict[str, float], int]]:
+    async with get_async_connection(READ) as conn:
+        async with conn.cursor() as cur:
+            await execute_prepared_async(cur, TALLIES_BY_BIRTH_YEAR, (question_code,))
+            return group_age_bands(await cur.fetchall())
+
+
+async def fetch_trend_async(question_code: str, bucket: str, start: datetime,
+                            end: datetime) -> List[Tuple[datetime, Dict[str, float], int]]:
+    async with get_async_connection(READ) as conn:
+        async with conn.cursor() as cur:
+            await execute_prepared_async(cur, RESULTS_TREND, (question_code, bucket, start, end))
+            return group_trend(await cur.fetchall())
@@ -0,0 +1,188 @@
+# backend/results_cache.py
+"""
+In-process cache of per-question tallies for /api/results.
+
+Entries are keyed by question_code, bounded by an LRU limit
+(RESULTS_CACHE_MAX_ENTRIES) and expire after RESULTS_CACHE_TTL_SECONDS, so
+a popular question is read from Postgres at most once per TTL per worker.
+
+Votes written through this worker are applied to cached entries in place
+(write-through). To avoid counting a vote twice, a delta is only applied
+to an entry whose query started before the vote's transaction did; an
+entry that may or may not already include the vote is dropped instead.
+Votes written by other workers show up once the entry expires.
+
+Expired entries stay in the LRU until they are replaced or evicted, so
+peek() can still answer (stale, with its age) while Postgres is down.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from backend.votes import CHECKBOX_COLUMNS, RESPONSE_COLUMNS, VoteBatch
+
+MAX_ENTRIES = int(os.getenv("RESULTS_CACHE_MAX_ENTRIES", "2048"))
+TTL_SECONDS = float(os.getenv("RESULTS_CACHE_TTL_SECONDS", "2.0"))
+
+_CODE = RESPONSE_COLUMNS.index("question_code")
+_SELECT = RESPONSE_COLUMNS.index("option_select")
+_WEIGHT = CHECKBOX_COLUMNS.index("weight")
+
+
+@dataclass
+class Tallies:
+    """Weighted votes per option_select and the response-row total for one question."""
+    counts: Dict[str, float] = field(default_factory=dict)
+    total: int = 0
+    # time.monotonic() when the query that produced these numbers started
+    fetched_at: float = 0.0
+
+
+class ResultsCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl: float = TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tallies]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, question_code: str) -> Optional[Tallies]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(question_code)
+            if entry is None or now - entry.fetched_at > self.ttl:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(question_code)
+            self.hits += 1
+            return entry
+
+    def peek(self, question_code: str) -> Optional[Tallies]:
+        """The cached entry whatever its age, without counting a hit or miss."""
+        with self._lock:
+            return self._entries.get(question_code)
+
+    def put(self, question_code: str, tallies: Tallies) -> None:
+        with self._lock:
+            current = self._entries.get(question_code)
+            # Never replace a newer reading with an older one
+            if current is not None and current.fetched_at > tallies.fetched_at:
+                return
+            self._entries[question_code] = tallies
+            self._entries.move_to_end(question_code)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, question_code: str, load: Callable[[str], Tuple[Dict[str, float], int]]) -> Tallies:
+        """Cached tallies, or load(question_code) -> (counts, total) on a miss."""
+        entry = self.get(question_code)
+        if entry is not None:
+            return entry
+        started = time.monotonic()
+        counts, total = load(question_code)
+        entry = Tallies(counts=counts, total=total, fetched_at=started)
+        self.put(question_code, entry)
+        return entry
+
+    def get_or_load_many(
+        self,
+        question_codes: Sequence[str],
+        load_many: Callable[[List[str]], Dict[str, Tuple[Dict[str, float], int]]],
+    ) -> Dict[str, Tallies]:
+        """Like get_or_load for several questions; all misses are loaded with one load_many call."""
+        found: Dict[str, Tallies] = {}
+        missing: List[str] = []
+        for code in question_codes:
+            entry = self.get(code)
+            if entry is None:
+                missing.append(code)
+            else:
+                found[code] = entry
+        if missing:
+            started = time.monotonic()
+            for code, (counts, total) in load_many(missing).items():
+                entry = Tallies(counts=counts, total=total, fetched_at=started)
+                self.put(code, entry)
+                found[code] = entry
+        return {code: found[code] for code in question_codes}
+
+    async def get_or_load_async(
+        self, question_code: str, load: Callable[[str], Awaitable[Tuple[Dict[str, float], int]]]
+    ) -> Tallies:
+        """get_or_load with a coroutine loader."""
+        entry = self.get(question_code)
+        if entry is not None:
+            return entry
+        started = time.monotonic()
+        counts, total = await load(question_code)
+        entry = Tallies(counts=counts, total=total, fetched_at=started)
+        self.put(question_code, entry)
+        return entry
+
+    async def get_or_load_many_async(
+        self,
+        question_codes: Sequence[str],
+        load_many: Callable[[List[str]], Awaitable[Dict[str, Tuple[Dict[str, float], int]]]],
+    ) -> Dict[str, Tallies]:
+        """get_or_load_many with a coroutine loader."""
+        found: Dict[str, Tallies] = {}
+        missing: List[str] = []
+        for code in question_codes:
+            entry = self.get(code)
+            if entry is None:
+                missing.append(code)
+            else:
+                found[code] = entry
+        if missing:
+            started = time.monotonic()
+            for code, (counts, total) in (await load_many(missing)).items():
+                entry = Tallies(counts=counts, total=total, fetched_at=started)
+                self.put(code, entry)
+                found[code] = entry
+        return {code: found[code] for code in question_codes}
+
+    def apply_votes(self, batch: VoteBatch, write_started: float) -> None:
+        """Fold a committed batch into cached entries (see module docstring)."""
+        deltas: Dict[str, Tallies] = {}
+        for row in batch.responses:
+            d = deltas.setdefault(row[_CODE], Tallies())
+            d.counts[row[_SELECT]] = d.counts.get(row[_SELECT], 0) + 1.0
+            d.total += 1
+        for row in batch.checkbox:
+            d = deltas.setdefault(row[_CODE], Tallies())
+            d.counts[row[_SELECT]] = d.counts.get(row[_SELECT], 0) + row[_WEIGHT]
+            d.total += 1
+
+        with self._lock:
+            for question_code, delta in deltas.items():
+                entry = self._entries.get(question_code)
+                if entry is None:
+                    continue
+                if entry.fetched_at >= write_started:
+                    del self._entries[question_code]
+                    continue
+                counts = dict(entry.counts)
+                for sel, votes in delta.counts.items():
+                    counts[sel] = counts.get(sel, 0) + votes
+                # Replace rather than mutate: readers may hold the old entry
+                self._entries[question_code] = Tallies(counts, entry.total + delta.total, entry.fetched_at)
+
+    def invalidate(self, question_codes: Optional[Iterable[str]] = None) -> None:
+        with self._lock:
+            if question_codes is None:
+                self._entries.clear()
+                return
+            for code in question_codes:
+                self._entries.pop(code, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "ttl_seconds": self.ttl, "max_entries": self.max_entries}
+
+
+results_cache = ResultsCache()
@@ -0,0 +1,208 @@
+# backend/results_stream.py
+"""
+In-process pub/sub behind the /api/results/stream Server-Sent Events endpoint.
+
+Votes only mark question codes as changed: the vote path does so directly
+for votes written by this worker. Votes written by other workers send no
+NOTIFY (see backend/votes.py), so every RESULTS_STREAM_POLL_SECONDS all
+watched questions are marked changed as well. A single publisher thread
+wakes at most every RESULTS_STREAM_INTERVAL_SECONDS, reads the tallies of
+the changed questions that somebody is watching with one grouped query,
+and fans a delta out to each subscriber of those questions. Database load
+therefore follows the vote rate and the number of watched questions, not
+the number of open streams.
+
+A delta carries only the options whose vote count changed, with their new
+absolute values, plus the new total:
+
+    {"question_code": "1_2", "votes": {"B": 12.5}, "total_responses": 40}
+
+so a client that misses or repeats one still converges. A subscriber that
+falls RESULTS_STREAM_QUEUE_MAX events behind is closed; EventSource
+reconnects and starts from a fresh snapshot.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+STREAM_INTERVAL = float(os.getenv("RESULTS_STREAM_INTERVAL_SECONDS", "1.0"))
+# 0 disables polling: only this worker's own votes are streamed
+POLL_INTERVAL = float(os.getenv("RESULTS_STREAM_POLL_SECONDS", "2.0"))
+QUEUE_MAX = int(os.getenv("RESULTS_STREAM_QUEUE_MAX", "256"))
+
+LoadMany = Callable[[List[str]], Dict[str, Tuple[Dict[str, float], int]]]
+
+
+class Subscription:
+    """One open stream: the questions it watches and its event queue."""
+
+    def __init__(self, question_codes: Iterable[str], loop: asyncio.AbstractEventLoop):
+        self.question_codes = frozenset(question_codes)
+        self.loop = loop
+        self.queue: "asyncio.Queue[Optional[dict]]" = asyncio.Queue(maxsize=QUEUE_MAX)
+        self.closed = False
+        self.overflowed = False
+
+    def offer(self, event: Optional[dict]) -> None:
+        """Queue an event (None ends the stream); runs on the subscriber's event loop."""
+        if self.closed:
+            return
+        if event is not None and not self.queue.full():
+            self.queue.put_nowait(event)
+            return
+        # Shutting down, or too slow to keep up: end the stream, the client reconnects
+        self.closed = True
+        self.overflowed = event is not None
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class ResultsHub:
+    def __init__(self, interval: float = STREAM_INTERVAL, poll_interval: float = POLL_INTERVAL):
+        self.interval = interval
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._dirty: Set[str] = set()
+        self._last: Dict[str, Tuple[Dict[str, float], int]] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._load_many: Optional[LoadMany] = None
+        self.stats = {"published": 0, "loads": 0, "load_failures": 0, "dropped_subscribers": 0}
+
+    # ---------- subscribers ----------
+    def subscribe(self, question_codes: Iterable[str], loop: asyncio.AbstractEventLoop) -> Subscription:
+        sub = Subscription(question_codes, loop)
+        with self._lock:
+            for code in sub.question_codes:
+                self._subscribers.setdefault(code, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            for code in sub.question_codes:
+                watchers = self._subscribers.get(code)
+                if watchers is None:
+                    continue
+                watchers.discard(sub)
+                if not watchers:
+                    del self._subscribers[code]
+                    self._last.pop(code, None)
+                    self._dirty.discard(code)
+        if sub.overflowed:
+            self.stats["dropped_subscribers"] += 1
+
+    def seed(self, question_code: str, counts: Dict[str, float], total: int) -> None:
+        """Record what a new subscriber was sent, so the next delta is relative to it."""
+        with self._lock:
+            if question_code in self._subscribers and question_code not in self._last:
+                self._last[question_code] = (dict(counts), total)
+
+    # ---------- producers ----------
+    def mark_changed(self, question_codes: Optional[Iterable[str]]) -> None:
+        """Questions whose tallies changed (None = any of them). Thread-safe, cheap."""
+        with self._lock:
+            if question_codes is None:
+                self._dirty.update(self._subscribers)
+            else:
+                self._dirty.update(code for code in question_codes if code in self._subscribers)
+            if not self._dirty:
+                return
+        self._wake.set()
+
+    # ---------- publisher ----------
+    def start(self, load_many: LoadMany) -> None:
+        if self._thread is not None:
+            return
+        self._load_many = load_many
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="results-publisher", daemon=True)
+        self._thread.start()
+        logger.info(f"Results publisher started: interval {self.interval}s")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+        with self._lock:
+            subscribers = {sub for watchers in self._subscribers.values() for sub in watchers}
+        for sub in subscribers:
+            self._deliver(sub, None)
+        logger.info("Results publisher stopped")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            streams = len({sub for watchers in self._subscribers.values() for sub in watchers})
+            stats = dict(self.stats, streams=streams, watched_questions=len(self._subscribers),
+                         pending=len(self._dirty), interval_seconds=self.interval,
+                         poll_seconds=self.poll_interval)
+        return stats
+
+    def _run(self) -> None:
+        next_poll = time.monotonic() + self.poll_interval
+        while not self._stop.is_set():
+            self._wake.wait(max(next_poll - time.monotonic(), 0) if self.poll_interval else None)
+            if self._stop.is_set():
+                break
+            if self.poll_interval and time.monotonic() >= next_poll:
+                # Catch up on votes written by other workers
+                self.mark_changed(None)
+                next_poll = time.monotonic() + self.poll_interval
+            self._wake.clear()
+            self.publish()
+            # Coalesce everything that changes during the interval into one load
+            self._stop.wait(self.interval)
+
+    def publish(self) -> None:
+        with self._lock:
+            codes = sorted(self._dirty)
+            self._dirty.clear()
+        if not codes:
+            return
+        try:
+            tallies = self._load_many(codes)
+            self.stats["loads"] += 1
+        except Exception as e:
+            self.stats["load_failures"] += 1
+            logger.error(f"Results publisher failed to load {len(codes)} questions: {e}")
+            self.mark_changed(codes)
+            return
+
+        with self._lock:
+            events = []
+            for code in codes:
+                watchers = self._subscribers.get(code)
+                if not watchers or code not in tallies:
+                    continue
+                counts, total = tallies[code]
+                last_counts, last_total = self._last.get(code, ({}, None))
+                changed = {sel: v for sel, v in counts.items() if last_counts.get(sel) != v}
+                if not changed and total == last_total:
+                    continue
+                self._last[code] = (dict(counts), total)
+                event = {"question_code": code, "votes": changed, "total_responses": total}
+                events.extend((sub, event) for sub in watchers)
+        for sub, event in events:
+            self._deliver(sub, event)
+        self.stats["published"] += len(events)
+
+    @staticmethod
+    def _deliver(sub: Subscription, event: Optional[dict]) -> None:
+        try:
+            sub.loop.call_soon_threadsafe(sub.offer, event)
+        except RuntimeError:
+            # The subscriber's event loop is gone
+            pass
+
+
+results_hub = ResultsHub()
@@ -0,0 +1,182 @@
+# backend/results_summary.py
+"""
+Scheduled refresh of the results_summary materialized view and the
+"relaxed freshness" fallback built on it (see schema_results_summary.sql).
+
+Every RESULTS_SUMMARY_REFRESH_SECONDS one worker (whichever wins an
+advisory lock) runs REFRESH MATERIALIZED VIEW CONCURRENTLY, which does not
+block readers. Every worker then loads the view into memory; it is small
+(one row per question option).
+
+get_results normally reads live tallies. RESULTS_FRESHNESS_MODE decides
+when it may answer from the in-memory summary instead:
+  strict   never
+  auto     while RESULTS_RELAXED_INFLIGHT or more live loads are already
+           running in this worker (default)
+  relaxed  always
+and only while the summary is at most RESULTS_RELAXED_MAX_STALENESS_SECONDS
+old. Staleness is reported by /results-summary-status.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+import psycopg2
+
+from backend.db import get_db_connection
+from backend.query_metrics import timed_query
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = float(os.getenv("RESULTS_SUMMARY_REFRESH_SECONDS", "60"))
+FRESHNESS_MODE = os.getenv("RESULTS_FRESHNESS_MODE", "auto").lower()
+RELAXED_INFLIGHT = int(os.getenv("RESULTS_RELAXED_INFLIGHT", "6"))
+RELAXED_MAX_STALENESS = float(os.getenv("RESULTS_RELAXED_MAX_STALENESS_SECONDS", "300"))
+
+# Any constant works; it only has to be the same in every worker
+_REFRESH_LOCK_KEY = 0x7465656E
+
+
+class ResultsSummary:
+    def __init__(self, refresh_seconds: float = REFRESH_SECONDS, mode: str = FRESHNESS_MODE):
+        self.refresh_seconds = refresh_seconds
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._tallies: Dict[str, Tuple[Dict[str, float], int]] = {}
+        self.refreshed_at: Optional[datetime] = None
+        self._inflight = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.available = True
+        self.stats = {"refreshes": 0, "refresh_failures": 0, "last_refresh_ms": 0.0, "relaxed_served": 0}
+
+    # ---------- scheduler ----------
+    def start(self) -> None:
+        if self.refresh_seconds <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="results-summary", daemon=True)
+        self._thread.start()
+        logger.info(f"Results summary refresh every {self.refresh_seconds:.0f}s, freshness mode {self.mode}")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set() and self.available:
+            self.refresh()
+            self._stop.wait(self.refresh_seconds)
+
+    def refresh(self) -> None:
+        """Refresh the view if no other worker is doing so, then reload it into memory."""
+        started = time.perf_counter()
+        try:
+            with get_db_connection() as conn:
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT pg_try_advisory_xact_lock(%s)", (_REFRESH_LOCK_KEY,))
+                        refreshed = cur.fetchone()[0] and self._due(cur)
+                        if refreshed:
+                            with timed_query("results_summary.refresh"):
+                                cur.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY results_summary")
+                        conn.commit()
+                        with timed_query("results_summary.load"):
+                            cur.execute("SELECT question_code, option_select, votes, responses, refreshed_at FROM results_summary")
+                            rows = cur.fetchall()
+                finally:
+                    conn.rollback()
+        except psycopg2.errors.UndefinedTable:
+            self.available = False
+            logger.warning("results_summary does not exist (run backend/schema_results_summary.sql); refresh disabled")
+            return
+        except Exception as e:
+            self.stats["refresh_failures"] += 1
+            logger.error(f"Results summary refresh failed: {e}")
+            return
+
+        tallies: Dict[str, Tuple[Dict[str, float], int]] = {}
+        refreshed_at = None
+        for code, sel, votes, responses, row_refreshed_at in rows:
+            counts, total = tallies.get(code, ({}, 0))
+            counts[sel] = votes
+            tallies[code] = (counts, total + int(responses))
+            refreshed_at = row_refreshed_at
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._tallies = tallies
+            # An empty view carries no timestamp; it is as fresh as this read
+            self.refreshed_at = refreshed_at or datetime.now(timezone.utc)
+            if refreshed:
+                self.stats["refreshes"] += 1
+                self.stats["last_refresh_ms"] = round(elapsed_ms, 3)
+        if refreshed:
+            logger.info(f"Results summary refreshed: {len(rows)} rows in {elapsed_ms:.1f}ms")
+
+    def _due(self, cur) -> bool:
+        """False if another worker refreshed the view less than half a cadence ago."""
+        cur.execute("SELECT EXTRACT(EPOCH FROM NOW() - MAX(refreshed_at)) FROM results_summary")
+        age = cur.fetchone()[0]
+        return age is None or float(age) >= self.refresh_seconds / 2
+
+    # ---------- relaxed freshness ----------
+    def staleness(self) -> Optional[float]:
+        if self.refreshed_at is None:
+            return None
+        return max((datetime.now(timezone.utc) - self.refreshed_at).total_seconds(), 0.0)
+
+    @contextmanager
+    def live_load(self):
+        """Wrap a live tally read so the "auto" mode can see how busy the live path is."""
+        with self._lock:
+            self._inflight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._inflight -= 1
+
+    def relaxed_tallies(self, question_codes: Iterable[str]) -> Optional[Dict[str, Tuple[Dict[str, float], int]]]:
+        """Summary tallies for question_codes if the freshness mode allows them now, else None."""
+        if self.mode == "strict" or (self.mode == "auto" and self._inflight < RELAXED_INFLIGHT):
+            return None
+        staleness = self.staleness()
+        if staleness is None or staleness > RELAXED_MAX_STALENESS:
+            return None
+        with self._lock:
+            self.stats["relaxed_served"] += 1
+            return {code: self._tallies.get(code, ({}, 0)) for code in question_codes}
+
+    def stale_tallies(
+        self, question_codes: Iterable[str]
+    ) -> Optional[Tuple[Dict[str, Tuple[Dict[str, float], int]], float]]:
+        """(summary tallies, staleness in seconds) regardless of mode and age; None before the first load."""
+        staleness = self.staleness()
+        if staleness is None:
+            return None
+        with self._lock:
+            return {code: self._tallies.get(code, ({}, 0)) for code in question_codes}, staleness
+
+    def snapshot(self) -> dict:
+        staleness = self.staleness()
+        with self._lock:
+            return dict(
+                self.stats,
+                available=self.available,
+                mode=self.mode,
+                refresh_seconds=self.refresh_seconds,
+                refreshed_at=self.refreshed_at.isoformat() if self.refreshed_at else None,
+                staleness_seconds=round(staleness, 3) if staleness is not None else None,
+                questions=len(self._tallies),
+                live_loads_in_flight=self._inflight,
+            )
+
+
+results_summary = ResultsSummary()
@@ -0,0 +1,170 @@
+-- PostgreSQL schema for Teen Poll results by birth year
+-- Run after schema_results.sql. Safe to re-run: it recreates the triggers
+-- and rebuilds the cube from responses / checkbox_responses.
+--
+-- results_by_birth_year holds, per question, option and users.year_of_birth:
+--   votes = weighted votes (1 per single-choice row, weight per checkbox row)
+--   total = number of response rows
+-- /api/results/{question_code}?by=age_band folds birth years into age bands
+-- with one indexed read of this table instead of joining responses to users.
+--
+-- Statement-level triggers keep it current. Deleting a user cascades to
+-- their responses after the users row is gone, so a BEFORE DELETE trigger
+-- on users takes that user's votes out first and the response triggers
+-- only handle rows whose user still exists.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS results_by_birth_year (
+    question_code VARCHAR(50) NOT NULL,
+    option_select VARCHAR(10) NOT NULL,
+    birth_year INTEGER NOT NULL,
+    votes DOUBLE PRECISION NOT NULL DEFAULT 0,
+    total BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (question_code, option_select, birth_year)
+);
+
+-- ---------- responses (single choice, weight 1) ----------
+CREATE OR REPLACE FUNCTION age_cube_responses_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO results_by_birth_year AS t (question_code, option_select, birth_year, votes, total)
+    SELECT r.question_code, r.option_select, u.year_of_birth, COUNT(*), COUNT(*)
+    FROM new_rows r
+    JOIN users u ON u.user_uuid = r.user_uuid
+    GROUP BY r.question_code, r.option_select, u.year_of_birth
+    ORDER BY r.question_code, r.option_select, u.year_of_birth
+    ON CONFLICT (question_code, option_select, birth_year) DO UPDATE
+    SET votes = t.votes + EXCLUDED.votes,
+        total = t.total + EXCLUDED.total;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION age_cube_responses_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE results_by_birth_year t
+    SET votes = t.votes - d.votes,
+        total = t.total - d.total
+    FROM (
+        SELECT r.question_code, r.option_select, u.year_of_birth AS birth_year,
+               COUNT(*) AS votes, COUNT(*) AS total
+        FROM old_rows r
+        JOIN users u ON u.user_uuid = r.user_uuid
+        GROUP BY r.question_code, r.option_select, u.year_of_birth
+    ) d
+    WHERE t.question_code = d.question_code AND t.option_select = d.option_select
+      AND t.birth_year = d.birth_year;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ---------- checkbox_responses (weighted) ----------
+CREATE OR REPLACE FUNCTION age_cube_checkbox_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO results_by_birth_year AS t (question_code, option_select, birth_year, votes, total)
+    SELECT r.question_code, r.option_select, u.year_of_birth, COALESCE(SUM(r.weight), 0), COUNT(*)
+    FROM new_rows r
+    JOIN users u ON u.user_uuid = r.user_uuid
+    GROUP BY r.question_code, r.option_select, u.year_of_birth
+    ORDER BY r.question_code, r.option_select, u.year_of_birth
+    ON CONFLICT (question_code, option_select, birth_year) DO UPDATE
+    SET votes = t.votes + EXCLUDED.votes,
+        total = t.total + EXCLUDED.total;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION age_cube_checkbox_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE results_by_birth_year t
+    SET votes = t.votes - d.votes,
+        total = t.total - d.total
+    FROM (
+        SELECT r.question_code, r.option_select, u.year_of_birth AS birth_year,
+               COALESCE(SUM(r.weight), 0) AS votes, COUNT(*) AS total
+        FROM old_rows r
+        JOIN users u ON u.user_uuid = r.user_uuid
+        GROUP BY r.question_code, r.option_select, u.year_of_birth
+    ) d
+    WHERE t.question_code = d.question_code AND t.option_select = d.option_select
+      AND t.birth_year = d.birth_year;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ---------- users (votes leave the cube before the cascade) ----------
+CREATE OR REPLACE FUNCTION age_cube_user_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE results_by_birth_year t
+    SET votes = t.votes - d.votes,
+        total = t.total - d.total
+    FROM (
+        SELECT question_code, option_select, SUM(votes) AS votes, SUM(total) AS total
+        FROM (
+            SELECT question_code, option_select, COUNT(*)::float AS votes, COUNT(*) AS total
+            FROM responses
+            WHERE user_uuid = OLD.user_uuid
+            GROUP BY question_code, option_select
+            UNION ALL
+            SELECT question_code, option_select, COALESCE(SUM(weight), 0)::float, COUNT(*)
+            FROM checkbox_responses
+            WHERE user_uuid = OLD.user_uuid
+            GROUP BY question_code, option_select
+        ) AS per_table
+        GROUP BY question_code, option_select
+    ) d
+    WHERE t.question_code = d.question_code AND t.option_select = d.option_select
+      AND t.birth_year = OLD.year_of_birth;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Block writers while triggers are swapped and the cube rebuilt
+LOCK TABLE users, responses, checkbox_responses IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS trg_age_cube_responses_insert ON responses;
+CREATE TRIGGER trg_age_cube_responses_insert
+    AFTER INSERT ON responses
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION age_cube_responses_insert();
+
+DROP TRIGGER IF EXISTS trg_age_cube_responses_delete ON responses;
+CREATE TRIGGER trg_age_cube_responses_delete
+    AFTER DELETE ON responses
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION age_cube_responses_delete();
+
+DROP TRIGGER IF EXISTS trg_age_cube_checkbox_insert ON checkbox_responses;
+CREATE TRIGGER trg_age_cube_checkbox_insert
+    AFTER INSERT ON checkbox_responses
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION age_cube_checkbox_insert();
+
+DROP TRIGGER IF EXISTS trg_age_cube_checkbox_delete ON checkbox_responses;
+CREATE TRIGGER trg_age_cube_checkbox_delete
+    AFTER DELETE ON checkbox_responses
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION age_cube_checkbox_delete();
+
+DROP TRIGGER IF EXISTS trg_age_cube_user_delete ON users;
+CREATE TRIGGER trg_age_cube_user_delete
+    BEFORE DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION age_cube_user_delete();
+
+-- Rebuild from history
+TRUNCATE results_by_birth_year;
+INSERT INTO results_by_birth_year (question_code, option_select, birth_year, votes, total)
+SELECT v.question_code, v.option_select, u.year_of_birth, SUM(v.votes), SUM(v.total)
+FROM (
+    SELECT user_uuid, question_code, option_select, COUNT(*)::float AS votes, COUNT(*) AS total
+    FROM responses
+    GROUP BY user_uuid, question_code, option_select
+    UNION ALL
+    SELECT user_uuid, question_code, option_select, COALESCE(SUM(weight), 0)::float, COUNT(*)
+    FROM checkbox_responses
+    GROUP BY user_uuid, question_code, option_select
+) AS v
+JOIN users u ON u.user_uuid = v.user_uuid
+GROUP BY v.question_code, v.option_select, u.year_of_birth;
+
+COMMIT;
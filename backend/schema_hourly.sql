@@ -0,0 +1,137 @@
+-- PostgreSQL schema for Teen Poll hourly result rollups
+-- Run after schema_results.sql. Safe to re-run: it recreates the triggers
+-- and rebuilds the rollup from responses / checkbox_responses.
+--
+-- results_hourly holds, per question, hour (created_at truncated) and option:
+--   votes = weighted votes (1 per single-choice row, weight per checkbox row)
+--   total = number of response rows
+-- Rows without a created_at are left out. hour is UTC wall-clock time: the
+-- API's connection pools run with timezone=UTC, so created_at defaults to UTC
+-- (run this file, and other writers, with TimeZone=UTC as well).
+-- /api/results/{question_code}/trend reads only this table, so trend charts
+-- cost the same however many raw responses exist.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS results_hourly (
+    question_code VARCHAR(50) NOT NULL,
+    hour TIMESTAMP NOT NULL,
+    option_select VARCHAR(10) NOT NULL,
+    votes DOUBLE PRECISION NOT NULL DEFAULT 0,
+    total BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (question_code, hour, option_select)
+);
+
+-- ---------- responses (single choice, weight 1) ----------
+CREATE OR REPLACE FUNCTION hourly_responses_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO results_hourly AS t (question_code, hour, option_select, votes, total)
+    SELECT question_code, date_trunc('hour', created_at), option_select, COUNT(*), COUNT(*)
+    FROM new_rows
+    WHERE created_at IS NOT NULL
+    GROUP BY question_code, date_trunc('hour', created_at), option_select
+    ORDER BY question_code, option_select, date_trunc('hour', created_at)
+    ON CONFLICT (question_code, hour, option_select) DO UPDATE
+    SET votes = t.votes + EXCLUDED.votes,
+        total = t.total + EXCLUDED.total;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION hourly_responses_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE results_hourly t
+    SET votes = t.votes - d.votes,
+        total = t.total - d.total
+    FROM (
+        SELECT question_code, date_trunc('hour', created_at) AS hour, option_select,
+               COUNT(*) AS votes, COUNT(*) AS total
+        FROM old_rows
+        WHERE created_at IS NOT NULL
+        GROUP BY question_code, date_trunc('hour', created_at), option_select
+    ) d
+    WHERE t.question_code = d.question_code AND t.hour = d.hour AND t.option_select = d.option_select;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ---------- checkbox_responses (weighted) ----------
+CREATE OR REPLACE FUNCTION hourly_checkbox_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO results_hourly AS t (question_code, hour, option_select, votes, total)
+    SELECT question_code, date_trunc('hour', created_at), option_select, COALESCE(SUM(weight), 0), COUNT(*)
+    FROM new_rows
+    WHERE created_at IS NOT NULL
+    GROUP BY question_code, date_trunc('hour', created_at), option_select
+    ORDER BY question_code, option_select, date_trunc('hour', created_at)
+    ON CONFLICT (question_code, hour, option_select) DO UPDATE
+    SET votes = t.votes + EXCLUDED.votes,
+        total = t.total + EXCLUDED.total;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION hourly_checkbox_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE results_hourly t
+    SET votes = t.votes - d.votes,
+        total = t.total - d.total
+    FROM (
+        SELECT question_code, date_trunc('hour', created_at) AS hour, option_select,
+               COALESCE(SUM(weight), 0) AS votes, COUNT(*) AS total
+        FROM old_rows
+        WHERE created_at IS NOT NULL
+        GROUP BY question_code, date_trunc('hour', created_at), option_select
+    ) d
+    WHERE t.question_code = d.question_code AND t.hour = d.hour AND t.option_select = d.option_select;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Block writers while triggers are swapped and the rollup rebuilt
+LOCK TABLE responses, checkbox_responses IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS trg_hourly_responses_insert ON responses;
+CREATE TRIGGER trg_hourly_responses_insert
+    AFTER INSERT ON responses
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION hourly_responses_insert();
+
+DROP TRIGGER IF EXISTS trg_hourly_responses_delete ON responses;
+CREATE TRIGGER trg_hourly_responses_delete
+    AFTER DELETE ON responses
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION hourly_responses_delete();
+
+DROP TRIGGER IF EXISTS trg_hourly_checkbox_insert ON checkbox_responses;
+CREATE TRIGGER trg_hourly_checkbox_insert
+    AFTER INSERT ON checkbox_responses
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION hourly_checkbox_insert();
+
+DROP TRIGGER IF EXISTS trg_hourly_checkbox_delete ON checkbox_responses;
+CREATE TRIGGER trg_hourly_checkbox_delete
+    AFTER DELETE ON checkbox_responses
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION hourly_checkbox_delete();
+
+-- Rebuild from history
+TRUNCATE results_hourly;
+INSERT INTO results_hourly (question_code, hour, option_select, votes, total)
+SELECT question_code, hour, option_select, SUM(votes), SUM(total)
+FROM (
+    SELECT question_code, date_trunc('hour', created_at) AS hour, option_select,
+           COUNT(*)::float AS votes, COUNT(*) AS total
+    FROM responses
+    WHERE created_at IS NOT NULL
+    GROUP BY 1, 2, 3
+    UNION ALL
+    SELECT question_code, date_trunc('hour', created_at), option_select,
+           COALESCE(SUM(weight), 0)::float, COUNT(*)
+    FROM checkbox_responses
+    WHERE created_at IS NOT NULL
+    GROUP BY 1, 2, 3
+) AS counts
+GROUP BY question_code, hour, option_select;
+
+COMMIT;
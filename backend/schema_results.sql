@@ -132,3 +132,8 @@ CREATE INDEX idx_other_responses_created ON other_responses(created_at);
 CREATE INDEX idx_users_uuid ON users(user_uuid);
 CREATE INDEX idx_users_year ON users(year_of_birth);
 
+-- Per-question tallies maintained by triggers live in schema_tallies.sql (run it after this file)
+
+-- The results_summary materialized view (analyst rollup and relaxed-freshness fallback) lives in schema_results_summary.sql
+-- Results by birth year for /api/results/{code}?by=age_band live in schema_age_cube.sql
+-- Hourly result rollups for /api/results/{code}/trend live in schema_hourly.sql
\ No newline at end of file
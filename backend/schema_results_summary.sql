@@ -0,0 +1,30 @@
+-- PostgreSQL schema for the Teen Poll results rollup
+-- Run after schema_results.sql. Safe to re-run.
+--
+-- results_summary holds, per question and option, merged over responses and
+-- checkbox_responses:
+--   votes     = weighted votes (1 per single-choice row, weight per checkbox row)
+--   responses = number of response rows (SUM per question = total_responses)
+--   users     = number of distinct users who picked the option
+--   refreshed_at = when the view was last refreshed (same on every row)
+-- It is refreshed by the API's scheduler (backend/results_summary.py) with
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY, which needs the unique index below.
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS results_summary AS
+SELECT question_code,
+       option_select,
+       SUM(weight)::float AS votes,
+       COUNT(*) AS responses,
+       COUNT(DISTINCT user_uuid) AS users,
+       NOW() AS refreshed_at
+FROM (
+    SELECT question_code, option_select, user_uuid, 1.0::float AS weight
+    FROM responses
+    UNION ALL
+    SELECT question_code, option_select, user_uuid, COALESCE(weight, 0)::float
+    FROM checkbox_responses
+) AS all_votes
+GROUP BY question_code, option_select;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_results_summary_question_option
+    ON results_summary (question_code, option_select);
@@ -0,0 +1,127 @@
+-- PostgreSQL schema for Teen Poll derived result tallies
+-- Run after schema_results.sql. Safe to re-run: it recreates the triggers
+-- and rebuilds the tallies from responses / checkbox_responses.
+--
+-- question_tallies holds, per question and option:
+--   votes = weighted votes (1 per single-choice row, weight per checkbox row)
+--   total = number of response rows, so SUM(total) per question equals the
+--           "total_responses" reported by /api/results
+-- It is kept current by statement-level triggers, so every writer (the API,
+-- COPY flushes, fake-data uploads) updates it in the same transaction. The
+-- insert triggers upsert in key order (ORDER BY, as schema_age_cube.sql and
+-- schema_hourly.sql do), so concurrent votes lock tally rows in one order.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS question_tallies (
+    question_code VARCHAR(50) NOT NULL,
+    option_select VARCHAR(10) NOT NULL,
+    votes DOUBLE PRECISION NOT NULL DEFAULT 0,
+    total BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (question_code, option_select)
+);
+
+-- ---------- responses (single choice, weight 1) ----------
+CREATE OR REPLACE FUNCTION tally_responses_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO question_tallies AS t (question_code, option_select, votes, total)
+    SELECT question_code, option_select, COUNT(*), COUNT(*)
+    FROM new_rows
+    GROUP BY question_code, option_select
+    ORDER BY question_code, option_select
+    ON CONFLICT (question_code, option_select) DO UPDATE
+    SET votes = t.votes + EXCLUDED.votes,
+        total = t.total + EXCLUDED.total;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION tally_responses_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE question_tallies t
+    SET votes = t.votes - d.votes,
+        total = t.total - d.total
+    FROM (
+        SELECT question_code, option_select, COUNT(*) AS votes, COUNT(*) AS total
+        FROM old_rows
+        GROUP BY question_code, option_select
+    ) d
+    WHERE t.question_code = d.question_code AND t.option_select = d.option_select;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ---------- checkbox_responses (weighted) ----------
+CREATE OR REPLACE FUNCTION tally_checkbox_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO question_tallies AS t (question_code, option_select, votes, total)
+    SELECT question_code, option_select, COALESCE(SUM(weight), 0), COUNT(*)
+    FROM new_rows
+    GROUP BY question_code, option_select
+    ORDER BY question_code, option_select
+    ON CONFLICT (question_code, option_select) DO UPDATE
+    SET votes = t.votes + EXCLUDED.votes,
+        total = t.total + EXCLUDED.total;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION tally_checkbox_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE question_tallies t
+    SET votes = t.votes - d.votes,
+        total = t.total - d.total
+    FROM (
+        SELECT question_code, option_select, COALESCE(SUM(weight), 0) AS votes, COUNT(*) AS total
+        FROM old_rows
+        GROUP BY question_code, option_select
+    ) d
+    WHERE t.question_code = d.question_code AND t.option_select = d.option_select;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Block writers while triggers are swapped and tallies rebuilt, so no vote
+-- is counted twice or missed
+LOCK TABLE responses, checkbox_responses IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS trg_tally_responses_insert ON responses;
+CREATE TRIGGER trg_tally_responses_insert
+    AFTER INSERT ON responses
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tally_responses_insert();
+
+DROP TRIGGER IF EXISTS trg_tally_responses_delete ON responses;
+CREATE TRIGGER trg_tally_responses_delete
+    AFTER DELETE ON responses
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tally_responses_delete();
+
+DROP TRIGGER IF EXISTS trg_tally_checkbox_insert ON checkbox_responses;
+CREATE TRIGGER trg_tally_checkbox_insert
+    AFTER INSERT ON checkbox_responses
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tally_checkbox_insert();
+
+DROP TRIGGER IF EXISTS trg_tally_checkbox_delete ON checkbox_responses;
+CREATE TRIGGER trg_tally_checkbox_delete
+    AFTER DELETE ON checkbox_responses
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tally_checkbox_delete();
+
+-- Rebuild from history
+TRUNCATE question_tallies;
+INSERT INTO question_tallies (question_code, option_select, votes, total)
+SELECT question_code, option_select, SUM(votes), SUM(total)
+FROM (
+    SELECT question_code, option_select, COUNT(*)::float AS votes, COUNT(*) AS total
+    FROM responses
+    GROUP BY question_code, option_select
+    UNION ALL
+    SELECT question_code, option_select, COALESCE(SUM(weight), 0)::float, COUNT(*)
+    FROM checkbox_responses
+    GROUP BY question_code, option_select
+) AS counts
+GROUP BY question_code, option_select;
+
+COMMIT;
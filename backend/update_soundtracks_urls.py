@@ -10,6 +10,9 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Must match CACHE_CHANNEL in backend/cache_listener.py
+CACHE_CHANNEL = "teen_poll_cache"
+
 def update_soundtracks_urls(database_url, database_name):
     """Update soundtracks table URLs for a specific database"""
     
@@ -59,6 +62,9 @@ def update_soundtracks_urls(database_url, database_name):
         for row in updated_soundtracks:
             print(f"  ID: {row[0]}, Title: {row[1]}, URL: {row[2]}")
         
+        # Tell running API workers to reload soundtracks once this commits
+        cursor.execute("SELECT pg_notify(%s, %s)", (CACHE_CHANNEL, "soundtracks"))
+
         # Commit changes
         conn.commit()
         print(f"Successfully updated {database_name}")
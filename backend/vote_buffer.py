@@ -0,0 +1,383 @@
+# backend/vote_buffer.py
+"""
+Optional write-behind ingestion for votes (VOTE_INGEST_MODE=buffered).
+
+In buffered mode the /api/vote/* handlers validate a vote against the
+catalog's metadata index, enqueue its VoteBatch here and return without
+touching Postgres. A background flusher drains the queue every
+VOTE_FLUSH_INTERVAL_MS or as soon as VOTE_FLUSH_MAX_ROWS rows are waiting,
+COPYs the rows into temp staging tables and moves them into responses,
+checkbox_responses and other_responses with one INSERT ... SELECT per
+table, all in one transaction.
+
+Durability knobs:
+  VOTE_BUFFER_MAX_BATCHES  queue capacity; when full (DB slow) votes are
+                           appended to the spill file instead of waiting
+  VOTE_SPILL_PATH          append-only JSON-lines file for votes that could
+                           not be queued or flushed; replayed once the DB
+                           accepts writes again (empty string disables it)
+  VOTE_SPILL_FSYNC         fsync after every spill append
+
+On lifespan shutdown the queue is drained; anything that cannot be flushed
+is spilled so it is replayed on the next start.
+
+The spill file doubles as the vote spool while the database circuit is
+open (backend/circuit_breaker.py): spool() appends a vote with fsync, in
+either ingest mode, and replay_in_background() replays the file once the
+circuit closes again.
+"""
+import asyncio
+import io
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+import psycopg2
+
+from backend.circuit_breaker import DatabaseUnavailable
+from backend.db import get_db_connection
+from backend.query_metrics import timed_query
+from backend.votes import (
+    CHECKBOX_COLUMNS,
+    OTHER_COLUMNS,
+    RESPONSE_COLUMNS,
+    VoteBatch,
+    write_votes_async,
+)
+
+logger = logging.getLogger(__name__)
+
+INGEST_MODE = os.getenv("VOTE_INGEST_MODE", "sync").lower()
+FLUSH_INTERVAL_MS = int(os.getenv("VOTE_FLUSH_INTERVAL_MS", "250"))
+FLUSH_MAX_ROWS = int(os.getenv("VOTE_FLUSH_MAX_ROWS", "500"))
+BUFFER_MAX_BATCHES = int(os.getenv("VOTE_BUFFER_MAX_BATCHES", "10000"))
+SPILL_PATH = os.getenv("VOTE_SPILL_PATH", "vote_spill.jsonl")
+SPILL_FSYNC = os.getenv("VOTE_SPILL_FSYNC", "false").lower() in ("1", "true", "yes")
+
+# (target table, staging table, columns, VoteBatch attribute)
+_TABLES = (
+    ("responses", "vote_stage_responses", RESPONSE_COLUMNS, "responses"),
+    ("checkbox_responses", "vote_stage_checkbox", CHECKBOX_COLUMNS, "checkbox"),
+    ("other_responses", "vote_stage_other", OTHER_COLUMNS, "other"),
+)
+
+
+def _copy_value(value) -> str:
+    """Encode one value for COPY ... FROM STDIN in text format."""
+    if value is None:
+        return r"\N"
+    text = str(value)
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _copy_rows(cur, stage: str, columns, rows: List[tuple]) -> None:
+    buf = io.StringIO()
+    for row in rows:
+        buf.write("\t".join(_copy_value(v) for v in row))
+        buf.write("\n")
+    buf.seek(0)
+    with timed_query(f"vote_buffer.copy_{stage}"):
+        cur.copy_expert(f"COPY {stage} ({', '.join(columns)}, created_at) FROM STDIN", buf)
+
+
+def copy_flush(conn, batches: List[VoteBatch]) -> int:
+    """Write batches through COPY + INSERT ... SELECT in the caller's transaction.
+
+    Duplicate votes and votes from unknown users are skipped rather than
+    failing the whole flush. Returns the number of rows staged.
+    """
+    staged = 0
+    with conn.cursor() as cur:
+        for table, stage, columns, attr in _TABLES:
+            rows = [row + (b.created_at,) for b in batches for row in getattr(b, attr)]
+            if not rows:
+                continue
+            # created_at is staged as timestamptz so the cast into the
+            # timestamp column matches what NOW() would have stored
+            cur.execute(
+                f"""
+                CREATE TEMP TABLE IF NOT EXISTS {stage} ON COMMIT DELETE ROWS AS
+                SELECT {', '.join(columns)}, NULL::timestamptz AS created_at
+                FROM {table} WITH NO DATA
+                """
+            )
+            _copy_rows(cur, stage, columns, rows)
+            insert = f"""
+                INSERT INTO {table} ({', '.join(columns)}, created_at)
+                SELECT {', '.join('s.' + c for c in columns)}, s.created_at
+                FROM {stage} s
+                WHERE EXISTS (SELECT 1 FROM users u WHERE u.user_uuid = s.user_uuid)
+                ON CONFLICT DO NOTHING
+                """
+            with timed_query(f"vote_buffer.insert_{table}", insert):
+                cur.execute(insert)
+            staged += len(rows)
+    return staged
+
+
+def _batch_to_json(batch: VoteBatch) -> str:
+    return json.dumps({
+        "created_at": batch.created_at,
+        "question_codes": batch.question_codes,
+        "responses": batch.responses,
+        "checkbox": batch.checkbox,
+        "other": batch.other,
+    }, ensure_ascii=False)
+
+
+def _batch_from_json(line: str) -> VoteBatch:
+    data = json.loads(line)
+    batch = VoteBatch()
+    batch.created_at = data["created_at"]
+    batch.question_codes = data["question_codes"]
+    batch.responses = [tuple(r) for r in data["responses"]]
+    batch.checkbox = [tuple(r) for r in data["checkbox"]]
+    batch.other = [tuple(r) for r in data["other"]]
+    return batch
+
+
+class VoteBuffer:
+    """Bounded in-process queue of VoteBatches with a periodic COPY flusher."""
+
+    def __init__(self, enabled: bool, spill_path: Optional[str] = SPILL_PATH,
+                 max_batches: int = BUFFER_MAX_BATCHES,
+                 flush_interval_ms: int = FLUSH_INTERVAL_MS, flush_max_rows: int = FLUSH_MAX_ROWS):
+        self.enabled = enabled
+        self.spill_path = spill_path or None
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.flush_max_rows = flush_max_rows
+        self._queue: "queue.Queue[VoteBatch]" = queue.Queue(maxsize=max_batches)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Called with the batches of every successful flush (e.g. to drop cached results)
+        self.on_flush: Optional[Callable[[List[VoteBatch]], None]] = None
+        self._spill_lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {"queued": 0, "flushed_rows": 0, "flushes": 0, "flush_failures": 0,
+                      "spilled": 0, "spooled": 0, "replayed": 0, "rejected": 0, "last_flush_ms": 0.0}
+
+    def _count(self, key: str, n=1) -> None:
+        with self._stats_lock:
+            self.stats[key] += n
+
+    # ---------- producer side ----------
+    async def submit(self, batch: VoteBatch) -> None:
+        """Queue a vote; if the queue is full, spill it (or write it directly) off the event loop."""
+        try:
+            self._queue.put_nowait(batch)
+            self._count("queued")
+        except queue.Full:
+            if self.spill_path:
+                logger.warning("Vote buffer full; spilling vote to disk")
+                await asyncio.to_thread(self._spill, [batch])
+            else:
+                await write_votes_async(batch)
+
+    async def spool(self, batch: VoteBatch) -> None:
+        """Durably park a vote while the database is unreachable; it is replayed later."""
+        if not self.spill_path:
+            raise DatabaseUnavailable("database unavailable and no VOTE_SPILL_PATH to spool to")
+        # The append and fsync block, so they run in a worker thread
+        await asyncio.to_thread(self._spill, [batch], True)
+        self._count("spooled")
+
+    def replay_in_background(self) -> None:
+        """Replay the spill file on a short-lived thread (e.g. when the database is back)."""
+        threading.Thread(target=self._replay_spill, name="vote-replay", daemon=True).start()
+
+    # ---------- lifecycle ----------
+    def start(self) -> None:
+        if not self.enabled:
+            # No flusher in sync mode, but votes spooled by an earlier process are still owed
+            if self._has_spill():
+                self.replay_in_background()
+            return
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="vote-flusher", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Vote buffer started: flush every {self.flush_interval * 1000:.0f}ms "
+            f"or {self.flush_max_rows} rows, spill={self.spill_path}"
+        )
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Stop the flusher and drain everything still queued."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        remaining = self._take(block=False, max_rows=None)
+        if remaining and not self._flush(remaining):
+            self._spill(remaining)
+        logger.info(f"Vote buffer stopped; drained {len(remaining)} queued votes")
+
+    def snapshot(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats.update(mode="buffered" if self.enabled else "sync", pending=self._queue.qsize())
+        return stats
+
+    # ---------- flusher ----------
+    def _run(self) -> None:
+        self._replay_spill()
+        while not self._stop.is_set():
+            batches = self._take(block=True, max_rows=self.flush_max_rows)
+            if not batches:
+                continue
+            if self._flush(batches):
+                self._replay_spill()
+            else:
+                self._spill(batches)
+
+    def _take(self, block: bool, max_rows: Optional[int]) -> List[VoteBatch]:
+        """Collect queued batches until max_rows or the flush interval elapses."""
+        batches: List[VoteBatch] = []
+        rows = 0
+        deadline = time.monotonic() + self.flush_interval
+        while max_rows is None or rows < max_rows:
+            try:
+                if block:
+                    batch = self._queue.get(timeout=max(deadline - time.monotonic(), 0.001))
+                else:
+                    batch = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batches.append(batch)
+            rows += len(batch)
+            if block and time.monotonic() >= deadline:
+                break
+        return batches
+
+    def _flush(self, batches: List[VoteBatch]) -> bool:
+        """COPY batches in one transaction; False if the DB could not take them."""
+        started = time.perf_counter()
+        try:
+            with get_db_connection() as conn:
+                try:
+                    rows = copy_flush(conn, batches)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+        except (psycopg2.IntegrityError, psycopg2.DataError) as e:
+            # A bad row poisons the COPY; isolate it by writing one vote at a time
+            logger.error(f"Vote flush rejected ({e}); retrying {len(batches)} votes individually")
+            return self._flush_individually(batches)
+        except Exception as e:
+            self._count("flush_failures")
+            logger.error(f"Vote flush of {len(batches)} votes failed: {e}")
+            return False
+
+        with self._stats_lock:
+            self.stats["flushes"] += 1
+            self.stats["flushed_rows"] += rows
+            self.stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        self._notify_flushed(batches)
+        return True
+
+    def _notify_flushed(self, batches: List[VoteBatch]) -> None:
+        if self.on_flush is None:
+            return
+        try:
+            self.on_flush(batches)
+        except Exception as e:
+            logger.error(f"Vote flush callback failed: {e}")
+
+    def _flush_individually(self, batches: List[VoteBatch]) -> bool:
+        # Re-writing a vote that already landed is a no-op (ON CONFLICT DO
+        # NOTHING), so on a connection failure the caller can spill them all.
+        for batch in batches:
+            try:
+                with get_db_connection() as conn:
+                    try:
+                        rows = copy_flush(conn, [batch])
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                self._count("flushed_rows", rows)
+                self._notify_flushed([batch])
+            except (psycopg2.IntegrityError, psycopg2.DataError) as e:
+                self._count("rejected")
+                logger.error(f"Dropping invalid vote for {batch.question_codes}: {e}")
+            except Exception as e:
+                self._count("flush_failures")
+                logger.error(f"Vote flush failed: {e}")
+                return False
+        return True
+
+    # ---------- spill file ----------
+    def _spill(self, batches: List[VoteBatch], fsync: bool = SPILL_FSYNC) -> None:
+        if not self.spill_path:
+            logger.error(f"No VOTE_SPILL_PATH configured; {len(batches)} votes lost")
+            return
+        with self._spill_lock:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for batch in batches:
+                    f.write(_batch_to_json(batch) + "\n")
+                f.flush()
+                if fsync:
+                    os.fsync(f.fileno())
+        self._count("spilled", len(batches))
+
+    def _has_spill(self) -> bool:
+        # A .replay file is what a replay interrupted by a crash left behind
+        return bool(self.spill_path) and (
+            os.path.exists(self.spill_path) or os.path.exists(self.spill_path + ".replay"))
+
+    def _replay_spill(self) -> None:
+        """Re-flush spilled votes once the DB accepts writes again."""
+        if not self._has_spill():
+            return
+        # The flusher and a circuit-close replay may race; one replay is enough
+        if not self._replay_lock.acquire(blocking=False):
+            return
+        try:
+            self._replay_spill_locked()
+        finally:
+            self._replay_lock.release()
+
+    def _replay_spill_locked(self) -> None:
+        replay_path = self.spill_path + ".replay"
+        # An orphaned .replay goes first, then whatever the spill file holds
+        while True:
+            with self._spill_lock:
+                if not os.path.exists(replay_path):
+                    if not os.path.exists(self.spill_path):
+                        break
+                    os.replace(self.spill_path, replay_path)
+            with open(replay_path, encoding="utf-8") as f:
+                batches = [_batch_from_json(line) for line in f if line.strip()]
+            replayed = self._replay_batches(batches)
+            os.remove(replay_path)
+            if not replayed:
+                break
+        logger.info(f"Replayed {self.stats['replayed']} spilled votes so far")
+
+    def _replay_batches(self, batches: List[VoteBatch]) -> bool:
+        """Flush batches in chunks of up to flush_max_rows rows; False (rest re-spilled) on failure."""
+        start = 0
+        while start < len(batches):
+            end, rows = start + 1, len(batches[start])
+            while end < len(batches) and rows + len(batches[end]) <= self.flush_max_rows:
+                rows += len(batches[end])
+                end += 1
+            chunk = batches[start:end]
+            if not self._flush(chunk):
+                # Put the rest back for the next attempt
+                self._spill(batches[start:], fsync=True)
+                return False
+            self._count("replayed", len(chunk))
+            start = end
+        return True
+
+
+vote_buffer = VoteBuffer(enabled=INGEST_MODE == "buffered")
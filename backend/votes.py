@@ -0,0 +1,275 @@
+# backend/votes.py
+"""
+Transactional vote writer.
+
+A VoteBatch collects every row one submission produces (responses,
+checkbox_responses, other_responses) and write_votes() inserts them on a
+single pooled connection in a single transaction, one multi-row INSERT per
+table. A checkbox vote with five options is one commit instead of six, and
+it either lands completely or not at all.
+
+The INSERTs are PREPAREd per row count (up to PREPARED_INSERT_MAX_ROWS
+rows; bigger batches are split), and the single-row forms, INSERT_STATEMENTS,
+on every pooled connection at startup (see main.py's lifespan). Rows go in
+sorted by (question_code, option_select), and the statement triggers upsert
+the tally rows ORDER BY their keys (backend/schema_tallies.sql), so
+concurrent votes take the tally row locks in the same order and cannot
+deadlock on one another.
+
+Votes send no NOTIFY: commits that NOTIFY are serialized cluster-wide, too
+high a price on this path. The writing worker updates its results_cache and
+live streams directly; other workers' streams poll (backend/results_stream.py).
+
+write_votes_async() is the same writer on backend.async_db's pool, for the
+request handlers; write_votes() serves the background flusher.
+"""
+import functools
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from backend.admission import database_error
+from backend.async_db import execute_prepared_async, get_async_connection, note_write_position
+from backend.catalog import QuestionMeta
+from backend.db import PreparedStatement, execute_prepared, get_db_connection
+
+logger = logging.getLogger(__name__)
+
+OTHER_KEY = "OTHER"
+
+RESPONSE_COLUMNS = (
+    "user_uuid", "question_code", "question_text", "question_number",
+    "category_id", "category_name", "category_text", "block_number",
+    "option_id", "option_select", "option_code", "option_text",
+)
+CHECKBOX_COLUMNS = RESPONSE_COLUMNS + ("weight",)
+OTHER_COLUMNS = (
+    "user_uuid", "question_code", "question_text", "question_number",
+    "category_id", "category_name", "category_text", "block_number",
+    "other_text",
+)
+
+
+def normalize_select(value):
+    """Map any spelling of "other" to OTHER_KEY; leave everything else as sent."""
+    if isinstance(value, str) and value.strip().upper() == OTHER_KEY:
+        return OTHER_KEY
+    return value
+
+
+def _meta_values(user_uuid: str, meta: QuestionMeta) -> tuple:
+    return (
+        user_uuid, meta.question_code, meta.question_text, meta.question_number,
+        meta.category_id, meta.category_name, meta.category_text, meta.block_number,
+    )
+
+
+# Largest INSERT that gets a PREPAREd form of its own; bigger batches are split
+PREPARED_INSERT_MAX_ROWS = 32
+
+_TABLES = (
+    ("responses", RESPONSE_COLUMNS),
+    ("checkbox_responses", CHECKBOX_COLUMNS),
+    ("other_responses", OTHER_COLUMNS),
+)
+
+
+@functools.lru_cache(maxsize=None)
+def insert_statement(table: str, columns: Tuple[str, ...], nrows: int = 1) -> PreparedStatement:
+    """One INSERT with a VALUES tuple per row; created_at is stamped with NOW()."""
+    width = len(columns)
+    values = ", ".join(
+        "(" + ", ".join(f"${row * width + col}" for col in range(1, width + 1)) + ", NOW())"
+        for row in range(nrows)
+    )
+    return PreparedStatement(
+        name=f"insert_{table}_{nrows}",
+        sql=f"INSERT INTO {table} ({', '.join(columns)}, created_at) VALUES {values}",
+        nparams=width * nrows,
+        metric=f"votes.insert_{table}",
+    )
+
+
+def _lock_order(columns: Sequence[str]):
+    """Sort key putting rows in (question_code, option_select) order."""
+    code = columns.index("question_code")
+    if "option_select" not in columns:
+        return lambda row: (row[code],)
+    select = columns.index("option_select")
+    return lambda row: (row[code], row[select])
+
+
+INSERT_STATEMENTS = tuple(insert_statement(table, columns) for table, columns in _TABLES)
+
+
+class VoteBatch:
+    """All rows produced by one or more vote submissions, written together."""
+
+    def __init__(self):
+        self.responses: List[tuple] = []
+        self.checkbox: List[tuple] = []
+        self.other: List[tuple] = []
+        self.question_codes: List[str] = []
+        # When the vote was cast; used instead of NOW() when the write is deferred
+        self.created_at = datetime.now(timezone.utc).isoformat()
+
+    def __len__(self) -> int:
+        return len(self.responses) + len(self.checkbox) + len(self.other)
+
+    def _touch(self, question_code: str) -> None:
+        if question_code not in self.question_codes:
+            self.question_codes.append(question_code)
+
+    def add_single(self, meta: QuestionMeta, user_uuid: str, option_select: str,
+                   other_text: Optional[str] = None) -> None:
+        """Single-choice vote, plus its free text if OTHER was picked."""
+        option_select = normalize_select(option_select)
+        self.responses.append(_meta_values(user_uuid, meta) + (
+            None, option_select, f"{meta.question_code}_{option_select}", option_select,
+        ))
+        text = (other_text or "").strip()
+        if option_select == OTHER_KEY and text:
+            self.other.append(_meta_values(user_uuid, meta) + (text,))
+        self._touch(meta.question_code)
+
+    def add_checkbox(self, meta: QuestionMeta, user_uuid: str, option_selects: Iterable[str],
+                     other_text: Optional[str] = None) -> None:
+        """Checkbox vote; each selected option carries an equal share of one vote."""
+        option_selects = [normalize_select(v) for v in option_selects]
+        weight = 1.0 / len(option_selects)
+        for opt in option_selects:
+            self.checkbox.append(_meta_values(user_uuid, meta) + (
+                None, opt, f"{meta.question_code}_{opt}", opt, weight,
+            ))
+        text = (other_text or "").strip()
+        if OTHER_KEY in option_selects and text:
+            self.other.append(_meta_values(user_uuid, meta) + (text,))
+        self._touch(meta.question_code)
+
+    def add_other(self, meta: QuestionMeta, user_uuid: str, other_text: str) -> None:
+        """Free-text answer plus an OTHER placeholder in responses so charts show it."""
+        self.other.append(_meta_values(user_uuid, meta) + (other_text.strip(),))
+        self.responses.append(_meta_values(user_uuid, meta) + (
+            None, OTHER_KEY, f"{meta.question_code}_{OTHER_KEY}", "Other",
+        ))
+        self._touch(meta.question_code)
+
+    def statements(self) -> List[Tuple[PreparedStatement, tuple]]:
+        """(INSERT statement, params) of each multi-row INSERT the batch needs, in lock order."""
+        statements = []
+        for (table, columns), rows in zip(_TABLES, (self.responses, self.checkbox, self.other)):
+            rows = sorted(rows, key=_lock_order(columns))
+            for start in range(0, len(rows), PREPARED_INSERT_MAX_ROWS):
+                chunk = rows[start:start + PREPARED_INSERT_MAX_ROWS]
+                params = tuple(value for row in chunk for value in row)
+                statements.append((insert_statement(table, columns, len(chunk)), params))
+        return statements
+
+
+def check_option_selects(meta: QuestionMeta, option_selects: Iterable[str]) -> None:
+    """Reject option_select values the question does not offer (400)."""
+    invalid = [v for v in (normalize_select(s) for s in option_selects) if v not in meta.option_selects]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid option_select for {meta.question_code}: {invalid}")
+
+
+class WriterStats:
+    """Running totals for the vote writer, exposed via /vote-stats."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.submissions = 0
+        self.failures = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+
+    def record(self, rows: int, elapsed_ms: float, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self.submissions += 1
+                self.rows += rows
+            else:
+                self.failures += 1
+            self.total_ms += elapsed_ms
+            self.last_ms = elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.submissions + self.failures
+            return {
+                "submissions": self.submissions,
+                "failures": self.failures,
+                "rows": self.rows,
+                "avg_ms": round(self.total_ms / attempts, 3) if attempts else 0.0,
+                "max_ms": round(self.max_ms, 3),
+                "last_ms": round(self.last_ms, 3),
+            }
+
+
+writer_stats = WriterStats()
+
+
+def write_votes(batch: VoteBatch, in_transaction: Optional[Callable[[object], None]] = None) -> float:
+    """Insert every row of batch in one transaction; return the latency in ms.
+
+    in_transaction(cursor), if given, runs after the inserts and before the
+    commit, e.g. to read the tallies the vote just produced. Any failure
+    rolls the whole submission back and surfaces through database_error(),
+    like execute_query does.
+    """
+    started = time.perf_counter()
+    try:
+        with get_db_connection() as conn:
+            try:
+                with conn.cursor() as cur:
+                    for stmt, params in batch.statements():
+                        execute_prepared(cur, stmt, params)
+                    if in_transaction is not None:
+                        in_transaction(cur)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    except Exception as e:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        writer_stats.record(len(batch), elapsed_ms, ok=False)
+        logger.error(f"Vote write failed after {elapsed_ms:.1f}ms: {e}")
+        raise database_error(e)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    writer_stats.record(len(batch), elapsed_ms, ok=True)
+    logger.debug(f"Vote write: {len(batch)} rows for {batch.question_codes} in {elapsed_ms:.1f}ms")
+    return elapsed_ms
+
+
+async def write_votes_async(batch: VoteBatch,
+                            in_transaction: Optional[Callable[[object], Awaitable[None]]] = None) -> float:
+    """write_votes for async handlers; in_transaction is awaited with the cursor."""
+    started = time.perf_counter()
+    try:
+        async with get_async_connection() as conn:
+            async with conn.transaction():
+                async with conn.cursor() as cur:
+                    for stmt, params in batch.statements():
+                        await execute_prepared_async(cur, stmt, params)
+                    if in_transaction is not None:
+                        await in_transaction(cur)
+            # Read-your-writes token for replica routing (backend/async_db.py)
+            await note_write_position(conn)
+    except Exception as e:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        writer_stats.record(len(batch), elapsed_ms, ok=False)
+        logger.error(f"Vote write failed after {elapsed_ms:.1f}ms: {e}")
+        raise database_error(e)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    writer_stats.record(len(batch), elapsed_ms, ok=True)
+    logger.debug(f"Vote write: {len(batch)} rows for {batch.question_codes} in {elapsed_ms:.1f}ms")
+    return elapsed_ms
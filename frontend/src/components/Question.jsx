@@ -7,7 +7,7 @@ import ResultsBarChart from './ResultsBarChart.jsx'
 import { submitVote, submitCheckboxVote, submitOtherVote } from '../services/apiService.js'
 const API_BASE = import.meta.env.VITE_API_BASE;
 
-const Question = ({ question, onAnswered }) => {
+const Question = ({ question, liveResults, onAnswered }) => {
   // ===== VOTING COOLDOWN CONFIGURATION =====
   // Adjust these values as needed:
   const VOTING_COOLDOWN_HOURS = 24  // 24 hours cooldown
@@ -248,7 +248,19 @@ const Question = ({ question, onAnswered }) => {
     return () => clearInterval(interval)
   }, [question.question_code, votingOnCooldown])
 
+  // While results are shown, follow the block's live results stream
+  useEffect(() => {
+    if (showResults && liveResults) setResults(liveResults)
+  }, [showResults, liveResults])
+
   const fetchOptions = async () => {
+    // Block.jsx already loaded them via /api/blocks/{code}/full
+    if (Array.isArray(question.options)) {
+      setOptions(question.options)
+      setLoading(false)
+      return
+    }
+
     setLoading(true)
     try {
       const response = await axios.get(
@@ -299,11 +311,10 @@ const Question = ({ question, onAnswered }) => {
       console.log('Submitting vote data:', voteData)
 
       // Submit vote using API service
-      await submitVote(question.question_code, optionSelect, userUuid)
+      const vote = await submitVote(question.question_code, optionSelect, userUuid)
 
-      // Get results
-      const resultsResponse = await axios.get(`${API_BASE}/api/results/${question.question_code}`)
-      setResults(resultsResponse.data)
+      // The vote response carries the updated tallies (null while the database is down)
+      if (vote.results) setResults(vote.results)
       setShowResults(true)
 
       // Set validation message
@@ -361,18 +372,15 @@ const Question = ({ question, onAnswered }) => {
       console.log('question.check_box:', question.check_box)
 
       // Submit checkbox vote using API service
-      await submitCheckboxVote(
+      const vote = await submitCheckboxVote(
         question.question_code, 
         selectedOptions, 
         userUuid, 
         selectedOptions.includes("OTHER") ? otherText : null
       );
 
-      // Refresh results
-      const resultsResponse = await axios.get(
-        `${API_BASE}/api/results/${question.question_code}`
-      );
-      setResults(resultsResponse.data);
+      // The vote response carries the updated tallies (null while the database is down)
+      if (vote.results) setResults(vote.results);
       setShowResults(true);
 
       // Validation messages
@@ -424,11 +432,10 @@ const Question = ({ question, onAnswered }) => {
         return
       }
 
-      await submitOtherVote(question.question_code, otherText, userUuid)
+      const vote = await submitOtherVote(question.question_code, otherText, userUuid)
 
-      // Get results after submitting
-      const resultsResponse = await axios.get(`${API_BASE}/api/results/${question.question_code}`)
-      setResults(resultsResponse.data)
+      // The vote response carries the updated tallies (null while the database is down)
+      if (vote.results) setResults(vote.results)
       setShowResults(true)
 
       // Set validation message for OTHER response
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react'
 import { useParams, useNavigate } from 'react-router-dom'
-import { fetchQuestions, fetchBlocks } from '../services/apiService';
+import { fetchBlockFull, fetchBlocks, subscribeResults } from '../services/apiService';
 import Question from '../components/Question'
 import HamburgerMenu from '../components/HamburgerMenu'
 import Footer from '../components/Footer.jsx'
@@ -17,6 +17,7 @@ const Block = () => {
   const [_allBlocks, setAllBlocks] = useState([])
   const [isLastBlock, setIsLastBlock] = useState(false)
   const [_allBlocksCompleted, setAllBlocksCompleted] = useState(false)
+  const [liveResults, setLiveResults] = useState({})
   const { blockCode } = useParams()
   const navigate = useNavigate()
 
@@ -34,7 +35,8 @@ const Block = () => {
   const loadQuestions = async () => {
     try {
       setLoading(true)
-      const rawQuestions = await fetchQuestions(blockCode)
+      // Questions arrive with their options nested, so Question.jsx needn't fetch them
+      const rawQuestions = await fetchBlockFull(blockCode)
       setQuestions(rawQuestions)
     } catch (err) {
       setError("Failed to fetch questions")
@@ -93,6 +95,29 @@ const Block = () => {
     loadBlocksForCategory()
   }, [blockCode, navigate])
 
+  // One results stream for the whole block; each Question reads its own entry
+  useEffect(() => {
+    if (questions.length === 0) return
+    setLiveResults({})
+    return subscribeResults(questions.map((q) => q.question_code), {
+      onSnapshot: (data) => setLiveResults((prev) => ({ ...prev, [data.question_code]: data })),
+      onDelta: (delta) => setLiveResults((prev) => {
+        const current = prev[delta.question_code]
+        if (!current) return prev
+        return {
+          ...prev,
+          [delta.question_code]: {
+            ...current,
+            results: current.results.map((r) =>
+              r.option_select in delta.votes ? { ...r, votes: delta.votes[r.option_select] } : r
+            ),
+            total_responses: delta.total_responses
+          }
+        }
+      })
+    })
+  }, [questions])
+
   const handleQuestionAnswered = (questionData) => {
     const newCount = answeredQuestions + 1
     setAnsweredQuestions(newCount)
@@ -192,6 +217,7 @@ const Block = () => {
             >
               <Question
                 question={question}
+                liveResults={liveResults[question.question_code]}
                 onAnswered={handleQuestionAnswered}
               />
             </div>
@@ -1,6 +1,25 @@
 import axios from 'axios';
 import API_BASE from '../config.js';
 
+// Read-your-writes with read replicas: the backend returns the position of
+// our last write in X-Read-After-LSN; echoing it keeps later reads (e.g. the
+// results after a vote) off replicas that have not caught up yet.
+const READ_AFTER_HEADER = 'X-Read-After-LSN';
+let readAfter = null;
+
+axios.interceptors.request.use((config) => {
+  if (readAfter) {
+    config.headers[READ_AFTER_HEADER] = readAfter;
+  }
+  return config;
+});
+
+axios.interceptors.response.use((res) => {
+  const token = res.headers?.[READ_AFTER_HEADER.toLowerCase()];
+  if (token) readAfter = token;
+  return res;
+});
+
 /**
  * Fetch all categories -> Landing.jsx
  * @returns {Promise<Array>} List of categories
@@ -32,6 +51,19 @@ export async function fetchQuestions(blockCode) {
   return res.data.questions;
 }
 
+/**
+ * Fetch a whole block in one request: questions with their options nested -> Block.jsx
+ * @param {string} blockCode
+ * @param {boolean} includeResults - also attach current tallies to each question
+ * @returns {Promise<Array>} List of questions, each with an `options` array
+ */
+export async function fetchBlockFull(blockCode, includeResults = false) {
+  const res = await axios.get(`${API_BASE}/api/blocks/${blockCode}/full`, {
+    params: includeResults ? { include_results: true } : undefined
+  });
+  return res.data.questions;
+}
+
 /**
  * Fetch all options for a question -> Question.jsx in components
  * @param {string} questionCode 
@@ -62,6 +94,7 @@ export async function createUser(userUuid, birthYear) {
  * @param {string} optionSelect
  * @param {string} userUuid
  * @param {string} otherText - optional text for "OTHER" option
+ * @returns {Promise<Object>} includes `results`, the updated tallies
  */
 export async function submitVote(questionCode, optionSelect, userUuid, otherText = null) {
   const res = await axios.post(`${API_BASE}/api/vote/single`, {
@@ -69,7 +102,7 @@ export async function submitVote(questionCode, optionSelect, userUuid, otherText
     option_select: optionSelect,
     user_uuid: userUuid,
     other_text: otherText
-  });
+  }, { params: { include_results: 1 } });
   return res.data;
 }
 
@@ -79,6 +112,7 @@ export async function submitVote(questionCode, optionSelect, userUuid, otherText
  * @param {Array<string>} optionSelects
  * @param {string} userUuid
  * @param {string} otherText - optional text for "OTHER" option
+ * @returns {Promise<Object>} includes `results`, the updated tallies
  */
 export async function submitCheckboxVote(questionCode, optionSelects, userUuid, otherText = null) {
   const res = await axios.post(`${API_BASE}/api/vote/checkbox`, {
@@ -86,7 +120,7 @@ export async function submitCheckboxVote(questionCode, optionSelects, userUuid,
     option_selects: optionSelects,
     user_uuid: userUuid,
     other_text: otherText
-  });
+  }, { params: { include_results: 1 } });
   return res.data;
 }
 
@@ -95,12 +129,27 @@ export async function submitCheckboxVote(questionCode, optionSelects, userUuid,
  * @param {string} questionCode
  * @param {string} otherText
  * @param {string} userUuid
+ * @returns {Promise<Object>} includes `results`, the updated tallies
  */
 export async function submitOtherVote(questionCode, otherText, userUuid) {
   const res = await axios.post(`${API_BASE}/api/vote/other`, {
     question_code: questionCode,
     other_text: otherText,
     user_uuid: userUuid
+  }, { params: { include_results: 1 } });
+  return res.data;
+}
+
+/**
+ * Submit several votes for one user in one request -> returns updated tallies
+ * @param {string} userUuid
+ * @param {Array<Object>} votes - [{ type: 'single'|'checkbox'|'other', question_code, option_select | option_selects | other_text }]
+ * @returns {Promise<Object>} { question_codes, results: [{ question_code, results, total_responses }] }
+ */
+export async function submitVoteBatch(userUuid, votes) {
+  const res = await axios.post(`${API_BASE}/api/vote/batch`, {
+    user_uuid: userUuid,
+    votes
   });
   return res.data;
 }
@@ -113,3 +162,30 @@ export async function fetchResults(questionCode) {
   const res = await axios.get(`${API_BASE}/api/results/${questionCode}`);
   return res.data;
 }
+
+/**
+ * Fetch results for many questions in one request
+ * @param {{blockCode?: string, categoryId?: number, questionCodes?: string[]}} scope
+ */
+export async function fetchResultsBatch({ blockCode, categoryId, questionCodes }) {
+  const params = {};
+  if (blockCode) params.block_code = blockCode;
+  else if (categoryId != null) params.category_id = categoryId;
+  else params.question_codes = questionCodes.join(',');
+  const res = await axios.get(`${API_BASE}/api/results`, { params });
+  return res.data.questions;
+}
+
+/**
+ * Subscribe to live result changes over Server-Sent Events
+ * @param {string[]} questionCodes
+ * @param {{onSnapshot?: Function, onDelta?: Function}} handlers
+ * @returns {Function} call to close the stream
+ */
+export function subscribeResults(questionCodes, { onSnapshot, onDelta }) {
+  const url = `${API_BASE}/api/results/stream?question_codes=${encodeURIComponent(questionCodes.join(','))}`;
+  const source = new EventSource(url);
+  if (onSnapshot) source.addEventListener('snapshot', (e) => onSnapshot(JSON.parse(e.data)));
+  if (onDelta) source.addEventListener('delta', (e) => onDelta(JSON.parse(e.data)));
+  return () => source.close();
+}
@@ -1,14 +1,20 @@
 # main.py
 # main.py (updated: unified /api/vote handler that uses responses, checkbox_responses, other_responses)
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
+import json
+import math
 from pydantic import BaseModel
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 import logging
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import zlib
 import os
+import threading
+import time
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -16,7 +22,30 @@ logger = logging.getLogger(__name__)
 
 # Try to import db module and handle errors gracefully
 try:
-    from backend.db import connection_pool, db_check, db_ssl_status
+    from backend.db import DATABASE_URL, DB_POOL_WARM, connection_pool, db_check, db_ssl_status
+    from backend.async_db import (
+        READ, READ_AFTER_HEADER, WRITE, async_pool_stats, begin_consistency_scope, close_async_pool,
+        format_lsn, get_async_connection, note_write_position, open_async_pool, replicas_configured,
+    )
+    from backend import cache_listener as cache_events
+    from backend.votes import INSERT_STATEMENTS, VoteBatch, check_option_selects, write_votes_async, writer_stats
+    from backend.vote_buffer import vote_buffer
+    from backend.results_cache import Tallies, results_cache
+    from backend.results_stream import results_hub
+    from backend.results_summary import results_summary
+    from backend.results import (
+        AGE_BANDS, HOT_STATEMENTS, TREND_BUCKETS, UNDER_AGE_BAND,
+        fetch_age_band_tallies_async, fetch_many_tallies, fetch_many_tallies_async,
+        fetch_tallies_async, fetch_trend_async, query_many_tallies_async,
+    )
+    from backend.catalog import (
+        get_catalog, get_soundtracks, load_catalog_from_disk, load_soundtracks_from_disk, parse_block_code,
+        reload_catalog, reload_soundtracks,
+    )
+    from backend.http_cache import cached_json, encode_json, response_cache
+    from backend.query_metrics import query_metrics, timed_query
+    from backend.admission import CATALOG, HEALTH, RESULTS, VOTE, admission, admitted, database_error
+    from backend.circuit_breaker import CLOSED, DatabaseUnavailable, db_breaker
     logger.info("Successfully imported db module")
 except Exception as e:
     logger.error(f"Failed to import db module: {e}")
@@ -26,18 +55,86 @@ except Exception as e:
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting up application...")
+    # PREPAREd on every pooled connection as it opens, so the first requests
+    # skip planning; question metadata and block questions come from the
+    # in-memory catalog and need no statement
+    warm_statements = HOT_STATEMENTS + INSERT_STATEMENTS
     try:
         # Test database connection
-        db_check()
-        logger.info("Database connection successful")
+        db_ok = db_check()
+        if db_ok:
+            logger.info("Database connection successful")
+            # Serve categories/blocks/questions/options and soundtracks from memory
+            reload_catalog()
+            reload_soundtracks()
+            # Open DB_POOL_WARM connections now rather than on first use
+            size = connection_pool.warm(DB_POOL_WARM, warm_statements)
+            logger.info(f"Connection pool warmed: {size} connections, {len(warm_statements)} statements prepared")
+        else:
+            # Degraded start: catalog from its last copy on disk, votes spooled,
+            # results stale or 503 until the database answers again
+            logger.warning("Database unreachable; starting in degraded mode")
+            if load_catalog_from_disk() is None:
+                raise RuntimeError("database unreachable and no catalog snapshot on disk")
+            load_soundtracks_from_disk()
+            db_breaker.trip("database unreachable at startup")
+        # Request handlers use the asyncio pool (backend/async_db.py), plus
+        # read replicas when DATABASE_READ_URL is set
+        await open_async_pool(wait=db_ok, warm=warm_statements)
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
         raise
+
+    # Once the circuit closes: replay spooled votes and, after a degraded
+    # start, swap the on-disk catalog for the live one. Off the caller's
+    # thread, which may be the event loop.
+    def on_database_back():
+        def recover():
+            if not db_ok:
+                try:
+                    reload_catalog()
+                    reload_soundtracks()
+                except Exception as e:
+                    logger.error(f"Catalog reload after outage failed: {e}")
+            vote_buffer.replay_in_background()
+        threading.Thread(target=recover, name="db-recover", daemon=True).start()
+
+    db_breaker.on_close.append(on_database_back)
+
+    # Reload in-memory caches when an import script NOTIFYs a change
+    listener = None
+    if cache_events.ENABLED:
+        listener = cache_events.CacheListener(DATABASE_URL)
+        listener.register("catalog", reload_catalog)
+        listener.register("soundtracks", reload_soundtracks)
+        listener.start()
+
+    # Write-behind vote ingestion (VOTE_INGEST_MODE=buffered); flushed votes
+    # may skip duplicates, so drop their cached results rather than patch them
+    def on_vote_flush(batches):
+        codes = [code for batch in batches for code in batch.question_codes]
+        results_cache.invalidate(codes)
+        results_hub.mark_changed(codes)
+
+    vote_buffer.on_flush = on_vote_flush
+    vote_buffer.start()
+
+    # Live results push for /api/results/stream
+    results_hub.start(load_fresh_tallies)
+    # Periodic REFRESH of the results_summary rollup (relaxed-freshness fallback)
+    results_summary.start()
     
     yield
     
     # Shutdown
     logger.info("Shutting down application...")
+    db_breaker.on_close.remove(on_database_back)
+    vote_buffer.stop()
+    results_hub.stop()
+    results_summary.stop()
+    if listener is not None:
+        listener.stop()
+    await close_async_pool()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -58,380 +155,421 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Read-your-writes token (backend/async_db.py), the back-off hint on
+    # 503s (backend/admission.py) and the stale-results markers
+    expose_headers=[READ_AFTER_HEADER, "Retry-After", "Age", "X-Data-Freshness"],
 )
 
+# ------------------ Degraded mode ------------------
+@app.exception_handler(DatabaseUnavailable)
+async def database_unavailable(request: Request, exc: DatabaseUnavailable):
+    """503 + Retry-After for anything that needed Postgres while it is down (backend/circuit_breaker.py)."""
+    retry_after = math.ceil(exc.retry_after or db_breaker.retry_after() or 1)
+    return JSONResponse(status_code=503, content={"detail": "Database unavailable, please retry"},
+                        headers={"Retry-After": str(retry_after)})
+
+# ------------------ Read replicas ------------------
+async def read_your_writes(request: Request, call_next):
+    """Route this request's reads past the client's last write, and hand back the position of its own."""
+    scope = begin_consistency_scope(request.headers.get(READ_AFTER_HEADER))
+    response = await call_next(request)
+    if scope.written is not None:
+        response.headers[READ_AFTER_HEADER] = format_lsn(scope.written)
+    return response
+
+if replicas_configured():
+    app.middleware("http")(read_your_writes)
+
 # ------------------ DB helper (local to main.py) ------------------
-def execute_query(query: str, params: tuple = None, fetch: bool = True):
+async def execute_query(name: str, query: str, params: tuple = None, fetch: bool = True, intent: str = WRITE):
     """
-    Execute a SQL query using the shared connection_pool from backend.db.
+    Execute a SQL query on the asyncio pool from backend.async_db.
     Returns list[dict] when fetch=True, otherwise commits and returns True.
+    name tags the statement in /query-metrics; intent=READ lets a read
+    replica answer (see backend/async_db.py).
     """
-    conn = None
-    cursor = None
     try:
-        conn = connection_pool.getconn()
-        cursor = conn.cursor()
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        if fetch:
-            cols = [d[0] for d in cursor.description] if cursor.description else []
-            rows = cursor.fetchall() if cursor.description else []
-            return [dict(zip(cols, row)) for row in rows]
-        else:
-            conn.commit()
+        async with get_async_connection(intent) as conn:
+            async with conn.cursor() as cursor:
+                with timed_query(name, query, params):
+                    await cursor.execute(query, params)
+                if fetch:
+                    cols = [d.name for d in cursor.description] if cursor.description else []
+                    rows = await cursor.fetchall() if cursor.description else []
+                    return [dict(zip(cols, row)) for row in rows]
+            await conn.commit()
+            await note_write_position(conn)
             return True
     except Exception as e:
         logging.error(f"Database operation failed: {e}")
-        if conn:
-            try:
-                conn.rollback()
-            except Exception:
-                pass
-        raise HTTPException(status_code=500, detail="Database operation failed")
-    finally:
-        if cursor:
-            try:
-                cursor.close()
-            except Exception:
-                pass
-        if conn:
-            try:
-                connection_pool.putconn(conn)
-            except Exception:
-                pass
+        raise database_error(e)
 
 # ------------------ Health ------------------
 @app.get("/health")
 def health():
+    if db_breaker.state != CLOSED:
+        return {"status": "degraded", "database": db_breaker.state}
     return {"status": "ok"}
 
 @app.get("/db-check")
+@admitted(HEALTH)
 def get_db_check():
     return {"ok": db_check()}
 
+@app.get("/db-pool-status")
+def get_db_pool_status():
+    """Connection pool gauges: size, in use, waiting, acquire and checkout latency."""
+    return {**connection_pool.stats(), "async": async_pool_stats(), "breaker": db_breaker.snapshot()}
+
 @app.get("/db-ssl-status")
+@admitted(HEALTH)
 def get_db_ssl_status():
     return {"ssl": db_ssl_status()}
 
+@app.get("/vote-stats")
+def get_vote_stats():
+    return {**writer_stats.snapshot(), "buffer": vote_buffer.snapshot(), "results_cache": results_cache.stats(),
+            "results_stream": results_hub.snapshot()}
+
+@app.get("/admission-status")
+def get_admission_status():
+    """Admission control: slots in use, queue depth and shed requests per priority."""
+    return admission.snapshot()
+
+@app.get("/query-metrics")
+def get_query_metrics():
+    """Latency histogram per named statement, slow-query counts and sampled EXPLAIN plans."""
+    return query_metrics.snapshot()
+
+@app.get("/results-summary-status")
+def get_results_summary_status():
+    """Refresh cadence and staleness of the results_summary rollup."""
+    return results_summary.snapshot()
+
+@app.get("/catalog-status")
+def get_catalog_status():
+    catalog = get_catalog()
+    soundtracks = get_soundtracks()
+    return {
+        "version": catalog.version,
+        "digest": catalog.digest,
+        "loaded_at": catalog.loaded_at.isoformat(),
+        "soundtracks": {"version": soundtracks.version, "digest": soundtracks.digest},
+        "response_cache": response_cache.stats(),
+    }
+
 # ------------------ Categories ------------------
 @app.get("/api/categories")
-def get_categories():
-    query = """
-        SELECT *
-        FROM categories
-        ORDER BY id
-    """
-    return {"categories": execute_query(query)}
+async def get_categories(request: Request):
+    catalog = get_catalog()
+    return await cached_json(
+        request, "catalog", catalog.digest, ("categories",),
+        lambda: {"categories": list(catalog.categories)},
+    )
 
 # ------------------ Blocks ------------------
 @app.get("/api/categories/{category_id}/blocks")
-def get_blocks(category_id: int):
-    query = """
-        SELECT *
-        FROM blocks
-        WHERE category_id = %s
-        ORDER BY block_number
-    """
-    return {"blocks": execute_query(query, (category_id,))}
+async def get_blocks(category_id: int, request: Request):
+    catalog = get_catalog()
+    return await cached_json(
+        request, "catalog", catalog.digest, ("blocks", category_id),
+        lambda: {"blocks": list(catalog.blocks(category_id))},
+    )
 
 # ------------------ Questions ------------------
 @app.get("/api/blocks/{block_code}/questions")
-async def get_questions_by_block(block_code: str):
+async def get_questions_by_block(block_code: str, request: Request):
     try:
         # Split "1_1" → category_id=1, block_number=1
-        parts = block_code.split('_')
-        if len(parts) != 2:
-            raise ValueError("Invalid block code format")
-
-        category_id = int(parts[0])
-        block_number = int(parts[1])
-
-        query = """
-            SELECT *
-            FROM questions
-            WHERE category_id = %s
-              AND block_number = %s
-            ORDER BY question_number
-        """
-        results = execute_query(query, (category_id, block_number))
+        category_id, block_number = parse_block_code(block_code)
+        catalog = get_catalog()
 
         # ✅ Wrap like categories/blocks/options
-        return {"questions": results}
+        return await cached_json(
+            request, "catalog", catalog.digest, ("questions", category_id, block_number),
+            lambda: {"questions": list(catalog.questions(category_id, block_number))},
+        )
 
     except Exception as e:
         logger.error(f"Database operation failed: {e}")
         raise HTTPException(status_code=500, detail=f"Database operation failed: {e}")
 
 
+# ------------------ Full block payload ------------------
+@app.get("/api/blocks/{block_code}/full")
+@admitted(CATALOG)
+async def get_block_full(block_code: str, request: Request, include_results: bool = False):
+    """
+    Everything a block page needs in one request: the block, its questions
+    and each question's options nested under "options". With
+    include_results=true each question also carries its current tallies;
+    while the database is down those are the last known ones, or null.
+    """
+    try:
+        category_id, block_number = parse_block_code(block_code)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid block code format")
+
+    catalog = get_catalog()
+    block = next((b for b in catalog.blocks(category_id) if b["block_number"] == block_number), None)
+    if block is None:
+        raise HTTPException(status_code=404, detail="Block not found")
+
+    def build():
+        questions = []
+        for q in catalog.questions(category_id, block_number):
+            item = dict(q, options=list(catalog.options(q["question_code"])))
+            questions.append(item)
+        return {"block": block, "questions": questions}
+
+    # Tallies change with every vote, so only the catalog-only form is cached
+    if not include_results:
+        return await cached_json(request, "catalog", catalog.digest, ("full", category_id, block_number), build)
+    payload = build()
+    codes = [q["question_code"] for q in payload["questions"]]
+    headers = None
+    try:
+        results = await get_results_many(codes)
+    except DatabaseUnavailable:
+        # Last known results while the database is down, else the catalog alone
+        stale = stale_results(codes)
+        results, age = stale if stale is not None else ([None] * len(codes), 0.0)
+        headers = stale_headers(age)
+    for item, result in zip(payload["questions"], results):
+        item["results"] = result
+    return Response(content=encode_json(payload), media_type="application/json", headers=headers)
+
+
 # ------------------ Options ------------------
 @app.get("/api/questions/{question_code}/options")
-def get_options(question_code: str):
-    query = """
-        SELECT *
-        FROM options
-        WHERE question_code = %s
-        ORDER BY option_select
-    """
-    return {"options": execute_query(query, (question_code,))}
+async def get_options(question_code: str, request: Request):
+    catalog = get_catalog()
+    return await cached_json(
+        request, "catalog", catalog.digest, ("options", question_code),
+        lambda: {"options": list(catalog.options(question_code))},
+    )
 
 # ------------------ Soundtracks (stubbed safely) ------------------
 @app.get("/api/soundtracks")
-def get_soundtracks():
-    query = "SELECT * FROM soundtracks ORDER BY id"
-    results = execute_query(query)
-    return {"soundtracks": results}
+async def get_soundtrack_list(request: Request):
+    tracks = get_soundtracks()
+    return await cached_json(
+        request, "soundtracks", tracks.digest, ("soundtracks",),
+        lambda: {"soundtracks": list(tracks.soundtracks)},
+    )
 
 @app.get("/api/soundtracks/playlists")
-def get_soundtrack_playlists():
-    query = "SELECT DISTINCT playlist_tag FROM soundtracks WHERE playlist_tag IS NOT NULL"
-    results = execute_query(query)
-    playlists = [row["playlist_tag"] for row in results if row.get("playlist_tag")]
-    return {"playlists": playlists}
+async def get_soundtrack_playlists(request: Request):
+    tracks = get_soundtracks()
+    return await cached_json(
+        request, "soundtracks", tracks.digest, ("soundtrack_playlists",),
+        lambda: {"playlists": list(tracks.playlist_tags)},
+    )
 
 # ------------------ Users ------------------
 @app.post("/api/users")
-def create_user(user_uuid: str, year_of_birth: int):
+@admitted(VOTE)
+async def create_user(user_uuid: str, year_of_birth: int):
     query = """
         INSERT INTO users (user_uuid, year_of_birth)
         VALUES (%s, %s)
         ON CONFLICT DO NOTHING
     """
-    execute_query(query, (user_uuid, year_of_birth), fetch=False)
+    await execute_query("users.create", query, (user_uuid, year_of_birth), fetch=False)
     return {"message": "User created or already exists"}
 
 
 
 
 # ------------------ Separate vote handler (single, checkbox, other) ------------------
-def get_metadata(q_code, opt_select=None):
-    if opt_select:
-        rows = execute_query(
-            """
-            SELECT q.question_text, q.question_number,
-                   q.category_id, c.category_name, c.category_text, q.block_number,
-                   o.option_select, o.option_code, o.option_text
-            FROM questions q
-            JOIN categories c ON q.category_id = c.id
-            JOIN options o ON q.question_code = o.question_code
-            WHERE q.question_code = %s AND o.option_select = %s
-            """,
-            (q_code, opt_select)
-        )
-    else:
-        rows = execute_query(
-            """
-            SELECT q.question_text, q.question_number,
-                   q.category_id, c.category_name, c.category_text, q.block_number
-            FROM questions q
-            JOIN categories c ON q.category_id = c.id
-            WHERE q.question_code = %s
-            """,
-            (q_code,)
-        )
-    return rows[0] if rows else None
+def get_metadata(q_code):
+    """
+    Denormalized question/category fields for a vote row, from the catalog's
+    in-memory index (refreshed with the catalog), so a vote needs no read query.
+    """
+    return get_catalog().meta(q_code)
 
 
-# ----------------------------
-# Vote submission (single, checkbox, free text)
-# ----------------------------
-# ----------------------------
-# Submit vote
-# ----------------------------
-@app.post("/api/vote/single")
-def submit_single_vote(vote: dict):
-    """Handle single-choice votes - stores in responses table"""
-    user_uuid = vote.get("user_uuid")
-    question_code = vote.get("question_code")
-    option_select = vote.get("option_select")
-    other_text = vote.get("other_text")
+async def record_votes(batch: VoteBatch, include_results: bool = False):
+    """
+    Write the batch now, or queue it for the background flusher in buffered mode.
 
-    if not user_uuid or not question_code or not option_select:
-        raise HTTPException(status_code=400, detail="Missing required fields")
+    Returns (status, results). With include_results, results holds the
+    /api/results body of every question in the batch: read inside the vote
+    transaction when writing synchronously, or the current tallies (without
+    the queued vote) in buffered mode. Otherwise results is None.
 
-    # Lookup question metadata
-    meta = get_metadata(question_code)
-    if not meta:
-        raise HTTPException(status_code=404, detail="Question not found")
+    While the database is down the batch is spooled to disk instead (see
+    backend/vote_buffer.py) and results are the last known tallies, if any.
+    """
+    if vote_buffer.enabled:
+        await vote_buffer.submit(batch)
+        results = await current_results(batch.question_codes) if include_results else None
+        return {"queued": True}, results
 
-    # Normalize "Other" values
-    OTHER_KEY = "OTHER"
-    if option_select and isinstance(option_select, str) and option_select.strip().upper() == OTHER_KEY:
-        option_select = OTHER_KEY
+    fresh = {}
 
-    if other_text:
-        other_text = other_text.strip()
+    async def read_tallies(cur):
+        fresh["started"] = time.monotonic()
+        fresh["tallies"] = await query_many_tallies_async(cur, batch.question_codes)
 
-    # Insert single-choice vote
-    execute_query(
-        """
-        INSERT INTO responses
-        (user_uuid, question_code, question_text, question_number,
-        category_id, category_name, category_text, block_number,
-        option_id, option_select, option_code, option_text,
-        created_at)
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())
-        """,
-        (
-            user_uuid, question_code, meta["question_text"], meta["question_number"],
-            meta["category_id"], meta["category_name"], meta["category_text"], meta["block_number"],
-            None, option_select, f"{question_code}_{option_select}", option_select
-        ),
-        fetch=False
-    )
+    write_started = time.monotonic()
+    try:
+        await write_votes_async(batch, in_transaction=read_tallies if include_results else None)
+    except DatabaseUnavailable as e:
+        logger.warning(f"Spooling vote for {batch.question_codes}: {e}")
+        await vote_buffer.spool(batch)
+        results = await current_results(batch.question_codes) if include_results else None
+        return {"queued": True, "spooled": True}, results
+    # Keep this worker's cached results in step with its own votes
+    results_cache.apply_votes(batch, write_started)
+    results_hub.mark_changed(batch.question_codes)
+    if not include_results:
+        return {}, None
 
-    # If user selected OTHER and typed free text, also store it
-    if option_select == "OTHER" and other_text:
-        execute_query(
-            """
-            INSERT INTO other_responses
-            (user_uuid, question_code, question_text, question_number,
-            category_id, category_name, category_text, block_number,
-            other_text, created_at)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())
-            """,
-            (
-                user_uuid, question_code,
-                meta["question_text"], meta["question_number"],
-                meta["category_id"], meta["category_name"], meta["category_text"], meta["block_number"],
-                other_text,
-            ),
-            fetch=False,
-        )
+    results = []
+    for code in batch.question_codes:
+        counts, total = fresh["tallies"][code]
+        tallies = Tallies(counts=counts, total=total, fetched_at=fresh["started"])
+        results_cache.put(code, tallies)
+        results.append(results_payload(code, tallies))
+    return {}, results
 
-    return {"message": "Single-choice vote recorded", "question_code": question_code}
 
-# Checkbox vote endpoint
-@app.post("/api/vote/checkbox")
-def submit_checkbox_vote(vote: dict):
-    """Handle checkbox votes - stores in checkbox_responses table with weights"""
+def add_vote(batch: VoteBatch, kind: str, vote: dict) -> str:
+    """
+    Validate one vote payload and add its rows to batch.
+    kind is "single", "checkbox" or "other"; returns the question_code.
+    """
     user_uuid = vote.get("user_uuid")
     question_code = vote.get("question_code")
-    option_selects = vote.get("option_selects", [])
     other_text = vote.get("other_text")
 
-    if not user_uuid or not question_code or not option_selects:
-        raise HTTPException(status_code=400, detail="Missing required fields")
-
-    if len(option_selects) == 0:
-        raise HTTPException(status_code=400, detail="No checkbox options provided")
+    if kind == "single":
+        option_select = vote.get("option_select")
+        if not user_uuid or not question_code or not option_select:
+            raise HTTPException(status_code=400, detail="Missing required fields")
+    elif kind == "checkbox":
+        option_selects = vote.get("option_selects", [])
+        if not user_uuid or not question_code or not option_selects:
+            raise HTTPException(status_code=400, detail="Missing required fields")
+        if len(option_selects) == 0:
+            raise HTTPException(status_code=400, detail="No checkbox options provided")
+    elif kind == "other":
+        if not user_uuid or not question_code or not other_text:
+            raise HTTPException(status_code=400, detail="Missing required fields")
+        other_text = other_text.strip()
+        if not other_text:
+            raise HTTPException(status_code=400, detail="Other text cannot be empty")
+    else:
+        raise HTTPException(status_code=400, detail=f"Unknown vote type: {kind}")
 
     # Lookup question metadata
     meta = get_metadata(question_code)
     if not meta:
         raise HTTPException(status_code=404, detail="Question not found")
 
-    # Normalize "Other" values
-    OTHER_KEY = "OTHER"
-    option_selects = [OTHER_KEY if isinstance(v, str) and v.strip().upper() == OTHER_KEY else v for v in option_selects]
+    if kind == "single":
+        # Nothing in the DB will reject a bad option once the write is deferred
+        if vote_buffer.enabled:
+            check_option_selects(meta, [option_select])
+        # Vote row (+ free text if OTHER was picked)
+        batch.add_single(meta, user_uuid, option_select, other_text)
+    elif kind == "checkbox":
+        if vote_buffer.enabled:
+            check_option_selects(meta, option_selects)
+        # One weighted row per selected option (+ free text)
+        batch.add_checkbox(meta, user_uuid, option_selects, other_text)
+    else:
+        # Free text + OTHER placeholder in responses
+        batch.add_other(meta, user_uuid, other_text)
+    return question_code
 
-    if other_text:
-        other_text = other_text.strip()
 
-    # Calculate weight (each option gets equal weight)
-    weight = 1.0 / len(option_selects)
-
-    # Insert each selected option
-    for opt in option_selects:
-        execute_query(
-            """
-            INSERT INTO checkbox_responses
-            (user_uuid, question_code, question_text, question_number,
-            category_id, category_name, category_text, block_number,
-            option_id, option_select, option_code, option_text,
-            weight, created_at)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())
-            """,
-            (
-                user_uuid, question_code, meta["question_text"], meta["question_number"],
-                meta["category_id"], meta["category_name"], meta["category_text"], meta["block_number"],
-                None, opt, f"{question_code}_{opt}", opt, weight
-            ),
-            fetch=False
-        )
+# ----------------------------
+# Vote submission (single, checkbox, free text)
+# ----------------------------
+# ----------------------------
+# Submit vote
+# ----------------------------
+@app.post("/api/vote/single")
+@admitted(VOTE)
+async def submit_single_vote(vote: dict, include_results: bool = False):
+    """Handle single-choice votes - stores in responses table"""
+    batch = VoteBatch()
+    question_code = add_vote(batch, "single", vote)
+    status, results = await record_votes(batch, include_results)
+    if include_results:
+        status["results"] = results[0] if results is not None else None
+    return {"message": "Single-choice vote recorded", "question_code": question_code, **status}
 
-        # If "OTHER" was selected and free text exists, also store it
-        if opt == "OTHER" and other_text:
-            execute_query(
-                """
-                INSERT INTO other_responses
-                (user_uuid, question_code, question_text, question_number,
-                category_id, category_name, category_text, block_number,
-                other_text, created_at)
-                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())
-                """,
-                (
-                    user_uuid, question_code,
-                    meta["question_text"], meta["question_number"],
-                    meta["category_id"], meta["category_name"], meta["category_text"], meta["block_number"],
-                    other_text,
-                ),
-                fetch=False,
-            )
-
-    return {"message": "Checkbox vote(s) recorded", "question_code": question_code}
+# Checkbox vote endpoint
+@app.post("/api/vote/checkbox")
+@admitted(VOTE)
+async def submit_checkbox_vote(vote: dict, include_results: bool = False):
+    """Handle checkbox votes - stores in checkbox_responses table with weights"""
+    batch = VoteBatch()
+    question_code = add_vote(batch, "checkbox", vote)
+    status, results = await record_votes(batch, include_results)
+    if include_results:
+        status["results"] = results[0] if results is not None else None
+    return {"message": "Checkbox vote(s) recorded", "question_code": question_code, **status}
 
 # Other text vote endpoint
 @app.post("/api/vote/other")
-def submit_other_vote(vote: dict):
+@admitted(VOTE)
+async def submit_other_vote(vote: dict, include_results: bool = False):
     """Handle other text votes - stores in other_responses and creates placeholder in responses"""
-    user_uuid = vote.get("user_uuid")
-    question_code = vote.get("question_code")
-    other_text = vote.get("other_text")
-
-    if not user_uuid or not question_code or not other_text:
-        raise HTTPException(status_code=400, detail="Missing required fields")
-
-    other_text = other_text.strip()
-    if not other_text:
-        raise HTTPException(status_code=400, detail="Other text cannot be empty")
-
-    # Lookup question metadata
-    meta = get_metadata(question_code)
-    if not meta:
-        raise HTTPException(status_code=404, detail="Question not found")
-
-    OTHER_KEY = "OTHER"
-
-    # Store the free text
-    execute_query(
-        """
-        INSERT INTO other_responses
-        (user_uuid, question_code, question_text, question_number,
-        category_id, category_name, category_text, block_number,
-        other_text, created_at)
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())
-        """,
-        (
-            user_uuid, question_code,
-            meta["question_text"], meta["question_number"],
-            meta["category_id"], meta["category_name"], meta["category_text"], meta["block_number"],
-            other_text,
-        ),
-        fetch=False,
-    )
+    batch = VoteBatch()
+    question_code = add_vote(batch, "other", vote)
+    status, results = await record_votes(batch, include_results)
+    if include_results:
+        status["results"] = results[0] if results is not None else None
+    return {"message": "Other text response recorded", "question_code": question_code, **status}
+
+# Whole-block vote endpoint
+MAX_BATCH_VOTES = 100
+
+@app.post("/api/vote/batch")
+@admitted(VOTE)
+async def submit_vote_batch(payload: dict):
+    """
+    Submit several votes for one user in one request and one transaction.
 
-    # Create a placeholder in responses so charts show "Other"
-    execute_query(
-        """
-        INSERT INTO responses
-        (user_uuid, question_code, question_text, question_number,
-        category_id, category_name, category_text, block_number,
-        option_id, option_select, option_code, option_text,
-        created_at)
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())
-        """,
-        (
-            user_uuid, question_code,
-            meta["question_text"], meta["question_number"],
-            meta["category_id"], meta["category_name"], meta["category_text"], meta["block_number"],
-            None, OTHER_KEY, f"{question_code}_{OTHER_KEY}", "Other",
-        ),
-        fetch=False,
-    )
+    Body: {"user_uuid": "...", "votes": [{"type": "single"|"checkbox"|"other",
+    "question_code": "...", "option_select" | "option_selects" | "other_text": ...}, ...]}
 
-    return {"message": "Other text response recorded", "question_code": question_code}
+    Either every vote is recorded or none is. The response carries the
+    updated tallies of every affected question, so no follow-up
+    /api/results calls are needed.
+    """
+    user_uuid = payload.get("user_uuid")
+    votes = payload.get("votes")
+    if not user_uuid or not isinstance(votes, list) or not votes:
+        raise HTTPException(status_code=400, detail="Missing required fields")
+    if len(votes) > MAX_BATCH_VOTES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_VOTES} votes per batch")
+
+    batch = VoteBatch()
+    for i, vote in enumerate(votes):
+        if not isinstance(vote, dict):
+            raise HTTPException(status_code=400, detail=f"votes[{i}]: expected an object")
+        if vote.get("user_uuid", user_uuid) != user_uuid:
+            raise HTTPException(status_code=400, detail=f"votes[{i}]: user_uuid does not match")
+        if vote.get("question_code") in batch.question_codes:
+            raise HTTPException(status_code=400, detail=f"votes[{i}]: duplicate question_code")
+        try:
+            add_vote(batch, vote.get("type", "single"), {**vote, "user_uuid": user_uuid})
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=f"votes[{i}]: {e.detail}")
+
+    status, results = await record_votes(batch, include_results=True)
+    return {
+        "message": f"{len(votes)} vote(s) recorded",
+        "question_codes": batch.question_codes,
+        "results": results,
+        **status,
+    }
 
 
 
@@ -441,58 +579,30 @@ def submit_other_vote(vote: dict):
 # ----------------------------
 # Results aggregation
 # ----------------------------
-@app.get("/api/results/{question_code}")
-def get_results(question_code: str):
-    """
-    Aggregates results for a question:
-      - Single-choice from responses
-      - Checkbox from checkbox_responses
-      - Total responses reported as integer (number of distinct users)
+async def load_tallies(question_code: str):
+    """Weighted votes per option and the response-row total, in one prepared statement.
+
+    Answered from the results_summary rollup instead while the freshness
+    mode allows it (backend/results_summary.py).
     """
+    relaxed = results_summary.relaxed_tallies([question_code])
+    if relaxed is not None:
+        return relaxed[question_code]
+    try:
+        with results_summary.live_load():
+            return await fetch_tallies_async(question_code)
+    except Exception as e:
+        logging.error(f"Database operation failed: {e}")
+        raise database_error(e)
 
-    # Get all option definitions for the question
-    option_rows = execute_query(
-        """
-        SELECT option_select, option_code, option_text
-        FROM options
-        WHERE question_code = %s
-        ORDER BY id
-        """,
-        (question_code,)
-    ) or []
-
-    # Single-choice counts
-    single_counts = execute_query(
-        """
-        SELECT option_select, COUNT(*)::float as votes
-        FROM responses
-        WHERE question_code = %s
-        GROUP BY option_select
-        """,
-        (question_code,)
-    ) or []
-
-    # Checkbox counts (safe cast + handle empty case)
-    checkbox_counts = execute_query(
-        """
-        SELECT option_select, COALESCE(SUM(weight),0)::float as votes
-        FROM checkbox_responses
-        WHERE question_code = %s
-        GROUP BY option_select
-        """,
-        (question_code,)
-    ) or []
-
-
-    # --- Merge counts into one dict ---
-    counts = {}
-    for row in single_counts + checkbox_counts:
-        sel = row["option_select"]
-        counts[sel] = counts.get(sel, 0) + row["votes"]
-
-    # --- Build results list from canonical options ---
+
+def results_payload(question_code: str, tallies) -> dict:
+    """The /api/results body for question_code from cached or freshly loaded tallies."""
+    counts = tallies.counts
+
+    # --- Build results list from canonical options (in options.id order) ---
     results = []
-    for opt in option_rows:
+    for opt in sorted(get_catalog().options(question_code), key=lambda o: o["id"]):
         sel = opt["option_select"]
         votes = counts.get(sel, 0)
         results.append({
@@ -503,23 +613,7 @@ def get_results(question_code: str):
         })
 
     # --- Total responses as integer (count all answers, not unique users) ---
-    # Count all responses: one per row in responses table, one per row in checkbox_responses table
-    total_result = execute_query(
-        """
-        SELECT COUNT(*) AS n FROM (
-            SELECT user_uuid
-            FROM responses
-            WHERE question_code = %s
-            UNION ALL
-            SELECT user_uuid
-            FROM checkbox_responses
-            WHERE question_code = %s
-        ) AS all_votes
-        """,
-        (question_code, question_code)
-    )
-    
-    total = int(total_result[0]["n"]) if total_result else 0
+    total = tallies.total
 
     return {
         "question_code": question_code,
@@ -528,13 +622,326 @@ def get_results(question_code: str):
     }
 
 
+MAX_RESULTS_QUESTIONS = 200
+RESULTS_STREAM_CHUNK = 50
+
+
+async def load_many_tallies(question_codes: List[str]):
+    """Tallies for several questions from one grouped query on question_tallies."""
+    relaxed = results_summary.relaxed_tallies(question_codes)
+    if relaxed is not None:
+        return relaxed
+    try:
+        with results_summary.live_load():
+            return await fetch_many_tallies_async(question_codes)
+    except Exception as e:
+        logging.error(f"Database operation failed: {e}")
+        raise database_error(e)
+
+
+async def get_results_many(question_codes: List[str]) -> List[dict]:
+    """get_results for several questions, with every cache miss loaded in one query."""
+    tallies = await results_cache.get_or_load_many_async(question_codes, load_many_tallies)
+    return [results_payload(code, tallies[code]) for code in question_codes]
+
+
+def stale_results(question_codes: List[str]) -> Optional[Tuple[List[dict], float]]:
+    """
+    The last known results while the database is down: expired results_cache
+    entries, else the last results_summary load. Returns (bodies, age in
+    seconds of the oldest), or None if some question has neither.
+    """
+    now = time.monotonic()
+    summary = None
+    payloads, age = [], 0.0
+    for code in question_codes:
+        tallies = results_cache.peek(code)
+        if tallies is not None:
+            tallies_age = now - tallies.fetched_at
+        else:
+            summary = summary or results_summary.stale_tallies(question_codes)
+            if summary is None:
+                return None
+            (counts, total), tallies_age = summary[0][code], summary[1]
+            tallies = Tallies(counts=counts, total=total)
+        payloads.append(results_payload(code, tallies))
+        age = max(age, tallies_age)
+    return payloads, age
+
+
+def stale_headers(age: float) -> dict:
+    return {"Age": str(int(age)), "X-Data-Freshness": "stale"}
+
+
+async def current_results(question_codes: List[str]) -> Optional[List[dict]]:
+    """get_results_many for a vote response: stale results, or None, while the database is down."""
+    try:
+        return await get_results_many(question_codes)
+    except DatabaseUnavailable:
+        stale = stale_results(question_codes)
+        return stale[0] if stale is not None else None
+
+
+def load_fresh_tallies(question_codes: List[str]):
+    """Tallies straight from the database (bypassing the TTL), refreshing results_cache.
+
+    Runs on the results publisher thread, so it uses the thread-based pool.
+    """
+    started = time.monotonic()
+    tallies = fetch_many_tallies(question_codes)
+    for code, (counts, total) in tallies.items():
+        results_cache.put(code, Tallies(counts=counts, total=total, fetched_at=started))
+    return tallies
+
+
+async def load_fresh_tallies_async(question_codes: List[str]):
+    """load_fresh_tallies for request handlers."""
+    started = time.monotonic()
+    tallies = await fetch_many_tallies_async(question_codes)
+    for code, (counts, total) in tallies.items():
+        results_cache.put(code, Tallies(counts=counts, total=total, fetched_at=started))
+    return tallies
+
+
+# Live results over Server-Sent Events; declared before /api/results/{question_code}
+RESULTS_STREAM_KEEPALIVE_SECONDS = 15
 
+@app.get("/api/results/stream")
+@admitted(RESULTS)
+async def stream_results(request: Request, question_codes: str):
+    """
+    Server-Sent Events feed of result changes for question_codes=1_1,1_2,...
+
+    Sends one "snapshot" event per question (the /api/results/{code} body),
+    then a "delta" event whenever a question's tallies change:
+      {"question_code": ..., "votes": {option_select: new votes}, "total_responses": ...}
+    Deltas come from the in-process results hub (backend/results_stream.py),
+    which is fed by this worker's vote path and polls for other workers' votes.
+    """
+    codes = list(dict.fromkeys(c.strip() for c in question_codes.split(",") if c.strip()))
+    if not codes:
+        raise HTTPException(status_code=400, detail="Missing required fields")
+    if len(codes) > MAX_RESULTS_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_RESULTS_QUESTIONS} questions per request")
+
+    # Subscribe first so no change between the snapshot and the first delta is lost
+    sub = results_hub.subscribe(codes, asyncio.get_running_loop())
+    try:
+        tallies = await load_fresh_tallies_async(codes)
+    except Exception as e:
+        results_hub.unsubscribe(sub)
+        logger.error(f"Database operation failed: {e}")
+        raise database_error(e)
+    snapshots = []
+    for code in codes:
+        counts, total = tallies[code]
+        results_hub.seed(code, counts, total)
+        snapshots.append(results_payload(code, Tallies(counts=counts, total=total)))
+
+    async def events():
+        try:
+            for payload in snapshots:
+                yield f"event: snapshot\ndata: {json.dumps(payload)}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    delta = await asyncio.wait_for(sub.queue.get(), RESULTS_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if delta is None:
+                    break
+                yield f"event: delta\ndata: {json.dumps(delta)}\n\n"
+        finally:
+            results_hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def get_results_by_age_band(question_code: str) -> dict:
+    """Results split by age band, from the results_by_birth_year cube."""
+    try:
+        bands = await fetch_age_band_tallies_async(question_code)
+    except Exception as e:
+        logging.error(f"Database operation failed: {e}")
+        raise database_error(e)
+
+    labels = [label for label, _, _ in AGE_BANDS]
+    if UNDER_AGE_BAND in bands:
+        labels.insert(0, UNDER_AGE_BAND)
+    breakdown = []
+    for label in labels:
+        counts, total = bands.get(label, ({}, 0))
+        payload = results_payload(question_code, Tallies(counts=counts, total=total))
+        breakdown.append({"age_band": label, "results": payload["results"], "total_responses": total})
+    return {"question_code": question_code, "by": "age_band", "bands": breakdown}
+
+
+@app.get("/api/results/{question_code}")
+@admitted(RESULTS)
+async def get_results(question_code: str, response: Response, by: Optional[str] = None):
+    """
+    Aggregates results for a question:
+      - Single-choice from responses
+      - Checkbox from checkbox_responses
+      - Total responses reported as integer (count of response rows)
 
+    Counts come from question_tallies, which triggers keep current on every
+    insert/delete (see backend/schema_tallies.sql), so this is one indexed
+    lookup no matter how many votes exist, and it is skipped entirely while
+    the question's entry in results_cache is fresh. Option definitions come
+    from the catalog snapshot.
+
+    by=age_band returns the same results split by age band instead.
+
+    While the database is down the last known results are returned with
+    "X-Data-Freshness: stale" and an Age header (seconds).
+    """
+    if by is not None:
+        if by != "age_band":
+            raise HTTPException(status_code=400, detail="Unsupported breakdown; use by=age_band")
+        return await get_results_by_age_band(question_code)
+    try:
+        return results_payload(question_code, await results_cache.get_or_load_async(question_code, load_tallies))
+    except DatabaseUnavailable:
+        stale = stale_results([question_code])
+        if stale is None:
+            raise
+        response.headers.update(stale_headers(stale[1]))
+        return stale[0][0]
+
+
+# Result trends, read from the hourly rollup only
+MAX_TREND_BUCKETS = 2000
+DEFAULT_TREND_DAYS = 7
+
+@app.get("/api/results/{question_code}/trend")
+@admitted(RESULTS)
+async def get_results_trend(
+    question_code: str,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    bucket: str = "hour",
+):
+    """
+    Votes per option over time for charts: ?from=&to= (ISO datetimes, default
+    the last 7 days; without a timezone they are taken as UTC) and
+    bucket=hour|day|week. Times in the body are aware UTC ISO strings. Every
+    bucket in the range is returned, empty ones included:
+      {"start": ..., "votes": {option_select: votes}, "total_responses": n}
+    Served from results_hourly (backend/schema_hourly.sql), never from raw rows.
+    """
+    if bucket not in TREND_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(TREND_BUCKETS)}")
+    # A from/to without a timezone is read as UTC, like results_hourly.hour
+    if start is not None and start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end is not None and end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    end = end.astimezone(timezone.utc) if end else datetime.now(timezone.utc)
+    start = start.astimezone(timezone.utc) if start else end - timedelta(days=DEFAULT_TREND_DAYS)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="from must be before to")
+    step = {"hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(weeks=1)}[bucket]
+    if (end - start) / step > MAX_TREND_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_TREND_BUCKETS} buckets per request")
+
+    try:
+        series = await fetch_trend_async(question_code, bucket, start, end)
+    except Exception as e:
+        logging.error(f"Database operation failed: {e}")
+        raise database_error(e)
+
+    options = sorted(get_catalog().options(question_code), key=lambda o: o["id"])
+    return {
+        "question_code": question_code,
+        "bucket": bucket,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "options": [
+            {"option_select": o["option_select"], "option_code": o["option_code"], "option_text": o["option_text"]}
+            for o in options
+        ],
+        "buckets": [
+            {"start": bucket_start.isoformat(), "votes": counts, "total_responses": total}
+            for bucket_start, counts, total in series
+        ],
+    }
+
+
+# Batch results: one request for a whole block or category
+@app.get("/api/results")
+@admitted(RESULTS)
+async def get_results_batch(block_code: Optional[str] = None, category_id: Optional[int] = None,
+                      question_codes: Optional[str] = None):
+    """
+    Results for many questions at once; pass exactly one of
+      block_code=1_2, category_id=1 or question_codes=1_1,1_2,...
+
+    Body: {"questions": [<same object as /api/results/{code}>, ...]} in
+    question order. Tallies are read from results_cache, and the misses of
+    each chunk of RESULTS_STREAM_CHUNK questions are loaded with a single
+    grouped query. The body is streamed chunk by chunk as it is built.
+    While the database is down it is built from stale results instead, as
+    for /api/results/{code}.
+    """
+    if sum(p is not None for p in (block_code, category_id, question_codes)) != 1:
+        raise HTTPException(status_code=400, detail="Pass exactly one of block_code, category_id or question_codes")
+
+    catalog = get_catalog()
+    if block_code is not None:
+        try:
+            cat, block_number = parse_block_code(block_code)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid block code format")
+        if not any(b["block_number"] == block_number for b in catalog.blocks(cat)):
+            raise HTTPException(status_code=404, detail="Block not found")
+        codes = [q["question_code"] for q in catalog.questions(cat, block_number)]
+    elif category_id is not None:
+        blocks = catalog.blocks(category_id)
+        if not blocks:
+            raise HTTPException(status_code=404, detail="Category not found")
+        codes = [q["question_code"] for b in blocks for q in catalog.questions(category_id, b["block_number"])]
+    else:
+        codes = list(dict.fromkeys(c.strip() for c in question_codes.split(",") if c.strip()))
+        if not codes:
+            raise HTTPException(status_code=400, detail="Missing required fields")
+        if len(codes) > MAX_RESULTS_QUESTIONS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_RESULTS_QUESTIONS} questions per request")
+
+    chunks = [codes[i:i + RESULTS_STREAM_CHUNK] for i in range(0, len(codes), RESULTS_STREAM_CHUNK)]
+    # Load the first chunk before responding so a database failure is still a 500
+    try:
+        first = await get_results_many(chunks[0]) if chunks else []
+    except DatabaseUnavailable:
+        stale = stale_results(codes)
+        if stale is None:
+            raise
+        return Response(encode_json({"questions": stale[0]}), media_type="application/json",
+                        headers=stale_headers(stale[1]))
+
+    async def stream():
+        yield b'{"questions":['
+        for n, chunk in enumerate(chunks):
+            try:
+                items = first if n == 0 else await get_results_many(chunk)
+            except (HTTPException, DatabaseUnavailable):
+                # Headers are gone; end the body early so the client sees invalid JSON
+                logger.error(f"Batch results stream aborted at chunk {n} of {len(chunks)}")
+                return
+            for i, item in enumerate(items):
+                yield (b"," if n or i else b"") + encode_json(item)
+        yield b"]}"
+
+    return StreamingResponse(stream(), media_type="application/json")
 
 
 # ------------------ Age Validation ------------------
 @app.post("/api/validate-age")
-def validate_age(payload: dict):
+async def validate_age(payload: dict):
     try:
         year_of_birth = payload.get("year_of_birth")
 
@@ -557,22 +964,48 @@ def validate_age(payload: dict):
         raise HTTPException(status_code=500, detail=f"Age validation failed: {e}")
 
 # ------------------ Playlists ------------------
+# Served from the soundtrack snapshot; queried live only if the playlist
+# tables were missing when the snapshot was loaded.
 @app.get("/api/playlists")
-def get_playlists():
-    query = "SELECT * FROM playlists ORDER BY id"
-    results = execute_query(query)
-    return {"playlists": results}
+@admitted(CATALOG)
+async def get_playlists(request: Request):
+    tracks = get_soundtracks()
+    if tracks.playlists is None:
+        query = "SELECT * FROM playlists ORDER BY id"
+        results = await execute_query("playlists.list", query, intent=READ)
+        return {"playlists": results}
+    return await cached_json(
+        request, "soundtracks", tracks.digest, ("playlists",),
+        lambda: {"playlists": list(tracks.playlists)},
+    )
 
 @app.get("/api/playlists/{playlist_id}")
-def get_playlist(playlist_id: int):
-    query = "SELECT * FROM playlists WHERE id = %s"
-    results = execute_query(query, (playlist_id,))
-    if not results:
+@admitted(CATALOG)
+async def get_playlist(playlist_id: int, request: Request):
+    tracks = get_soundtracks()
+    if tracks.playlists is None:
+        query = "SELECT * FROM playlists WHERE id = %s"
+        results = await execute_query("playlists.get", query, (playlist_id,), intent=READ)
+        if not results:
+            raise HTTPException(status_code=404, detail="Playlist not found")
+        return {"playlist": results[0]}
+    playlist = tracks.playlist(playlist_id)
+    if playlist is None:
         raise HTTPException(status_code=404, detail="Playlist not found")
-    return {"playlist": results[0]}
+    return await cached_json(
+        request, "soundtracks", tracks.digest, ("playlist", playlist_id),
+        lambda: {"playlist": playlist},
+    )
 
 @app.get("/api/playlists/{playlist_id}/songs")
-def get_playlist_songs(playlist_id: int):
+@admitted(CATALOG)
+async def get_playlist_songs(playlist_id: int, request: Request):
+    tracks = get_soundtracks()
+    if tracks.playlists is not None:
+        return await cached_json(
+            request, "soundtracks", tracks.digest, ("playlist_songs", playlist_id),
+            lambda: {"songs": list(tracks.playlist_songs(playlist_id))},
+        )
     query = """
         SELECT ps.*, s.*
         FROM playlist_songs ps
@@ -580,5 +1013,5 @@ def get_playlist_songs(playlist_id: int):
         WHERE ps.playlist_id = %s
         ORDER BY ps.order_number
     """
-    results = execute_query(query, (playlist_id,))
+    results = await execute_query("playlists.songs", query, (playlist_id,), intent=READ)
     return {"songs": results}
@@ -0,0 +1,8 @@
+# tests/conftest.py
+import os
+import sys
+
+# backend.db needs a DATABASE_URL at import; nothing listens on this socket,
+# so the module-level pool starts empty and the tests never touch Postgres
+os.environ.setdefault("DATABASE_URL", "postgresql://test@/test?host=/nonexistent-test-socket")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
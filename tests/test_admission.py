@@ -0,0 +1,162 @@
+# tests/test_admission.py
+"""AdmissionController priority queueing, shedding and counters."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from backend.admission import CATALOG, HEALTH, MAX_RETRY_AFTER_SECONDS, RESULTS, VOTE, AdmissionController
+
+
+async def request(ac, name, priority, log, release):
+    """Take a slot, record the admission, hold the slot until release is set."""
+    try:
+        async with ac.slot(priority):
+            log.append(name)
+            await release.wait()
+        return name, 200, None
+    except HTTPException as e:
+        return name, e.status_code, e.headers.get("Retry-After")
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_waiters_admitted_by_priority_then_arrival():
+    async def scenario():
+        ac = AdmissionController(capacity=1, queue_max=10, max_wait=5.0, enabled=True)
+        log, releases = [], {}
+        tasks = []
+        for name, priority in [("first", HEALTH), ("c1", CATALOG), ("h1", HEALTH), ("r1", RESULTS),
+                               ("v1", VOTE), ("r2", RESULTS)]:
+            releases[name] = asyncio.Event()
+            tasks.append(asyncio.create_task(request(ac, name, priority, log, releases[name])))
+            await settle()
+        assert log == ["first"]
+        for name in ["first", "v1", "r1", "r2", "c1", "h1"]:
+            releases[name].set()
+            await settle()
+        await asyncio.gather(*tasks)
+        return ac, log
+
+    ac, log = asyncio.run(scenario())
+    assert log == ["first", "v1", "r1", "r2", "c1", "h1"]
+    assert ac.in_flight == 0
+    assert ac.snapshot()["queued"] == 0
+
+
+def test_full_queue_sheds_new_request_with_retry_after():
+    async def scenario():
+        ac = AdmissionController(capacity=1, queue_max=1, max_wait=5.0, enabled=True)
+        log, release = [], asyncio.Event()
+        held = asyncio.create_task(request(ac, "held", VOTE, log, release))
+        await settle()
+        queued = asyncio.create_task(request(ac, "queued", VOTE, log, release))
+        await settle()
+        shed = await request(ac, "shed", HEALTH, log, release)
+        release.set()
+        return ac, shed, await asyncio.gather(held, queued)
+
+    ac, shed, served = asyncio.run(scenario())
+    name, status, retry_after = shed
+    assert status == 503
+    assert 1 <= int(retry_after) <= MAX_RETRY_AFTER_SECONDS
+    assert [s[1] for s in served] == [200, 200]
+    assert ac.stats[HEALTH]["shed_queue_full"] == 1
+
+
+def test_full_queue_evicts_newest_lower_priority_waiter():
+    async def scenario():
+        ac = AdmissionController(capacity=1, queue_max=2, max_wait=5.0, enabled=True)
+        log, release = [], asyncio.Event()
+        tasks = []
+        for name, priority in [("held", RESULTS), ("c1", CATALOG), ("c2", CATALOG), ("v1", VOTE)]:
+            tasks.append(asyncio.create_task(request(ac, name, priority, log, release)))
+            await settle()
+        release.set()
+        return ac, log, await asyncio.gather(*tasks)
+
+    ac, log, results = asyncio.run(scenario())
+    statuses = {name: status for name, status, _ in results}
+    assert statuses == {"held": 200, "c1": 200, "c2": 503, "v1": 200}
+    assert log == ["held", "v1", "c1"]
+    assert ac.stats[CATALOG]["shed_evicted"] == 1
+    assert ac.stats[VOTE]["shed_queue_full"] == 0
+
+
+def test_queued_request_shed_after_max_wait():
+    async def scenario():
+        ac = AdmissionController(capacity=1, queue_max=5, max_wait=0.05, enabled=True)
+        log, release = [], asyncio.Event()
+        held = asyncio.create_task(request(ac, "held", RESULTS, log, release))
+        await settle()
+        timed_out = await request(ac, "late", RESULTS, log, release)
+        release.set()
+        await held
+        return ac, timed_out
+
+    ac, (name, status, retry_after) = asyncio.run(scenario())
+    assert status == 503 and retry_after is not None
+    assert ac.stats[RESULTS]["shed_timeout"] == 1
+    assert ac.in_flight == 0
+    assert ac.snapshot()["queued"] == 0
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def scenario():
+        ac = AdmissionController(capacity=1, queue_max=5, max_wait=5.0, enabled=True)
+        log, release = [], asyncio.Event()
+        held = asyncio.create_task(request(ac, "held", VOTE, log, release))
+        await settle()
+        gone = asyncio.create_task(request(ac, "gone", VOTE, log, release))
+        after = asyncio.create_task(request(ac, "after", VOTE, log, release))
+        await settle()
+        gone.cancel()
+        await settle()
+        release.set()
+        await asyncio.gather(held, after)
+        with pytest.raises(asyncio.CancelledError):
+            await gone
+        return ac, log
+
+    ac, log = asyncio.run(scenario())
+    assert log == ["held", "after"]
+    assert ac.in_flight == 0
+    assert ac.snapshot()["queued"] == 0
+
+
+def test_counters_and_snapshot():
+    async def scenario():
+        ac = AdmissionController(capacity=1, queue_max=1, max_wait=5.0, enabled=True)
+        log, release = [], asyncio.Event()
+        held = asyncio.create_task(request(ac, "held", VOTE, log, release))
+        await settle()
+        queued = asyncio.create_task(request(ac, "queued", RESULTS, log, release))
+        await settle()
+        busy = ac.snapshot()
+        await request(ac, "shed", CATALOG, log, release)
+        release.set()
+        await asyncio.gather(held, queued)
+        return ac, busy
+
+    ac, busy = asyncio.run(scenario())
+    assert (busy["in_flight"], busy["queued"]) == (1, 1)
+    snapshot = ac.snapshot()
+    assert snapshot["in_flight"] == 0
+    assert snapshot["shed_total"] == 1
+    assert snapshot["by_priority"][VOTE] == {
+        "admitted": 1, "queued": 0, "shed_queue_full": 0, "shed_evicted": 0, "shed_timeout": 0,
+    }
+    assert snapshot["by_priority"][RESULTS]["queued"] == 1
+    assert snapshot["by_priority"][RESULTS]["admitted"] == 1
+    assert snapshot["by_priority"][CATALOG]["shed_queue_full"] == 1
+
+
+def test_retry_after_is_bounded():
+    ac = AdmissionController(capacity=2, queue_max=5, max_wait=1.0, enabled=True)
+    ac.hold_seconds = 0.001
+    assert ac.retry_after() == 1
+    ac.hold_seconds = 1000.0
+    assert ac.retry_after() == MAX_RETRY_AFTER_SECONDS
@@ -0,0 +1,40 @@
+# tests/test_circuit_breaker.py
+"""Which errors count as a database outage, and how the breaker counts them."""
+import psycopg
+import psycopg2
+from fastapi import HTTPException
+from psycopg_pool import PoolTimeout as AsyncPoolTimeout
+
+from backend.admission import database_error
+from backend.circuit_breaker import CLOSED, OPEN, CircuitBreaker, DatabaseUnavailable, is_outage
+from backend.db import PoolTimeout
+
+
+def test_pool_timeouts_are_not_outages():
+    assert not is_outage(AsyncPoolTimeout())
+    assert not is_outage(PoolTimeout("no connection free"))
+
+
+def test_connection_failures_are_outages():
+    assert is_outage(psycopg2.OperationalError("could not connect to server"))
+    assert is_outage(psycopg.OperationalError("connection failed"))
+    assert is_outage(DatabaseUnavailable())
+
+
+def test_pool_timeout_is_an_overload_503_not_an_outage():
+    for e in (AsyncPoolTimeout(), PoolTimeout("no connection free")):
+        error = database_error(e)
+        assert isinstance(error, HTTPException)
+        assert error.status_code == 503
+        assert "Retry-After" in error.headers
+
+
+def test_breaker_ignores_pool_timeouts_unless_forced():
+    breaker = CircuitBreaker(failures=2, reset_seconds=10)
+    for _ in range(5):
+        breaker.record_failure(AsyncPoolTimeout())
+    assert breaker.state == CLOSED
+    # An empty pool that cannot open a connection is forced in as a failure
+    breaker.record_failure(AsyncPoolTimeout(), force=True)
+    breaker.record_failure(AsyncPoolTimeout(), force=True)
+    assert breaker.state == OPEN
@@ -0,0 +1,207 @@
+# tests/test_connection_pool.py
+"""ConnectionPool slot accounting, waiters and recycling, exercised with fake connections."""
+import threading
+import time
+
+import psycopg2.extensions
+import pytest
+
+from backend.db import ConnectionPool, PoolTimeout
+
+
+class FakeInfo:
+    transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.prepared = set()
+        self.info = FakeInfo()
+        self.opened_at = time.monotonic()
+        self.idle_since = self.opened_at
+        self.checked_out_at = 0.0
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+def make_pool(minconn=0, maxconn=3, acquire_timeout=0.2, max_idle=300.0, max_lifetime=1800.0):
+    pool = ConnectionPool("fake", minconn=0, maxconn=maxconn, acquire_timeout=acquire_timeout,
+                          max_idle=max_idle, max_lifetime=max_lifetime)
+    pool.opened = []
+
+    def fake_open():
+        conn = FakeConnection()
+        pool.opened.append(conn)
+        return conn
+
+    pool._open = fake_open
+    pool.minconn = minconn
+    return pool
+
+
+def test_discard_idle_frees_each_slot_once():
+    pool = make_pool(maxconn=3)
+    conns = [pool.getconn() for _ in range(3)]
+    for conn in conns:
+        pool.putconn(conn)
+    assert pool.stats()["size"] == 3
+
+    pool.discard_idle()
+
+    stats = pool.stats()
+    assert stats["size"] == 0
+    assert stats["idle"] == 0
+    assert all(conn.closed for conn in conns)
+    # The pool may open maxconn connections again, and no more
+    again = [pool.getconn() for _ in range(3)]
+    assert pool.stats()["size"] == 3
+    assert pool.stats()["in_use"] == 3
+    with pytest.raises(Exception):
+        pool.getconn(timeout=0.05)
+    for conn in again:
+        pool.putconn(conn)
+
+
+def test_discard_idle_hands_freed_slots_to_waiters():
+    pool = make_pool(maxconn=2, acquire_timeout=2.0)
+    held = pool.getconn()
+    idle = pool.getconn()
+    pool.putconn(idle)
+    # Pool is at maxconn with one connection idle; take it so a waiter queues
+    busy = pool.getconn()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.getconn()))
+    waiter.start()
+    time.sleep(0.05)
+    pool.putconn(busy, close=True)
+    waiter.join(1.0)
+    assert got and got[0] is not busy
+    pool.putconn(got[0])
+    pool.discard_idle()
+    assert pool.stats()["size"] == 1
+    pool.putconn(held)
+    assert pool.stats()["size"] == 1
+
+
+def wait_for_waiters(pool, n, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while pool.stats()["waiting"] < n:
+        assert time.monotonic() < deadline, "waiter never queued"
+        time.sleep(0.005)
+
+
+def test_slots_open_up_to_maxconn_and_reuse_idle():
+    pool = make_pool(maxconn=2)
+    a = pool.getconn()
+    b = pool.getconn()
+    assert pool.stats()["size"] == 2
+    assert pool.stats()["in_use"] == 2
+    pool.putconn(a)
+    stats = pool.stats()
+    assert (stats["size"], stats["in_use"], stats["idle"]) == (2, 1, 1)
+    # The idle connection is reused, nothing new is opened
+    assert pool.getconn() is a
+    assert len(pool.opened) == 2
+    pool.putconn(a)
+    pool.putconn(b)
+    assert pool.stats()["idle"] == 2
+
+
+def test_closed_and_failed_connections_free_their_slot():
+    pool = make_pool(maxconn=1)
+    conn = pool.getconn()
+    pool.putconn(conn, close=True)
+    assert conn.closed
+    assert pool.stats()["size"] == 0
+    assert pool.stats()["recycled"] == 1
+
+    def failing_open():
+        raise RuntimeError("connect failed")
+
+    pool._open = failing_open
+    with pytest.raises(RuntimeError):
+        pool.getconn()
+    assert pool.stats()["size"] == 0
+    assert pool.stats()["in_use"] == 0
+
+
+def test_getconn_times_out_when_pool_is_exhausted():
+    pool = make_pool(maxconn=1)
+    held = pool.getconn()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.getconn(timeout=0.05)
+    assert time.monotonic() - started >= 0.05
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["waiting"] == 0
+    assert stats["size"] == 1
+    # A timed-out waiter is not handed the next returned connection
+    pool.putconn(held)
+    assert pool.stats()["idle"] == 1
+    assert pool.getconn(timeout=0.05) is held
+
+
+def test_putconn_closes_expired_connection():
+    pool = make_pool(maxconn=2, max_lifetime=60.0)
+    conn = pool.getconn()
+    conn.opened_at -= 120.0
+    pool.putconn(conn)
+    assert conn.closed
+    stats = pool.stats()
+    assert (stats["size"], stats["idle"], stats["recycled"]) == (0, 0, 1)
+
+
+def test_getconn_skips_expired_idle_connection():
+    pool = make_pool(maxconn=2, max_lifetime=60.0)
+    old = pool.getconn()
+    pool.putconn(old)
+    old.opened_at -= 120.0
+    fresh = pool.getconn()
+    assert fresh is not old
+    assert old.closed
+    assert pool.stats()["size"] == 1
+    pool.putconn(fresh)
+
+
+def test_putconn_trims_connections_idle_past_max_idle():
+    pool = make_pool(minconn=1, maxconn=3, max_idle=60.0)
+    conns = [pool.getconn() for _ in range(3)]
+    for conn in conns[:2]:
+        pool.putconn(conn)
+        conn.idle_since -= 120.0
+    pool.putconn(conns[2])
+    # Trimmed down to minconn, oldest first; the fresh one stays
+    assert [c.closed for c in conns] == [1, 1, 0]
+    assert pool.stats()["size"] == 1
+    assert pool.stats()["idle"] == 1
+
+
+def test_putconn_hands_connection_to_oldest_waiter():
+    pool = make_pool(maxconn=1, acquire_timeout=2.0)
+    held = pool.getconn()
+    got = []
+    first = threading.Thread(target=lambda: got.append(("first", pool.getconn())))
+    first.start()
+    wait_for_waiters(pool, 1)
+    second = threading.Thread(target=lambda: got.append(("second", pool.getconn())))
+    second.start()
+    wait_for_waiters(pool, 2)
+
+    pool.putconn(held)
+    first.join(1.0)
+    assert got == [("first", held)]
+    assert pool.stats()["idle"] == 0
+    pool.putconn(held)
+    second.join(1.0)
+    assert got[1] == ("second", held)
+    assert len(pool.opened) == 1
+    pool.putconn(held)
+    stats = pool.stats()
+    assert (stats["size"], stats["in_use"], stats["idle"], stats["waiting"]) == (1, 0, 1, 0)
+
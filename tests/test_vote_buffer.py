@@ -0,0 +1,68 @@
+# tests/test_vote_buffer.py
+"""Spill-file replay of VoteBuffer, with the database flush replaced by a recorder."""
+from backend.vote_buffer import VoteBuffer, _batch_to_json
+from backend.votes import VoteBatch
+
+
+def make_batch(rows):
+    batch = VoteBatch()
+    batch.question_codes = ["1_1"]
+    batch.checkbox = [("u", "1_1", "q", 1, 1, "c", None, 1, None, f"O{i}", f"1_1_O{i}", f"O{i}", 1.0 / rows)
+                      for i in range(rows)]
+    return batch
+
+
+def make_buffer(tmp_path, flush_max_rows=10, fail_after=None):
+    buffer = VoteBuffer(enabled=False, spill_path=str(tmp_path / "spill.jsonl"), flush_max_rows=flush_max_rows)
+    buffer.flushed = []
+
+    def fake_flush(batches):
+        if fail_after is not None and len(buffer.flushed) >= fail_after:
+            return False
+        buffer.flushed.append([len(b) for b in batches])
+        return True
+
+    buffer._flush = fake_flush
+    return buffer
+
+
+def write_lines(path, batches):
+    path.write_text("".join(_batch_to_json(b) + "\n" for b in batches), encoding="utf-8")
+
+
+def test_replay_chunks_by_rows_not_batches(tmp_path):
+    buffer = make_buffer(tmp_path, flush_max_rows=10)
+    write_lines(tmp_path / "spill.jsonl", [make_batch(4), make_batch(4), make_batch(4), make_batch(12), make_batch(1)])
+    buffer._replay_spill()
+    # A batch bigger than the limit still goes alone
+    assert buffer.flushed == [[4, 4], [4], [12], [1]]
+    assert not (tmp_path / "spill.jsonl").exists()
+    assert buffer.stats["replayed"] == 5
+
+
+def test_orphaned_replay_file_is_replayed_without_a_spill_file(tmp_path):
+    buffer = make_buffer(tmp_path)
+    write_lines(tmp_path / "spill.jsonl.replay", [make_batch(2)])
+    buffer._replay_spill()
+    assert buffer.flushed == [[2]]
+    assert not (tmp_path / "spill.jsonl.replay").exists()
+
+
+def test_orphaned_replay_file_goes_before_the_spill_file(tmp_path):
+    buffer = make_buffer(tmp_path)
+    write_lines(tmp_path / "spill.jsonl.replay", [make_batch(2)])
+    write_lines(tmp_path / "spill.jsonl", [make_batch(3)])
+    buffer._replay_spill()
+    assert buffer.flushed == [[2], [3]]
+    assert not (tmp_path / "spill.jsonl").exists()
+    assert not (tmp_path / "spill.jsonl.replay").exists()
+
+
+def test_failed_replay_puts_the_rest_back(tmp_path):
+    buffer = make_buffer(tmp_path, flush_max_rows=2, fail_after=1)
+    write_lines(tmp_path / "spill.jsonl", [make_batch(2), make_batch(2), make_batch(2)])
+    buffer._replay_spill()
+    assert buffer.flushed == [[2]]
+    remaining = (tmp_path / "spill.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(remaining) == 2
+    assert not (tmp_path / "spill.jsonl.replay").exists()